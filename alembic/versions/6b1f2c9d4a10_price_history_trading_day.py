@@ -0,0 +1,51 @@
+"""Add trading_day to price_history
+
+Revision ID: 6b1f2c9d4a10
+Revises: 3ee52e32bb3a
+Create Date: 2026-10-16 10:12:31.418205
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '6b1f2c9d4a10'
+down_revision: Union[str, Sequence[str], None] = '3ee52e32bb3a'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    with op.batch_alter_table('price_history') as batch_op:
+        batch_op.add_column(sa.Column('trading_day', sa.Date(), nullable=True))
+
+    # Backfill existing rows, so upserts on (asset_id, trading_day) find them instead of adding
+    # a second row for the same day. Rows without a timestamp keep NULL (never collide).
+    if op.get_bind().dialect.name == "sqlite":
+        op.execute("UPDATE price_history SET trading_day = date(date) WHERE date IS NOT NULL")
+    else:
+        op.execute("UPDATE price_history SET trading_day = CAST(date AS DATE) WHERE date IS NOT NULL")
+
+    # Several timestamps on one day: keep the latest row (highest id on equal timestamps)
+    op.execute(
+        "DELETE FROM price_history WHERE EXISTS ("
+        " SELECT 1 FROM price_history AS newer"
+        " WHERE newer.asset_id = price_history.asset_id"
+        " AND newer.trading_day = price_history.trading_day"
+        " AND (newer.date > price_history.date OR (newer.date = price_history.date AND newer.id > price_history.id)))"
+    )
+
+    with op.batch_alter_table('price_history') as batch_op:
+        batch_op.create_unique_constraint('uix_price_asset_day', ['asset_id', 'trading_day'])
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    # Deduplicated rows are not restored
+    with op.batch_alter_table('price_history') as batch_op:
+        batch_op.drop_constraint('uix_price_asset_day', type_='unique')
+        batch_op.drop_column('trading_day')
@@ -0,0 +1,62 @@
+"""Add fetch_runs and fetch_run_items
+
+Revision ID: 9c3e5a7f1b22
+Revises: 6b1f2c9d4a10
+Create Date: 2026-10-16 13:40:07.552918
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '9c3e5a7f1b22'
+down_revision: Union[str, Sequence[str], None] = '6b1f2c9d4a10'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table('fetch_runs',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('mode', sa.String(), nullable=True),
+    sa.Column('status', sa.String(), nullable=True),
+    sa.Column('started_at', sa.DateTime(), nullable=True),
+    sa.Column('updated_at', sa.DateTime(), nullable=True),
+    sa.Column('finished_at', sa.DateTime(), nullable=True),
+    sa.Column('total', sa.Integer(), nullable=True),
+    sa.Column('done', sa.Integer(), nullable=True),
+    sa.Column('failed', sa.Integer(), nullable=True),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index(op.f('ix_fetch_runs_id'), 'fetch_runs', ['id'], unique=False)
+    op.create_index(op.f('ix_fetch_runs_status'), 'fetch_runs', ['status'], unique=False)
+    op.create_table('fetch_run_items',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('run_id', sa.Integer(), nullable=True),
+    sa.Column('asset_id', sa.Integer(), nullable=True),
+    sa.Column('position', sa.Integer(), nullable=True),
+    sa.Column('status', sa.String(), nullable=True),
+    sa.Column('price', sa.Float(), nullable=True),
+    sa.Column('error', sa.String(), nullable=True),
+    sa.Column('updated_at', sa.DateTime(), nullable=True),
+    sa.ForeignKeyConstraint(['asset_id'], ['assets.id'], ),
+    sa.ForeignKeyConstraint(['run_id'], ['fetch_runs.id'], ),
+    sa.PrimaryKeyConstraint('id'),
+    sa.UniqueConstraint('run_id', 'asset_id', name='uix_fetch_run_asset')
+    )
+    op.create_index(op.f('ix_fetch_run_items_id'), 'fetch_run_items', ['id'], unique=False)
+    op.create_index(op.f('ix_fetch_run_items_run_id'), 'fetch_run_items', ['run_id'], unique=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index(op.f('ix_fetch_run_items_run_id'), table_name='fetch_run_items')
+    op.drop_index(op.f('ix_fetch_run_items_id'), table_name='fetch_run_items')
+    op.drop_table('fetch_run_items')
+    op.drop_index(op.f('ix_fetch_runs_status'), table_name='fetch_runs')
+    op.drop_index(op.f('ix_fetch_runs_id'), table_name='fetch_runs')
+    op.drop_table('fetch_runs')
@@ -0,0 +1,42 @@
+"""Add price_rollups
+
+Revision ID: a8c2e6f4d017
+Revises: f7b3d6a2e418
+Create Date: 2026-10-16 19:02:47.118305
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'a8c2e6f4d017'
+down_revision: Union[str, Sequence[str], None] = 'f7b3d6a2e418'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table('price_rollups',
+    sa.Column('asset_id', sa.Integer(), nullable=False),
+    sa.Column('resolution', sa.String(), nullable=False),
+    sa.Column('period_start', sa.Date(), nullable=False),
+    sa.Column('open', sa.Float(), nullable=True),
+    sa.Column('high', sa.Float(), nullable=True),
+    sa.Column('low', sa.Float(), nullable=True),
+    sa.Column('close', sa.Float(), nullable=True),
+    sa.Column('first_day', sa.Date(), nullable=True),
+    sa.Column('last_day', sa.Date(), nullable=True),
+    sa.Column('samples', sa.Integer(), nullable=True),
+    sa.ForeignKeyConstraint(['asset_id'], ['assets.id'], ),
+    sa.PrimaryKeyConstraint('asset_id', 'resolution', 'period_start')
+    )
+    # Fill it with: python -m backend.services.rollups --rebuild
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_table('price_rollups')
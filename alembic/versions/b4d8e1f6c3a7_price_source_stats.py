@@ -0,0 +1,35 @@
+"""Add price_source_stats
+
+Revision ID: b4d8e1f6c3a7
+Revises: 9c3e5a7f1b22
+Create Date: 2026-10-16 15:12:44.180336
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'b4d8e1f6c3a7'
+down_revision: Union[str, Sequence[str], None] = '9c3e5a7f1b22'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table('price_source_stats',
+    sa.Column('source', sa.String(), nullable=False),
+    sa.Column('requests', sa.Integer(), nullable=True),
+    sa.Column('success_rate', sa.Float(), nullable=True),
+    sa.Column('latency_ms', sa.Float(), nullable=True),
+    sa.Column('updated_at', sa.DateTime(), nullable=True),
+    sa.PrimaryKeyConstraint('source')
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_table('price_source_stats')
@@ -0,0 +1,38 @@
+"""Add portfolio_daily_snapshot
+
+Revision ID: c6e9f2b7a5d3
+Revises: a8c2e6f4d017
+Create Date: 2026-10-17 10:14:36.520913
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'c6e9f2b7a5d3'
+down_revision: Union[str, Sequence[str], None] = 'a8c2e6f4d017'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table('portfolio_daily_snapshot',
+    sa.Column('user_id', sa.Integer(), nullable=False),
+    sa.Column('day', sa.Date(), nullable=False),
+    sa.Column('total_value', sa.Float(), nullable=True),
+    sa.Column('total_cost', sa.Float(), nullable=True),
+    sa.Column('total_profit', sa.Float(), nullable=True),
+    sa.Column('realized_profit', sa.Float(), nullable=True),
+    sa.ForeignKeyConstraint(['user_id'], ['users.id'], ),
+    sa.PrimaryKeyConstraint('user_id', 'day')
+    )
+    # Fill it with: python -m backend.services.portfolio_snapshots --rebuild
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_table('portfolio_daily_snapshot')
@@ -0,0 +1,30 @@
+"""Add fetch_runs.worker
+
+Revision ID: d9a4b7e2c6f1
+Revises: c6e9f2b7a5d3
+Create Date: 2026-10-17 15:02:48.193604
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'd9a4b7e2c6f1'
+down_revision: Union[str, Sequence[str], None] = 'c6e9f2b7a5d3'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    with op.batch_alter_table('fetch_runs') as batch_op:
+        batch_op.add_column(sa.Column('worker', sa.String(), nullable=True))
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    with op.batch_alter_table('fetch_runs') as batch_op:
+        batch_op.drop_column('worker')
@@ -0,0 +1,38 @@
+"""Add latest_prices
+
+Revision ID: e5f1a3c8d924
+Revises: d2a7c4e9b815
+Create Date: 2026-10-16 17:20:33.402611
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'e5f1a3c8d924'
+down_revision: Union[str, Sequence[str], None] = 'd2a7c4e9b815'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table('latest_prices',
+    sa.Column('asset_id', sa.Integer(), nullable=False),
+    sa.Column('price', sa.Float(), nullable=True),
+    sa.Column('as_of', sa.Date(), nullable=True),
+    sa.Column('stamped_at', sa.DateTime(), nullable=True),
+    sa.Column('previous_close', sa.Float(), nullable=True),
+    sa.Column('previous_as_of', sa.Date(), nullable=True),
+    sa.ForeignKeyConstraint(['asset_id'], ['assets.id'], ),
+    sa.PrimaryKeyConstraint('asset_id')
+    )
+    # Fill it with: python -m backend.services.latest_prices --rebuild
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_table('latest_prices')
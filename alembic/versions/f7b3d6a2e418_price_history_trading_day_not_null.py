@@ -0,0 +1,60 @@
+"""Backfill and deduplicate price_history.trading_day, make it NOT NULL
+
+Revision ID: f7b3d6a2e418
+Revises: e5f1a3c8d924
+Create Date: 2026-10-16 18:02:47.913256
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'f7b3d6a2e418'
+down_revision: Union[str, Sequence[str], None] = 'e5f1a3c8d924'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # 1. Drop the uniqueness constraints while rows are being merged
+    with op.batch_alter_table('price_history') as batch_op:
+        batch_op.drop_constraint('uix_price_asset_day', type_='unique')
+        batch_op.drop_constraint('uix_price_asset_date', type_='unique')
+
+    # 2. Rows without any timestamp cannot be placed on a day
+    op.execute("DELETE FROM price_history WHERE trading_day IS NULL AND date IS NULL")
+
+    # 3. Backfill trading_day from the timestamp
+    if op.get_bind().dialect.name == "sqlite":
+        op.execute("UPDATE price_history SET trading_day = date(date) WHERE trading_day IS NULL")
+    else:
+        op.execute("UPDATE price_history SET trading_day = CAST(date AS DATE) WHERE trading_day IS NULL")
+
+    # 4. Keep one row per asset and day: the latest one (highest id on equal timestamps)
+    op.execute(
+        "DELETE FROM price_history WHERE EXISTS ("
+        " SELECT 1 FROM price_history AS newer"
+        " WHERE newer.asset_id = price_history.asset_id"
+        " AND newer.trading_day = price_history.trading_day"
+        " AND (newer.date > price_history.date OR (newer.date = price_history.date AND newer.id > price_history.id)"
+        " OR (price_history.date IS NULL AND newer.id > price_history.id)))"
+    )
+
+    # 5. Daily uniqueness (its index serves (asset_id, trading_day) range scans)
+    with op.batch_alter_table('price_history') as batch_op:
+        batch_op.alter_column('trading_day', existing_type=sa.Date(), nullable=False)
+        batch_op.create_unique_constraint('uix_price_asset_day', ['asset_id', 'trading_day'])
+
+    # latest_prices may reference merged rows: python -m backend.services.latest_prices --rebuild
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    # Deduplicated rows are not restored
+    with op.batch_alter_table('price_history') as batch_op:
+        batch_op.alter_column('trading_day', existing_type=sa.Date(), nullable=True)
+        batch_op.create_unique_constraint('uix_price_asset_date', ['asset_id', 'date'])
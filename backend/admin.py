@@ -94,8 +94,8 @@ class PortfolioAdmin(BaseAdmin):
 
 @register(PriceHistory, sqlalchemy_sessionmaker=AsyncSessionLocal)
 class PriceHistoryAdmin(BaseAdmin):
-    list_display = ("id", "asset", "date", "price")
-    list_filter = ("asset", "date")
+    list_display = ("id", "asset", "trading_day", "date", "price")
+    list_filter = ("asset", "trading_day")
     fields = ("asset", "price")
     
     formfield_overrides = {
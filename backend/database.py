@@ -1,5 +1,7 @@
 from sqlalchemy.ext.asyncio import create_async_engine, AsyncSession, async_sessionmaker
+from sqlalchemy.engine import make_url
 from sqlalchemy.orm import declarative_base
+from sqlalchemy import event
 import os
 from dotenv import load_dotenv
 
@@ -7,19 +9,97 @@ load_dotenv()
 
 # Get from Env variable, otherwise use default sqlite
 DATABASE_URL = os.getenv("DATABASE_URL", "sqlite:///./local.db")
+# Optional read replica for the read-only session factory (PostgreSQL); defaults to DATABASE_URL
+DATABASE_READ_URL = os.getenv("DATABASE_READ_URL", "")
 
-# Use aiosqlite for SQLite
-if "sqlite" in DATABASE_URL and "aiosqlite" not in DATABASE_URL:
-    DATABASE_URL = DATABASE_URL.replace("sqlite://", "sqlite+aiosqlite://")
+# PostgreSQL pool sizing (per engine, per process)
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "10")) # Writer connections kept open
+DB_MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", "10")) # Extra writer connections under load
+DB_READ_POOL_SIZE = int(os.getenv("DB_READ_POOL_SIZE", "20")) # Reader connections kept open
+DB_READ_MAX_OVERFLOW = int(os.getenv("DB_READ_MAX_OVERFLOW", "20"))
+DB_POOL_RECYCLE = int(os.getenv("DB_POOL_RECYCLE", "1800")) # Seconds before a pooled connection is replaced
+DB_POOL_TIMEOUT = int(os.getenv("DB_POOL_TIMEOUT", "30")) # Seconds to wait for a free connection
 
-# Single Async Engine
-engine = create_async_engine(
-    DATABASE_URL, 
-    connect_args={"check_same_thread": False} if "sqlite" in DATABASE_URL else {}
-)
+# SQLite pragmas (applied to every new connection)
+SQLITE_JOURNAL_MODE = os.getenv("SQLITE_JOURNAL_MODE", "WAL") # WAL: readers never block on the fetcher's write transaction
+SQLITE_SYNCHRONOUS = os.getenv("SQLITE_SYNCHRONOUS", "NORMAL") # NORMAL is durable across app crashes in WAL mode
+SQLITE_BUSY_TIMEOUT_MS = int(os.getenv("SQLITE_BUSY_TIMEOUT_MS", "15000")) # Wait this long for a lock instead of "database is locked"
+SQLITE_CACHE_KIB = int(os.getenv("SQLITE_CACHE_KIB", "65536")) # Page cache per connection
+SQLITE_MMAP_BYTES = int(os.getenv("SQLITE_MMAP_BYTES", str(256 * 1024 * 1024))) # Memory-mapped I/O window (0 disables)
+SQLITE_READ_POOL_SIZE = int(os.getenv("SQLITE_READ_POOL_SIZE", "8")) # Reader connections kept open
 
-# Async Session Factory
+def async_url(url: str) -> str:
+    # Use aiosqlite for SQLite
+    if "sqlite" in url and "aiosqlite" not in url:
+        return url.replace("sqlite://", "sqlite+aiosqlite://")
+    return url
+
+DATABASE_URL = async_url(DATABASE_URL)
+DATABASE_READ_URL = async_url(DATABASE_READ_URL) if DATABASE_READ_URL else DATABASE_URL
+
+def is_memory_sqlite(url: str) -> bool:
+    parsed = make_url(url)
+    return parsed.get_backend_name() == "sqlite" and parsed.database in (None, "", ":memory:")
+
+def engine_options(url: str, read_only: bool = False) -> dict:
+    """create_async_engine() keyword arguments for the URL's dialect (the engine profile)."""
+    backend = make_url(url).get_backend_name()
+    if backend == "sqlite":
+        options = {"connect_args": {"check_same_thread": False}}
+        if read_only and not is_memory_sqlite(url):
+            options.update(pool_size=SQLITE_READ_POOL_SIZE, max_overflow=0, pool_timeout=DB_POOL_TIMEOUT)
+        return options
+    if backend == "postgresql":
+        options = {
+            "pool_size": DB_READ_POOL_SIZE if read_only else DB_POOL_SIZE,
+            "max_overflow": DB_READ_MAX_OVERFLOW if read_only else DB_MAX_OVERFLOW,
+            "pool_recycle": DB_POOL_RECYCLE,
+            "pool_timeout": DB_POOL_TIMEOUT,
+            "pool_pre_ping": True,
+        }
+        if read_only and make_url(url).get_driver_name() == "asyncpg":
+            # The server rejects writes on reader connections
+            options["connect_args"] = {"server_settings": {"default_transaction_read_only": "on"}}
+        return options
+    return {}
+
+def apply_sqlite_pragmas(engine, read_only: bool = False):
+    """Sets the SQLite pragmas on every connection the engine opens."""
+    memory = is_memory_sqlite(str(engine.url))
+
+    @event.listens_for(engine.sync_engine, "connect")
+    def set_pragmas(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        if not memory:
+            cursor.execute(f"PRAGMA journal_mode={SQLITE_JOURNAL_MODE}")
+            cursor.execute(f"PRAGMA mmap_size={SQLITE_MMAP_BYTES}")
+        cursor.execute(f"PRAGMA synchronous={SQLITE_SYNCHRONOUS}")
+        cursor.execute(f"PRAGMA busy_timeout={SQLITE_BUSY_TIMEOUT_MS}")
+        cursor.execute(f"PRAGMA cache_size=-{SQLITE_CACHE_KIB}")
+        cursor.execute("PRAGMA temp_store=MEMORY")
+        if read_only:
+            # Reader connections refuse writes
+            cursor.execute("PRAGMA query_only=ON")
+        cursor.close()
+
+def create_engine_for(url: str, read_only: bool = False):
+    engine = create_async_engine(url, **engine_options(url, read_only))
+    if engine.dialect.name == "sqlite":
+        apply_sqlite_pragmas(engine, read_only)
+    return engine
+
+# Writer engine: fetcher, scheduler, admin panel and every non-GET route
+engine = create_engine_for(DATABASE_URL)
+
+# Reader engine: GET routes. An in-memory SQLite database only exists on its own connection, so it shares the writer
+if is_memory_sqlite(DATABASE_READ_URL):
+    read_engine = engine
+else:
+    read_engine = create_engine_for(DATABASE_READ_URL, read_only=True)
+
+# Async Session Factories
 AsyncSessionLocal = async_sessionmaker(engine, expire_on_commit=False, class_=AsyncSession)
+ReadSessionLocal = async_sessionmaker(read_engine, expire_on_commit=False, autoflush=False, class_=AsyncSession)
 
 Base = declarative_base()
 
@@ -30,3 +110,16 @@ async def get_db():
             yield db
         finally:
             await db.close()
+
+async def get_read_db():
+    """Read-only session for GET routes; writes through it fail."""
+    async with ReadSessionLocal() as db:
+        try:
+            yield db
+        finally:
+            await db.close()
+
+async def dispose_engines():
+    await engine.dispose()
+    if read_engine is not engine:
+        await read_engine.dispose()
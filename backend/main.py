@@ -1,7 +1,7 @@
-from backend.database import engine
+from backend.database import engine, dispose_engines
 from backend import models
-from backend.scheduler import start_scheduler
-from backend.routers import assets, portfolio, auth
+from backend.scheduler import start_scheduler, stop_scheduler
+from backend.routers import assets, portfolio, auth, scheduler
 from backend.i18n_utils import current_language
 from contextlib import asynccontextmanager
 from fastapi import FastAPI, Request, Response
@@ -23,10 +23,12 @@ async def lifespan(app: FastAPI):
     async with engine.begin() as conn:
         await conn.run_sync(models.Base.metadata.create_all)
         
-    # Start scheduler on startup
+    # Start scheduler on startup (jobs run on this event loop)
     start_scheduler()
     yield
-    # Actions on shutdown (e.g. scheduler.shutdown if needed)
+    # Stop scheduling and cancel a running price update; it resumes from its checkpoint next start
+    await stop_scheduler()
+    await dispose_engines()
 
 app = FastAPI(title="Portfolio Tracker API", version="1.0.0", lifespan=lifespan)
 
@@ -69,6 +71,7 @@ app.mount("/static", StaticFiles(directory="frontend"), name="static")
 app.include_router(assets.router)
 app.include_router(portfolio.router)
 app.include_router(auth.router)
+app.include_router(scheduler.router)
 
 # Setup admin panel
 app.mount("/admin", fastapi_app)
@@ -12,6 +12,22 @@ class OrderType(str, enum.Enum):
     BUY = "BUY"
     SELL = "SELL"
 
+class FetchRunStatus(str, enum.Enum):
+    RUNNING = "RUNNING"
+    INTERRUPTED = "INTERRUPTED" # Stopped early (e.g. WAF circuit breaker), resumed by the next run
+    COMPLETED = "COMPLETED"
+    ABANDONED = "ABANDONED" # Too old to resume, replaced by a new run
+    CANCELLED = "CANCELLED" # Cancelled through the fetch job API, never resumed
+
+class RollupResolution(str, enum.Enum):
+    WEEK = "WEEK" # Buckets start on Monday
+    MONTH = "MONTH" # Buckets start on the 1st
+
+class FetchItemStatus(str, enum.Enum):
+    PENDING = "PENDING"
+    DONE = "DONE"
+    FAILED = "FAILED"
+
 class User(Base):
     __tablename__ = "users"
 
@@ -65,12 +81,18 @@ class Portfolio(Base):
         UniqueConstraint('user_id', 'asset_id', name='uix_portfolio_user_asset'),
     )
 
+def default_trading_day(context):
+    # Rows created without a trading_day (e.g. in the admin panel) belong to the day of their timestamp
+    stamp = context.get_current_parameters().get("date")
+    return (stamp or datetime.now()).date()
+
 class PriceHistory(Base):
     __tablename__ = "price_history"
 
     id = Column(Integer, primary_key=True, index=True)
     asset_id = Column(Integer, ForeignKey("assets.id"))
-    date = Column(DateTime, index=True)
+    date = Column(DateTime, index=True, default=datetime.now) # When the price was seen
+    trading_day = Column(Date, nullable=False, default=default_trading_day) # Day the price belongs to
     price = Column(Float)
     
     asset = relationship("Asset", back_populates="price_history")
@@ -78,13 +100,69 @@ class PriceHistory(Base):
     def __str__(self):
         return f"ID:{self.id}: {self.price}"
 
-    # An asset can have only one price for the same date.
-    # Note: With DateTime, uniqueness is down to the second. 
-    # Logic in fetcher.py handles daily checks.
+    # An asset can have only one price per trading day (see services/price_writer.py).
+    # The constraint's index serves all day-level queries as (asset_id, trading_day) range scans.
     __table_args__ = (
-        UniqueConstraint('asset_id', 'date', name='uix_price_asset_date'),
+        UniqueConstraint('asset_id', 'trading_day', name='uix_price_asset_day'),
     )
 
+class LatestPrice(Base):
+    """
+    Latest two prices per asset, maintained on every PriceHistory write
+    (services/latest_prices.py), so readers never aggregate the history table.
+    """
+    __tablename__ = "latest_prices"
+
+    asset_id = Column(Integer, ForeignKey("assets.id"), primary_key=True)
+    price = Column(Float)
+    as_of = Column(Date, nullable=True) # trading_day of the latest price
+    stamped_at = Column(DateTime, nullable=True) # PriceHistory.date of the latest price
+    previous_close = Column(Float, nullable=True) # Price of the trading day before as_of
+    previous_as_of = Column(Date, nullable=True)
+
+    asset = relationship("Asset")
+
+    def __str__(self):
+        return f"{self.asset_id}: {self.price} @ {self.as_of}"
+
+class PriceRollup(Base):
+    """
+    Weekly and monthly OHLC bars per asset, maintained on every PriceHistory write
+    (services/rollups.py). close is the last value of the bucket, seen on last_day.
+    """
+    __tablename__ = "price_rollups"
+
+    asset_id = Column(Integer, ForeignKey("assets.id"), primary_key=True)
+    resolution = Column(String, primary_key=True) # RollupResolution
+    period_start = Column(Date, primary_key=True)
+    open = Column(Float)
+    high = Column(Float)
+    low = Column(Float)
+    close = Column(Float)
+    first_day = Column(Date) # trading_day of open
+    last_day = Column(Date) # trading_day of close
+    samples = Column(Integer, default=0) # Trading days in the bucket
+
+    asset = relationship("Asset")
+
+    def __str__(self):
+        return f"{self.asset_id} {self.resolution} {self.period_start}: {self.close}"
+
+class PortfolioDailySnapshot(Base):
+    """
+    A user's portfolio value at the end of every trading day, as /portfolio/history serves it
+    (services/portfolio_snapshots.py). Appended after price updates; rows from a changed day
+    on (order, backfilled price, edited holding) are deleted and recomputed.
+    """
+    __tablename__ = "portfolio_daily_snapshot"
+
+    user_id = Column(Integer, ForeignKey("users.id"), primary_key=True)
+    day = Column(Date, primary_key=True) # A trading day of any held asset
+    total_value = Column(Float)
+    total_cost = Column(Float) # Cost basis of the positions held that day
+    total_profit = Column(Float) # Unrealized: total_value - total_cost
+    realized_profit = Column(Float) # Realized by sells up to that day
+
 class Order(Base):
     __tablename__ = "orders"
 
@@ -101,3 +179,67 @@ class Order(Base):
 
     def __str__(self):
         return f"ID:{self.id}: {self.type} - {self.quantity} @ {self.price}"
+
+class FetchRun(Base):
+    __tablename__ = "fetch_runs"
+
+    id = Column(Integer, primary_key=True, index=True)
+    mode = Column(String) # page or crawler
+    status = Column(String, index=True) # FetchRunStatus
+    started_at = Column(DateTime, default=datetime.now)
+    updated_at = Column(DateTime, default=datetime.now)
+    finished_at = Column(DateTime, nullable=True)
+    total = Column(Integer, default=0) # Number of assets planned for this run
+    done = Column(Integer, default=0)
+    failed = Column(Integer, default=0)
+    worker = Column(String, nullable=True) # host:pid of the process executing the run
+
+    items = relationship("FetchRunItem", back_populates="run", cascade="all, delete-orphan")
+
+    def __str__(self):
+        return f"ID:{self.id}: {self.status} - {self.done}/{self.total}"
+
+class FetchRunItem(Base):
+    __tablename__ = "fetch_run_items"
+
+    id = Column(Integer, primary_key=True, index=True)
+    run_id = Column(Integer, ForeignKey("fetch_runs.id"), index=True)
+    asset_id = Column(Integer, ForeignKey("assets.id"))
+    position = Column(Integer) # Dispatch order within the run (oldest update first)
+    status = Column(String, default=FetchItemStatus.PENDING.value) # FetchItemStatus
+    price = Column(Float, nullable=True)
+    error = Column(String, nullable=True)
+    updated_at = Column(DateTime, nullable=True)
+
+    run = relationship("FetchRun", back_populates="items")
+    asset = relationship("Asset")
+
+    def __str__(self):
+        return f"ID:{self.id}: {self.asset_id} - {self.status}"
+
+    __table_args__ = (
+        UniqueConstraint('run_id', 'asset_id', name='uix_fetch_run_asset'),
+    )
+
+class PriceSourceStat(Base):
+    __tablename__ = "price_source_stats"
+
+    source = Column(String, primary_key=True) # <provider>:<source>, e.g. tefas:page
+    requests = Column(Integer, default=0)
+    success_rate = Column(Float, default=1.0) # Recency-weighted (EWMA)
+    latency_ms = Column(Float, nullable=True) # Recency-weighted (EWMA)
+    updated_at = Column(DateTime, default=datetime.now)
+
+    def __str__(self):
+        return f"{self.source}: {self.success_rate:.0%} @ {self.latency_ms}ms"
+
+class SchedulerLease(Base):
+    __tablename__ = "scheduler_leases"
+
+    name = Column(String, primary_key=True) # Lease name, e.g. scheduler
+    holder = Column(String) # <hostname>:<pid> of the current leader
+    acquired_at = Column(DateTime, default=datetime.now)
+    renewed_at = Column(DateTime, default=datetime.now) # Last check-in; stale if the leader died
+
+    def __str__(self):
+        return f"{self.name}: {self.holder}"
@@ -1,12 +1,17 @@
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, Query, status
+from fastapi.responses import JSONResponse
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy import select
-from backend.database import get_db
-from backend.models import Asset, AssetType, PriceHistory, User
-from backend.security import get_current_user
-from backend.services.fetcher import fetch_fund_prices
+from backend.database import get_db, get_read_db
+from backend.models import Asset, AssetType, User, FetchRun
+from backend.security import get_current_user, get_current_reader
+from backend.scheduler import enqueue_price_update, cancel_price_update, PriceUpdateRunning
+from backend.services.fetch_runs import run_progress
+from backend.services.history import columnar_series, HISTORY_PAGE_MAX
+from backend.services.epoch import epoch_day, from_epoch_day
+from backend.services.price_cache import resolve_range, load_series, read_series
 from pydantic import BaseModel, field_validator
-from typing import List, Optional
+from typing import List, Literal, Optional
 from datetime import date, datetime
 
 router = APIRouter(
@@ -37,37 +42,95 @@ class AssetResponse(AssetBase):
 
 class PricePoint(BaseModel):
     date: datetime # Changed date -> datetime
-    price: float
+    price: float # Close of the bucket for week/month
+    open: Optional[float] = None # Only set for week/month
+    high: Optional[float] = None
+    low: Optional[float] = None
 
 class AssetDetailResponse(AssetResponse):
+    resolution: str = "day" # Resolution the history was served at
+    next_cursor: Optional[int] = None # Pass as cursor to read the next page (only with limit)
     history: List[PricePoint] = []
 
+class FetchJobCreated(BaseModel):
+    job_id: Optional[int] = None # None when nothing needed a price
+    deduplicated: bool # True if the trigger joined an update that was already running
+    message: str
+
+class FetchJobStatus(BaseModel):
+    job_id: int
+    status: str # FetchRunStatus
+    mode: Optional[str] = None
+    total: int
+    done: int
+    failed: int
+    remaining: int
+    started_at: Optional[datetime] = None
+    updated_at: Optional[datetime] = None
+    finished_at: Optional[datetime] = None
+    eta_seconds: Optional[float] = None
+
 @router.get("/", response_model=List[AssetResponse])
-async def read_assets(skip: int = 0, limit: int = 100, db: AsyncSession = Depends(get_db)):
+async def read_assets(skip: int = 0, limit: int = 100, db: AsyncSession = Depends(get_read_db)):
     result = await db.execute(select(Asset).offset(skip).limit(limit))
     assets = result.scalars().all()
     return assets
 
 @router.get("/{asset_id}", response_model=AssetDetailResponse)
-async def read_asset_detail(asset_id: int, db: AsyncSession = Depends(get_db)):
+async def read_asset_detail(
+    asset_id: int,
+    start: Optional[date] = None,
+    end: Optional[date] = None,
+    resolution: Literal["auto", "day", "week", "month"] = "auto",
+    cursor: Optional[int] = None, # next_cursor of the previous page (epoch day of its last point)
+    limit: Optional[int] = Query(None, ge=1, le=HISTORY_PAGE_MAX),
+    format: Literal["points", "columnar"] = "points",
+    delta: bool = False, # columnar only: delta-encode days and prices (the smallest and fastest format, for charts)
+    db: AsyncSession = Depends(get_read_db)
+):
     result = await db.execute(select(Asset).filter(Asset.id == asset_id))
     asset = result.scalars().first()
     if not asset:
         raise HTTPException(status_code=404, detail="Asset not found")
     
-    # History sorted by date
-    history_result = await db.execute(
-        select(PriceHistory)
-        .filter(PriceHistory.asset_id == asset_id)
-        .order_by(PriceHistory.date.asc())
-    )
-    history = history_result.scalars().all()
+    # History sorted by trading day, from the in-memory price series (the database is read on a miss);
+    # long ranges are served as weekly/monthly bars
+    start, end, resolution = await resolve_range(db, [asset_id], start, end, resolution)
+    after = from_epoch_day(cursor) if cursor is not None else None
+    fetch = limit + 1 if limit else None # One extra row tells whether there is a next page
+
+    if format == "columnar":
+        # Parallel arrays instead of one object per point, built without pydantic
+        rows = await read_series(db, [asset_id], resolution, start, end, after, fetch, fields=("day", "price"))
+        next_cursor = None
+        if limit and len(rows) > limit:
+            rows = rows[:limit]
+            next_cursor = epoch_day(rows[-1][0])
+        return JSONResponse({
+            "id": asset.id,
+            "code": asset.code,
+            "name": asset.name,
+            "type": asset.type,
+            "resolution": resolution,
+            "next_cursor": next_cursor,
+            "format": "columnar",
+            "delta": delta,
+            **columnar_series(rows, delta),
+        })
+
+    history = await load_series(db, [asset_id], resolution, start, end, after, fetch)
+    next_cursor = None
+    if limit and len(history) > limit:
+        history = history[:limit]
+        next_cursor = epoch_day(history[-1]["day"])
     
     return {
         "id": asset.id,
         "code": asset.code,
         "name": asset.name,
         "type": asset.type,
+        "resolution": resolution,
+        "next_cursor": next_cursor,
         "history": history
     }
 
@@ -86,9 +149,9 @@ async def create_asset(asset: AssetCreate, db: AsyncSession = Depends(get_db)):
     await db.refresh(new_asset)
     return new_asset
 
-@router.post("/fetch-prices")
+@router.post("/fetch-prices", response_model=FetchJobCreated, status_code=status.HTTP_202_ACCEPTED)
 async def trigger_fetch_prices(
-    db: AsyncSession = Depends(get_db),
+    mode: Optional[Literal["page", "crawler"]] = None,
     current_user: User = Depends(get_current_user)
 ):
     if not current_user.is_superuser:
@@ -97,5 +160,44 @@ async def trigger_fetch_prices(
             detail="Only admin users can trigger price updates"
         )
     
-    await fetch_fund_prices(db)
-    return {"message": "Price fetch triggered successfully"}
+    # Runs in the background; a trigger while an update is running joins that job
+    try:
+        job_id, deduplicated = await enqueue_price_update(mode=mode)
+    except PriceUpdateRunning:
+        raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail="A price update or history archive is in progress")
+    if job_id is None:
+        return {"job_id": None, "deduplicated": False, "message": "All prices are up to date"}
+    message = "Price fetch already running" if deduplicated else "Price fetch started"
+    return {"job_id": job_id, "deduplicated": deduplicated, "message": message}
+
+@router.get("/fetch-prices/{job_id}", response_model=FetchJobStatus)
+async def read_fetch_job(
+    job_id: int,
+    db: AsyncSession = Depends(get_read_db),
+    current_user: User = Depends(get_current_reader)
+):
+    run = await db.get(FetchRun, job_id)
+    if not run:
+        raise HTTPException(status_code=404, detail="Fetch job not found")
+    return run_progress(run)
+
+@router.post("/fetch-prices/{job_id}/cancel", response_model=FetchJobStatus)
+async def cancel_fetch_job(
+    job_id: int,
+    db: AsyncSession = Depends(get_db),
+    current_user: User = Depends(get_current_user)
+):
+    if not current_user.is_superuser:
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Only admin users can cancel price updates"
+        )
+
+    run = await db.get(FetchRun, job_id)
+    if not run:
+        raise HTTPException(status_code=404, detail="Fetch job not found")
+    if not await cancel_price_update(run):
+        raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail=f"Fetch job is already {run.status.lower()}")
+
+    await db.refresh(run)
+    return run_progress(run)
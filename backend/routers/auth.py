@@ -5,7 +5,7 @@ from pydantic import BaseModel
 from datetime import timedelta
 from backend.database import get_db
 from backend.models import User
-from backend.security import get_password_hash, verify_password, create_access_token, ACCESS_TOKEN_EXPIRE_MINUTES, get_current_user
+from backend.security import get_password_hash, verify_password, create_access_token, ACCESS_TOKEN_EXPIRE_MINUTES, get_current_user, get_current_reader
 import shutil
 import os
 from pathlib import Path
@@ -135,7 +135,7 @@ async def login_for_access_token(user_data: UserLogin, db: AsyncSession = Depend
     }
 
 @router.get("/me", response_model=UserRead)
-async def read_users_me(current_user: User = Depends(get_current_user)):
+async def read_users_me(current_user: User = Depends(get_current_reader)):
     return current_user
 
 @router.put("/me", response_model=UserRead)
@@ -1,12 +1,15 @@
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select, func, cast, Date
-from backend.database import get_db
-from backend.models import Portfolio, Asset, PriceHistory, User, Order, OrderType
-from backend.security import get_current_user
+from sqlalchemy import select
+from backend.database import get_db, get_read_db
+from backend.models import Portfolio, Asset, LatestPrice, User, Order, OrderType
+from backend.services import price_cache
+from backend.services.price_cache import resolve_range
+from backend.services.portfolio_snapshots import read_history
+from backend.security import get_current_user, get_current_reader
 from pydantic import BaseModel
-from typing import List
-from datetime import datetime
+from typing import List, Literal, Optional
+from datetime import date, datetime
 
 router = APIRouter(
     prefix="/portfolio",
@@ -40,8 +43,9 @@ class OrderResponse(BaseModel):
 class PortfolioHistoryItem(BaseModel):
     date: str
     total_value: float
-    total_cost: float
-    total_profit: float
+    total_cost: float # Cost basis of the positions held on that date
+    total_profit: float # Unrealized: total_value - total_cost
+    realized_profit: float = 0.0 # Realized by sells up to that date
 
 class PortfolioItemResponse(PortfolioBase):
     id: int
@@ -57,67 +61,56 @@ class PortfolioItemResponse(PortfolioBase):
 
 @router.get("/", response_model=List[PortfolioItemResponse])
 async def read_portfolio(
-    db: AsyncSession = Depends(get_db),
-    current_user: User = Depends(get_current_user)
+    db: AsyncSession = Depends(get_read_db),
+    current_user: User = Depends(get_current_reader)
 ):
-    # 1. Fetch user portfolio
-    result = await db.execute(select(Portfolio).filter(Portfolio.user_id == current_user.id))
-    items = result.scalars().all()
+    # 1. Fetch user portfolio together with its assets (one joined query, no per-holding lookups)
+    result = await db.execute(
+        select(Portfolio.id, Portfolio.asset_id, Portfolio.quantity, Portfolio.average_cost, Asset.code, Asset.name)
+        .join(Asset, Asset.id == Portfolio.asset_id)
+        .filter(Portfolio.user_id == current_user.id)
+    )
+    items = result.all()
     
     if not items:
         return []
 
-    # 2. Get all asset IDs in portfolio
-    asset_ids = [item.asset_id for item in items]
-
-    # 3. Batch Fetch Latest Prices (Optimized Query)
-    subquery = select(
-        PriceHistory.asset_id,
-        func.max(PriceHistory.date).label('max_date')
-    ).filter(PriceHistory.asset_id.in_(asset_ids)).group_by(PriceHistory.asset_id).subquery()
-
-    latest_prices_stmt = select(PriceHistory).join(
-        subquery,
-        (PriceHistory.asset_id == subquery.c.asset_id) & 
-        (PriceHistory.date == subquery.c.max_date)
-    )
-    latest_prices_result = await db.execute(latest_prices_stmt)
-    latest_prices = latest_prices_result.scalars().all()
-
-    # Map prices for O(1) lookup
-    price_map = {p.asset_id: p.price for p in latest_prices}
+    # 2. Batch Fetch Latest Prices (last point of the in-memory price series)
+    price_map = await price_cache.latest_prices(db, [item.asset_id for item in items])
     
+    # 3. Build the response rows (validated against PortfolioItemResponse by FastAPI)
     result_list = []
     for item in items:
-        asset = await db.get(Asset, item.asset_id)
-        
         # Get price from map
-        current_price = price_map.get(asset.id, item.average_cost)
+        current_price = price_map.get(item.asset_id, item.average_cost)
         
         total_value = item.quantity * current_price
         cost_basis = item.quantity * item.average_cost
         profit_loss = total_value - cost_basis
-        profit_loss_percent = (profit_loss / cost_basis * 100) if cost_basis > 0 else 0
+        profit_loss_percent = (profit_loss / cost_basis * 100) if cost_basis > 0 else 0.0
         
-        result_list.append(PortfolioItemResponse(
-            id=item.id,
-            asset_id=asset.id,
-            quantity=item.quantity,
-            average_cost=item.average_cost,
-            asset_code=asset.code,
-            asset_name=asset.name,
-            current_price=current_price,
-            total_value=total_value,
-            profit_loss=profit_loss,
-            profit_loss_percent=profit_loss_percent
-        ))
+        result_list.append({
+            "asset_id": item.asset_id,
+            "quantity": item.quantity,
+            "average_cost": item.average_cost,
+            "id": item.id,
+            "asset_code": item.code,
+            "asset_name": item.name,
+            "current_price": current_price,
+            "total_value": total_value,
+            "profit_loss": profit_loss,
+            "profit_loss_percent": profit_loss_percent,
+        })
         
     return result_list
 
 @router.get("/history", response_model=List[PortfolioHistoryItem])
 async def read_portfolio_history(
-    db: AsyncSession = Depends(get_db),
-    current_user: User = Depends(get_current_user)
+    start: Optional[date] = None,
+    end: Optional[date] = None,
+    resolution: Literal["auto", "day", "week", "month"] = "auto",
+    db: AsyncSession = Depends(get_read_db),
+    current_user: User = Depends(get_current_reader)
 ):
     # 1. Fetch user portfolio
     result = await db.execute(select(Portfolio).filter(Portfolio.user_id == current_user.id))
@@ -126,89 +119,20 @@ async def read_portfolio_history(
     if not items:
         return []
 
-    # Map asset quantities for simulation
-    portfolio_map = {item.asset_id: {"quantity": item.quantity, "avg_cost": item.average_cost} for item in items}
-    asset_ids = list(portfolio_map.keys())
+    asset_ids = [item.asset_id for item in items]
 
-    # 2. Get history prices for these assets
-    # We select all history first, then process in Python to avoid SQLite date casting issues
-    history_stmt = select(
-        PriceHistory.date,
-        PriceHistory.asset_id,
-        PriceHistory.price
-    ).filter(
-        PriceHistory.asset_id.in_(asset_ids)
-    ).order_by(PriceHistory.date)
-    
-    history_result = await db.execute(history_stmt)
-    history_rows = history_result.all()
-    
-    # 3. Aggregate in Python with forward-fill
-    date_asset_price_map = {}
-    all_dates = set()
-    
-    for row in history_rows:
-        # row.date might be string or datetime depending on SQLite driver config
-        # Safe handling
-        raw_date = row.date
-        if isinstance(raw_date, str):
-            try:
-                dt = datetime.fromisoformat(raw_date)
-                day = dt.date()
-            except:
-                 # Fallback if format is different
-                 day = datetime.now().date() # Should not happen ideally
-        else:
-            day = raw_date.date()
-            
-        if day not in date_asset_price_map:
-            date_asset_price_map[day] = {}
-        # If multiple entries for same day, last one wins (due to order_by)
-        date_asset_price_map[day][row.asset_id] = row.price
-        all_dates.add(day)
-        
-    sorted_dates = sorted(list(all_dates))
-    
-    response = []
-    last_known_prices = {} # asset_id -> price
-    
-    for day in sorted_dates:
-        # Update prices for today
-        if day in date_asset_price_map:
-            for asset_id, price in date_asset_price_map[day].items():
-                last_known_prices[asset_id] = price
-        
-        # Calculate totals
-        daily_value = 0.0
-        daily_cost = 0.0
-        
-        for asset_id, item_data in portfolio_map.items():
-            # Only include assets we have a price for (or have seen a price for)
-            if asset_id in last_known_prices:
-                qty = item_data["quantity"]
-                cost = item_data["avg_cost"]
-                price = last_known_prices[asset_id]
-                
-                daily_value += qty * price
-                daily_cost += qty * cost
-        
-        # Only add to response if we have some value (optional)
-        profit = daily_value - daily_cost
-        
-        response.append(PortfolioHistoryItem(
-            date=day.strftime("%Y-%m-%d"),
-            total_value=daily_value,
-            total_cost=daily_cost,
-            total_profit=profit
-        ))
-        
-    return response
+    # 2. Resolve the range; long ranges are served as weekly/monthly points
+    start, end, resolution = await resolve_range(db, asset_ids, start, end, resolution)
+
+    # 3. Daily values precomputed in portfolio_daily_snapshot (prices forward-filled, holdings from
+    # the order ledger); only days after the last snapshot are valued here
+    return await read_history(db, current_user.id, resolution, start, end)
 
 @router.get("/asset/{asset_id}", response_model=PortfolioItemResponse)
 async def read_portfolio_asset(
     asset_id: int, 
-    db: AsyncSession = Depends(get_db),
-    current_user: User = Depends(get_current_user)
+    db: AsyncSession = Depends(get_read_db),
+    current_user: User = Depends(get_current_reader)
 ):
     result = await db.execute(
         select(Portfolio).filter(Portfolio.user_id == current_user.id, Portfolio.asset_id == asset_id)
@@ -221,15 +145,8 @@ async def read_portfolio_asset(
          raise HTTPException(status_code=404, detail="Asset not found")
 
     # Get latest price
-    last_price_stmt = select(PriceHistory)\
-        .filter(PriceHistory.asset_id == asset.id)\
-        .order_by(PriceHistory.date.desc())\
-        .limit(1)
-        
-    last_price_result = await db.execute(last_price_stmt)
-    last_price_entry = last_price_result.scalars().first()
-    
-    current_price = last_price_entry.price if last_price_entry else 0
+    latest = await db.get(LatestPrice, asset.id)
+    current_price = latest.price if latest else 0
 
     if not item:
         # User doesn't own this asset yet, return empty/zero state
@@ -354,8 +271,8 @@ async def create_order(
 @router.get("/orders/{asset_id}", response_model=List[OrderResponse])
 async def get_asset_orders(
     asset_id: int,
-    db: AsyncSession = Depends(get_db),
-    current_user: User = Depends(get_current_user)
+    db: AsyncSession = Depends(get_read_db),
+    current_user: User = Depends(get_current_reader)
 ):
     # Find portfolio
     result = await db.execute(select(Portfolio).filter(
@@ -0,0 +1,54 @@
+from fastapi import APIRouter, Depends
+from pydantic import BaseModel
+from backend.models import User
+from backend.security import get_current_reader
+from backend.scheduler import scheduler_status
+from backend.services import metrics
+from typing import Dict, Optional
+from datetime import datetime, date
+
+router = APIRouter(
+    prefix="/scheduler",
+    tags=["scheduler"]
+)
+
+class LastRun(BaseModel):
+    trigger: str # scheduled or manual
+    run_id: Optional[int] = None # FetchRun (job) id, None if nothing was due
+    started_at: datetime
+    finished_at: Optional[datetime] = None
+    status: str # running, completed, failed or cancelled
+
+class RequestReport(BaseModel):
+    day: date
+    expected: int # One TEFAS request per tracked fund on business days
+    actual: int
+
+class SchedulerStatus(BaseModel):
+    is_leader: bool # This worker runs the scheduled jobs
+    leader: Optional[str] = None # <hostname>:<pid> of the leader
+    leader_renewed_at: Optional[datetime] = None
+    running: bool # A price update is in progress
+    next_run_at: Optional[datetime] = None
+    last_run: Optional[LastRun] = None
+    requests_today: Optional[RequestReport] = None
+
+class MetricSummary(BaseModel):
+    count: int
+    sum: float
+    p50: Optional[float] = None
+    p99: Optional[float] = None
+
+class MetricsSnapshot(BaseModel):
+    counters: Dict[str, float] # fetch.requests, fetch.<outcome>, fetch.hedges, price_cache.hits, ...
+    gauges: Dict[str, float] # fetch.rate.<host>, price_cache.bytes, ...
+    summaries: Dict[str, MetricSummary] # fetch.latency_ms, fetch.fund_ms, fetch.db_write_ms, ...
+
+@router.get("/status", response_model=SchedulerStatus)
+async def read_scheduler_status(current_user: User = Depends(get_current_reader)):
+    return await scheduler_status()
+
+@router.get("/metrics", response_model=MetricsSnapshot)
+async def read_metrics(current_user: User = Depends(get_current_reader)):
+    # The registry of the worker that serves the request (metrics are kept per process)
+    return metrics.snapshot()
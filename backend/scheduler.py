@@ -1,34 +1,213 @@
-from apscheduler.schedulers.background import BackgroundScheduler
-from backend.services.fetcher import fetch_fund_prices
+from apscheduler.schedulers.asyncio import AsyncIOScheduler
+from backend.services.fetcher import prepare_run, execute_run, FETCH_MODE
+from backend.services.fetch_runs import find_active_run, cancel_run
+from backend.models import FetchRun
 from backend.database import AsyncSessionLocal
+from backend.services.leader import LeaderElector, read_lease
+from backend.services.publication import is_business_day, expected_requests
+from backend.services.archive import archive_closed_months
+from backend.services.portfolio_snapshots import refresh_snapshots
+from backend.services import metrics
 import logging
 import asyncio
-from datetime import datetime, timedelta
+import os
+from datetime import datetime, date, timedelta
 
 logger = logging.getLogger(__name__)
 
-async def update_prices_async():
-    logger.info("Async price update started.")
-    async with AsyncSessionLocal() as db:
+PRICE_UPDATE_JOB = "price_update"
+ARCHIVE_JOB = "archive_history"
+# Scheduled runs only fetch what the publication calendar says is due, so ticks are cheap
+SCHEDULE_TICK_MINUTES = int(os.getenv("SCHEDULE_TICK_MINUTES", "5"))
+
+# Jobs run as tasks on the app's event loop (started from the FastAPI lifespan),
+# so they share the engine's connection pool with the request handlers.
+scheduler = AsyncIOScheduler()
+
+# Single-flight guard: scheduled and manual price updates never overlap
+price_update_lock = asyncio.Lock()
+price_update_task: asyncio.Task | None = None
+# Resolves to the FetchRun id of the update in progress once it is planned (None if nothing was due)
+current_job: asyncio.Future | None = None
+background_tasks = set()
+last_run = {"trigger": None, "run_id": None, "started_at": None, "finished_at": None, "status": None}
+# TEFAS requests of the day: ideal (one per fund) vs. made
+request_report = {"day": None, "expected": 0, "actual": 0}
+
+# With several workers/containers only the elected leader runs scheduled jobs
+elector: LeaderElector | None = None
+
+class PriceUpdateRunning(Exception):
+    """A price update is already in progress."""
+
+async def run_price_update(trigger: str = "scheduled", mode: str | None = None, scheduled: bool = False, job: asyncio.Future | None = None):
+    """
+    Runs one price update unless another one is in progress (raises PriceUpdateRunning).
+    scheduled=True plans by publication window instead of staleness.
+    `job` is resolved with the FetchRun id as soon as the run is planned.
+    """
+    global price_update_task, current_job
+    if price_update_lock.locked():
+        # A trigger waiting on `job` gets the conflict too, and later triggers start afresh
+        if job is not None and not job.done():
+            job.set_exception(PriceUpdateRunning())
+        if current_job is job:
+            current_job = None
+        raise PriceUpdateRunning()
+
+    job = job or asyncio.get_running_loop().create_future()
+    current_job = job
+    async with price_update_lock:
+        price_update_task = asyncio.current_task()
+        last_run.update(trigger=trigger, run_id=None, started_at=datetime.now(), finished_at=None, status="running")
+        requests_before = metrics.snapshot()["counters"].get("fetch.requests", 0)
         try:
-            await fetch_fund_prices(db)
+            mode = mode or FETCH_MODE
+            async with AsyncSessionLocal() as db:
+                await start_request_day(db, date.today())
+                run = await prepare_run(db, mode, scheduled)
+                last_run["run_id"] = run.id if run else None
+                job.set_result(last_run["run_id"])
+                if run is not None:
+                    await execute_run(db, run, mode)
+                    # Append the new days to every portfolio's history snapshots
+                    await refresh_snapshots(db)
+            last_run["status"] = "completed"
+        except asyncio.CancelledError:
+            # Shutdown or cancelled job: the fetch run is checkpointed (resumed next start unless cancelled)
+            last_run["status"] = "cancelled"
+            raise
         except Exception as e:
-            logger.error(f"Error in async price update: {e}")
+            last_run["status"] = "failed"
+            logger.error(f"Error in price update: {e}")
+        finally:
+            if not job.done():
+                job.set_result(None)
+            last_run["finished_at"] = datetime.now()
+            price_update_task = None
+            current_job = None
+            request_report["actual"] += int(metrics.snapshot()["counters"].get("fetch.requests", 0) - requests_before)
+            logger.info(f"TEFAS requests on {request_report['day']}: {request_report['actual']} made, {request_report['expected']} expected.")
+
+async def enqueue_price_update(mode: str | None = None) -> tuple[int | None, bool]:
+    """
+    Starts a manual price update in the background and returns (job id, deduplicated) as
+    soon as it is planned. The job id is the FetchRun id, None if nothing needed a price.
+    A trigger while an update is running (here or on another worker) returns that job;
+    raises PriceUpdateRunning if the update could not start.
+    """
+    global current_job
+    if current_job is not None:
+        return await asyncio.shield(current_job), True
+    async with AsyncSessionLocal() as db:
+        active = await find_active_run(db)
+    if active is not None:
+        return active.id, True
+    # The lock may have been taken while we were reading
+    if current_job is not None:
+        return await asyncio.shield(current_job), True
+    if price_update_lock.locked():
+        # Held without a job: the history archive is writing, there is nothing to join
+        raise PriceUpdateRunning()
+
+    job = asyncio.get_running_loop().create_future()
+    current_job = job
+    task = asyncio.create_task(run_manual_update(mode, job))
+    background_tasks.add(task)
+    task.add_done_callback(background_tasks.discard)
+    return await asyncio.shield(job), False
 
-def update_prices_job():
+async def run_manual_update(mode: str | None, job: asyncio.Future):
+    try:
+        await run_price_update(trigger="manual", mode=mode, job=job)
+    except PriceUpdateRunning:
+        # Lost the lock to a scheduled job; `job` already carries the conflict to the trigger
+        logger.info("Price update already running, manual trigger rejected.")
+
+async def cancel_price_update(run: FetchRun) -> bool:
+    """
+    Cancels a fetch job. The run is marked CANCELLED in the database (a worker elsewhere
+    stops at its next chunk); if it runs in this process its task is cancelled right away.
+    """
+    async with AsyncSessionLocal() as db:
+        run = await db.get(FetchRun, run.id)
+        cancelled = await cancel_run(db, run)
+    task = price_update_task
+    if cancelled and task and not task.done() and last_run["run_id"] == run.id:
+        task.cancel()
+    return cancelled
+
+async def start_request_day(db, today: date):
+    if request_report["day"] == today:
+        return
+    if request_report["day"] is not None:
+        logger.info(f"TEFAS requests on {request_report['day']}: {request_report['actual']} made, {request_report['expected']} expected (final).")
+    request_report.update(day=today, expected=await expected_requests(db, today), actual=0)
+
+async def update_prices_job():
+    if elector is None or not elector.is_leader:
+        logger.info("Not the scheduler leader, skipping scheduled price update.")
+        return
+    if not is_business_day(date.today()):
+        logger.debug("Weekend or market holiday, skipping scheduled price update.")
+        return
     logger.info("Scheduled job started: Price Update")
     try:
-        # Create a new event loop for this thread to run the async task
-        asyncio.run(update_prices_async())
-    except Exception as e:
-        logger.error(f"Scheduler job failed: {e}")
+        await run_price_update(scheduled=True)
+    except PriceUpdateRunning:
+        logger.info("Previous price update still running, skipping this one.")
+        return
     logger.info("Scheduled job finished.")
 
+async def archive_history_job():
+    # Daily, and a no-op until a month closes: moves history older than the kept months to the archive files
+    if elector is None or not elector.is_leader:
+        return
+    # Never interleaves with a price update writing the same rows. It publishes no job:
+    # manual triggers meanwhile are rejected up front (enqueue_price_update) instead of waiting.
+    async with price_update_lock:
+        async with AsyncSessionLocal() as db:
+            await archive_closed_months(db)
+
+def on_elected():
+    # Run once when this process becomes leader (startup, or taking over from a dead leader)
+    scheduler.add_job(update_prices_job, 'date', run_date=datetime.now() + timedelta(seconds=10))
+
 def start_scheduler():
-    scheduler = BackgroundScheduler()
-    # Run every day at 20:00 (TEFAS is usually updated in the evening)
-    scheduler.add_job(update_prices_job, 'cron', minute=0)
-    # Run once on startup (for testing)
-    scheduler.add_job(update_prices_job, 'date', run_date=datetime.now() + timedelta(seconds=10)) 
+    global elector
+    # Tick every few minutes; each tick fetches only the funds inside their publication window.
+    # A run that is still going makes the next tick a no-op.
+    scheduler.add_job(update_prices_job, 'interval', minutes=SCHEDULE_TICK_MINUTES, id=PRICE_UPDATE_JOB, max_instances=1, coalesce=True)
+    scheduler.add_job(archive_history_job, 'cron', hour=3, minute=30, id=ARCHIVE_JOB, max_instances=1, coalesce=True)
     scheduler.start()
+    elector = LeaderElector("scheduler", on_elected=on_elected)
+    elector.start()
     logger.info("Scheduler started.")
+
+async def stop_scheduler():
+    scheduler.shutdown(wait=False)
+    task = price_update_task
+    if task and not task.done():
+        logger.info("Cancelling the running price update...")
+        task.cancel()
+        try:
+            await task
+        except asyncio.CancelledError:
+            pass
+    if elector:
+        # Step down so another worker can take over right away
+        await elector.stop()
+    logger.info("Scheduler stopped.")
+
+async def scheduler_status() -> dict:
+    job = scheduler.get_job(PRICE_UPDATE_JOB) if scheduler.running else None
+    lease = await read_lease("scheduler")
+    return {
+        "is_leader": bool(elector and elector.is_leader),
+        "leader": lease.holder if lease else None,
+        "leader_renewed_at": lease.renewed_at if lease else None,
+        "running": price_update_lock.locked(),
+        "next_run_at": job.next_run_time if job else None,
+        "last_run": dict(last_run) if last_run["started_at"] else None,
+        "requests_today": dict(request_report) if request_report["day"] else None,
+    }
@@ -0,0 +1,241 @@
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import select, delete, func
+from backend.models import PriceHistory
+from backend.services.epoch import epoch_day, from_epoch_day, epoch_micros, from_epoch_micros
+from datetime import date
+from pathlib import Path
+import numpy as np
+import logging
+import os
+
+logger = logging.getLogger(__name__)
+
+# Cold-history archive: closed months of price_history move out of the database into one
+# compact columnar file per asset under ARCHIVE_DIR. History readers merge archived and
+# hot rows (read_archive()); the rollups keep their bars for archived months.
+#
+# File layout (little endian):
+#   header  magic "PHA1" | version u32 | count u64                 16 bytes
+#   days    int32[count]  trading_day as days since 1970-01-01, ascending
+#   (zero padding to a multiple of 8)
+#   prices  float64[count]
+#   stamps  int64[count]  PriceHistory.date as microseconds since 1970-01-01 (naive)
+# Columns are read as views into a read-only memory map (no copies, no parsing).
+# Files are rewritten whole (temp file + rename), so readers never see a partial file.
+
+ARCHIVE_DIR = Path(os.getenv("ARCHIVE_DIR", "./data/archive")) # Lives on the data volume next to the SQLite file
+ARCHIVE_KEEP_MONTHS = int(os.getenv("ARCHIVE_KEEP_MONTHS", "3")) # Closed months kept in the database before archiving
+ARCHIVE_BATCH_SIZE = 500 # Rows deleted per statement (SQLite bound-parameter limit)
+
+MAGIC = b"PHA1"
+VERSION = 1
+HEADER = np.dtype([("magic", "S4"), ("version", "<u4"), ("count", "<u8")])
+
+class ArchiveColumns:
+    """Zero-copy columns of one asset's archive file (numpy views into a memory map)."""
+
+    def __init__(self, days: np.ndarray, prices: np.ndarray, stamps: np.ndarray):
+        self.days = days
+        self.prices = prices
+        self.stamps = stamps
+
+    def __len__(self):
+        return len(self.days)
+
+    def window(self, start: date | None = None, end: date | None = None) -> "ArchiveColumns":
+        """Rows with start <= trading_day <= end (binary search, still views)."""
+        lo = 0 if start is None else int(np.searchsorted(self.days, epoch_day(start), side="left"))
+        hi = len(self.days) if end is None else int(np.searchsorted(self.days, epoch_day(end), side="right"))
+        return ArchiveColumns(self.days[lo:hi], self.prices[lo:hi], self.stamps[lo:hi])
+
+    def head(self, count: int) -> "ArchiveColumns":
+        return ArchiveColumns(self.days[:count], self.prices[:count], self.stamps[:count])
+
+    def tail(self, count: int) -> "ArchiveColumns":
+        start = max(len(self.days) - count, 0)
+        return ArchiveColumns(self.days[start:], self.prices[start:], self.stamps[start:])
+
+    def rows(self):
+        """(trading_day, date, price) tuples."""
+        return [
+            (from_epoch_day(day), from_epoch_micros(stamp), price)
+            for day, stamp, price in zip(self.days.tolist(), self.stamps.tolist(), self.prices.tolist())
+        ]
+
+def archive_path(asset_id: int) -> Path:
+    return ARCHIVE_DIR / f"{asset_id}.pha"
+
+def column_offsets(count: int) -> tuple[int, int, int]:
+    days_at = HEADER.itemsize
+    prices_at = days_at + ((4 * count + 7) // 8) * 8
+    stamps_at = prices_at + 8 * count
+    return days_at, prices_at, stamps_at
+
+def open_archive(asset_id: int) -> ArchiveColumns | None:
+    """Maps an asset's archive file read-only; None if the asset has no archive."""
+    path = archive_path(asset_id)
+    try:
+        buffer = np.memmap(path, dtype=np.uint8, mode="r")
+    except (FileNotFoundError, ValueError): # ValueError: empty file
+        return None
+    header = buffer[:HEADER.itemsize].view(HEADER)[0]
+    if header["magic"] != MAGIC or header["version"] != VERSION:
+        raise ValueError(f"{path} is not a version {VERSION} price archive")
+    count = int(header["count"])
+    days_at, prices_at, stamps_at = column_offsets(count)
+    return ArchiveColumns(
+        buffer[days_at:days_at + 4 * count].view("<i4"),
+        buffer[prices_at:prices_at + 8 * count].view("<f8"),
+        buffer[stamps_at:stamps_at + 8 * count].view("<i8"),
+    )
+
+def read_archive(asset_ids, start: date | None = None, end: date | None = None) -> dict[int, ArchiveColumns]:
+    """asset_id -> archived columns within [start, end], for assets that have an archive."""
+    archives = {}
+    for asset_id in set(asset_ids):
+        columns = open_archive(asset_id)
+        if columns is not None:
+            columns = columns.window(start, end)
+            if len(columns):
+                archives[asset_id] = columns
+    return archives
+
+def archived_asset_ids() -> set[int]:
+    if not ARCHIVE_DIR.exists():
+        return set()
+    return {int(path.stem) for path in ARCHIVE_DIR.glob("*.pha")}
+
+def write_archive(asset_id: int, days: np.ndarray, prices: np.ndarray, stamps: np.ndarray):
+    """Replaces an asset's archive file with the given columns (sorted by day, one row per day)."""
+    count = len(days)
+    days_at, prices_at, stamps_at = column_offsets(count)
+    header = np.array([(MAGIC, VERSION, count)], dtype=HEADER)
+
+    ARCHIVE_DIR.mkdir(parents=True, exist_ok=True)
+    path = archive_path(asset_id)
+    temp = path.with_suffix(".tmp")
+    with open(temp, "wb") as handle:
+        handle.write(header.tobytes())
+        handle.write(days.astype("<i4").tobytes())
+        handle.write(b"\0" * (prices_at - days_at - 4 * count))
+        handle.write(prices.astype("<f8").tobytes())
+        handle.write(stamps.astype("<i8").tobytes())
+        handle.flush()
+        os.fsync(handle.fileno())
+    # Readers holding a map of the old file keep reading it until they drop it
+    os.replace(temp, path)
+
+def merge_into_archive(asset_id: int, rows) -> int:
+    """Adds (trading_day, date, price) rows to an asset's archive; a new row replaces an archived one of the same day."""
+    days = np.array([epoch_day(row[0]) for row in rows], dtype="<i4")
+    stamps = np.array([epoch_micros(row[1], row[0]) for row in rows], dtype="<i8")
+    prices = np.array([row[2] for row in rows], dtype="<f8")
+
+    current = open_archive(asset_id)
+    if current is not None:
+        # Copy out of the map before the file is replaced
+        days = np.concatenate([np.array(current.days), days])
+        prices = np.concatenate([np.array(current.prices), prices])
+        stamps = np.concatenate([np.array(current.stamps), stamps])
+
+    # Keep the last occurrence of every day (new rows come after archived ones), sorted by day
+    order = np.argsort(days, kind="stable")
+    days, prices, stamps = days[order], prices[order], stamps[order]
+    last = np.append(days[1:] != days[:-1], True)
+    write_archive(asset_id, days[last], prices[last], stamps[last])
+    return int(last.sum())
+
+def archive_cutoff(today: date) -> date:
+    """First day kept in the database: the current month plus ARCHIVE_KEEP_MONTHS closed months."""
+    year, month = today.year, today.month - ARCHIVE_KEEP_MONTHS
+    while month < 1:
+        year, month = year - 1, month + 12
+    return date(year, month, 1)
+
+async def archive_closed_months(db: AsyncSession, today: date | None = None) -> dict[str, int]:
+    """
+    Moves price_history rows older than archive_cutoff() into the archive files, one asset
+    at a time: the file is written first, then exactly the rows that went into it are deleted
+    and committed. A crash in between leaves rows in both tiers, which readers resolve in
+    favour of the database and the next run merges again.
+    Returns {"assets": n, "rows": n}.
+    """
+    cutoff = archive_cutoff(today or date.today())
+    result = await db.execute(
+        select(PriceHistory.asset_id).filter(PriceHistory.trading_day < cutoff).distinct()
+    )
+    asset_ids = sorted(result.scalars().all())
+
+    counts = {"assets": 0, "rows": 0}
+    for asset_id in asset_ids:
+        rows_result = await db.execute(
+            select(PriceHistory.id, PriceHistory.trading_day, PriceHistory.date, PriceHistory.price)
+            .filter(
+                PriceHistory.asset_id == asset_id,
+                PriceHistory.trading_day < cutoff,
+                PriceHistory.price.is_not(None),
+            )
+            .order_by(PriceHistory.trading_day)
+        )
+        rows = rows_result.all()
+        if not rows:
+            continue
+        merge_into_archive(asset_id, [(row.trading_day, row.date, row.price) for row in rows])
+
+        ids = [row.id for row in rows]
+        for i in range(0, len(ids), ARCHIVE_BATCH_SIZE):
+            await db.execute(delete(PriceHistory).where(PriceHistory.id.in_(ids[i:i + ARCHIVE_BATCH_SIZE])))
+        await db.commit()
+        counts["assets"] += 1
+        counts["rows"] += len(rows)
+
+    logger.info(f"Archived {counts['rows']} price rows of {counts['assets']} assets (before {cutoff}).")
+    return counts
+
+async def archive_stats(db: AsyncSession) -> dict:
+    """Row counts of both tiers and the archive's size on disk."""
+    hot_rows = (await db.execute(select(func.count(PriceHistory.id)))).scalar()
+    asset_ids = archived_asset_ids()
+    archived_rows = sum(len(columns) for columns in map(open_archive, asset_ids) if columns is not None)
+    return {
+        "hot_rows": hot_rows,
+        "archived_rows": archived_rows,
+        "archive_files": len(asset_ids),
+        "archive_bytes": sum(archive_path(asset_id).stat().st_size for asset_id in asset_ids),
+    }
+
+def main():
+    """python -m backend.services.archive [--run] [--vacuum] [--stats]"""
+    import argparse
+    import asyncio
+    from sqlalchemy import text
+    from backend.database import AsyncSessionLocal, engine
+
+    parser = argparse.ArgumentParser(description="Move closed months of price history into the archive files")
+    parser.add_argument("--run", action="store_true", help=f"Archive rows older than the last {ARCHIVE_KEEP_MONTHS} closed months")
+    parser.add_argument("--vacuum", action="store_true", help="VACUUM the SQLite database afterwards to shrink the file")
+    parser.add_argument("--stats", action="store_true", help="Print row counts of both tiers")
+    args = parser.parse_args()
+    if not (args.run or args.vacuum or args.stats):
+        parser.print_help()
+        return
+
+    async def run():
+        async with AsyncSessionLocal() as db:
+            if args.run:
+                counts = await archive_closed_months(db)
+                print(f"Archived {counts['rows']} rows of {counts['assets']} assets.")
+            if args.stats:
+                print(await archive_stats(db))
+        if args.vacuum and engine.dialect.name == "sqlite":
+            async with engine.connect() as conn:
+                await conn.execution_options(isolation_level="AUTOCOMMIT")
+                await conn.execute(text("VACUUM"))
+            print("Vacuumed the database.")
+        await engine.dispose()
+
+    logging.basicConfig(level=logging.INFO)
+    asyncio.run(run())
+
+if __name__ == "__main__":
+    main()
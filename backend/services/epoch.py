@@ -0,0 +1,21 @@
+from datetime import date, datetime, timedelta
+
+# Compact time encoding shared by the archive files, the price series cache, the vectorized
+# valuation and the columnar history format: trading days as days since 1970-01-01 and
+# timestamps as (naive) microseconds since 1970-01-01.
+
+EPOCH = datetime(1970, 1, 1)
+EPOCH_ORDINAL = EPOCH.toordinal()
+
+def epoch_day(day: date) -> int:
+    return day.toordinal() - EPOCH_ORDINAL
+
+def from_epoch_day(value: int) -> date:
+    return date.fromordinal(EPOCH_ORDINAL + value)
+
+def epoch_micros(stamp: datetime | None, day: date) -> int:
+    """A PriceHistory.date (midnight of its trading day if missing) in microseconds."""
+    return ((stamp or datetime.combine(day, datetime.min.time())) - EPOCH) // timedelta(microseconds=1)
+
+def from_epoch_micros(value: int) -> datetime:
+    return EPOCH + timedelta(microseconds=value)
@@ -0,0 +1,119 @@
+from bs4 import BeautifulSoup
+import html
+import logging
+import os
+import re
+
+logger = logging.getLogger(__name__)
+
+# Extractor used first; "soup" is always kept as the fallback
+FETCH_EXTRACTOR = os.getenv("FETCH_EXTRACTOR", "scan")
+# Also run the soup extractor on successful fast-path reads and warn when they disagree
+FETCH_EXTRACTOR_VALIDATE = os.getenv("FETCH_EXTRACTOR_VALIDATE", "false").lower() == "true"
+
+CAPTCHA_RE = re.compile(rb"captcha|support id", re.IGNORECASE)
+# top-list as one whitespace-separated token of the class value (not top-list-x or x-top-list)
+TOP_LIST_RE = re.compile(rb"<ul\b[^>]*\bclass\s*=\s*[\"'](?:[^\"']*\s)?top-list(?=[\s\"'])[^>]*>", re.IGNORECASE)
+TAG_RE = re.compile(r"<[^>]*>")
+
+def parse_price_text(price_text: str) -> float:
+    # Format: 5,348167 -> 5.348167 and 1.234,567891 -> 1234.567891
+    clean_price = price_text.replace('.', '').replace(',', '.')
+    return float(clean_price)
+
+def scan_price(content: bytes) -> float | None:
+    """
+    Fast path: finds the first <span> of the first <li> under ul.top-list with plain
+    byte searches, without building a DOM. Stops reading right after that span.
+    """
+    match = TOP_LIST_RE.search(content)
+    if not match:
+        return None
+
+    list_end = content.find(b"</ul", match.end())
+    if list_end < 0:
+        list_end = len(content)
+    li_start = content.find(b"<li", match.end(), list_end)
+    if li_start < 0:
+        return None
+
+    li_end = content.find(b"</li", li_start, list_end)
+    if li_end < 0:
+        li_end = list_end
+    span_start = content.find(b"<span", li_start, li_end)
+    if span_start < 0:
+        return None
+
+    text_start = content.find(b">", span_start) + 1
+    text_end = content.find(b"</span", text_start)
+    if text_start <= 0 or text_end < 0:
+        return None
+
+    price_text = TAG_RE.sub("", content[text_start:text_end].decode("utf-8", "replace"))
+    return parse_price_text(html.unescape(price_text).strip())
+
+def soup_price(content: bytes) -> float | None:
+    """Reference extractor: full BeautifulSoup parse of the page."""
+    soup = BeautifulSoup(content, 'html.parser')
+
+    # Find top-list ul
+    top_list = soup.find('ul', class_='top-list')
+    if not top_list:
+        return None
+        
+    # Get first li element which usually contains the Last Price
+    first_li = top_list.find('li')
+    if not first_li:
+        return None
+        
+    # Find the span inside the li that contains the value
+    span = first_li.find('span')
+    if not span:
+        return None
+
+    return parse_price_text(span.get_text(strip=True))
+
+EXTRACTORS = {
+    "scan": scan_price,
+    "soup": soup_price,
+}
+
+def is_captcha_page(content: bytes) -> bool:
+    return CAPTCHA_RE.search(content) is not None
+
+def extract_price(content: bytes, fund_code: str, extractor: str | None = None) -> float | None:
+    """
+    Reads the last price from a FonAnaliz.aspx page.
+    Tries the configured extractor first and falls back to BeautifulSoup when it finds nothing.
+    Returns None on CAPTCHA/WAF pages or unexpected markup.
+    """
+    name = extractor or FETCH_EXTRACTOR
+    try:
+        price = EXTRACTORS[name](content)
+    except ValueError:
+        price = None
+
+    if price is not None:
+        if FETCH_EXTRACTOR_VALIDATE and name != "soup":
+            try:
+                reference = soup_price(content)
+            except ValueError:
+                reference = None
+            if reference != price:
+                logger.warning(f"Extractor '{name}' read {price} for {fund_code}, BeautifulSoup read {reference}")
+                return reference
+        return price
+
+    # A fund page always has a top-list, so only failed reads are checked for WAF markers
+    if is_captcha_page(content):
+        logger.warning(f"CAPTCHA/WAF detected for {fund_code}")
+        return None
+
+    if name != "soup":
+        try:
+            price = soup_price(content)
+        except ValueError:
+            price = None
+        if price is not None:
+            logger.warning(f"Extractor '{name}' missed the price of {fund_code}, BeautifulSoup fallback read {price}")
+    return price
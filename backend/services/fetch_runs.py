@@ -0,0 +1,191 @@
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import select, insert, or_
+from backend.models import Asset, FetchRun, FetchRunItem, FetchRunStatus, FetchItemStatus, PriceSourceStat
+from backend.services.leader import process_id
+from datetime import datetime, timedelta
+import logging
+import os
+
+logger = logging.getLogger(__name__)
+
+# Unfinished runs younger than this are resumed instead of starting a new one
+FETCH_RUN_RESUME_HOURS = float(os.getenv("FETCH_RUN_RESUME_HOURS", "12"))
+# A RUNNING run without progress for this long no longer counts as an active job
+FETCH_JOB_STALL_SECONDS = int(os.getenv("FETCH_JOB_STALL_SECONDS", "900"))
+
+async def find_resumable_run(db: AsyncSession) -> FetchRun | None:
+    """
+    Returns the latest RUNNING/INTERRUPTED run if it is recent enough to resume.
+    Older unfinished runs are marked ABANDONED.
+    """
+    result = await db.execute(
+        select(FetchRun)
+        .filter(FetchRun.status.in_([FetchRunStatus.RUNNING.value, FetchRunStatus.INTERRUPTED.value]))
+        .order_by(FetchRun.id.desc())
+    )
+    runs = result.scalars().all()
+    if not runs:
+        return None
+
+    resume_after = datetime.now() - timedelta(hours=FETCH_RUN_RESUME_HOURS)
+    run = runs[0] if runs[0].started_at and runs[0].started_at > resume_after else None
+    for stale in runs:
+        if stale is not run:
+            stale.status = FetchRunStatus.ABANDONED.value
+            stale.finished_at = datetime.now()
+            logger.info(f"Abandoning fetch run {stale.id} ({stale.done}/{stale.total} done).")
+
+    if run:
+        run.status = FetchRunStatus.RUNNING.value
+        run.worker = process_id()
+        run.updated_at = datetime.now()
+        logger.info(f"Resuming fetch run {run.id} from checkpoint ({run.done}/{run.total} done, {run.failed} failed).")
+    await db.commit()
+    return run
+
+async def create_run(db: AsyncSession, mode: str, assets: list[Asset]) -> FetchRun:
+    """Persists a new run with one PENDING item per asset, in the given dispatch order."""
+    run = FetchRun(
+        mode=mode,
+        status=FetchRunStatus.RUNNING.value,
+        started_at=datetime.now(),
+        updated_at=datetime.now(),
+        total=len(assets),
+        done=0,
+        failed=0,
+        worker=process_id(),
+    )
+    db.add(run)
+    await db.flush()
+
+    if assets:
+        await db.execute(insert(FetchRunItem), [
+            {"run_id": run.id, "asset_id": asset.id, "position": position, "status": FetchItemStatus.PENDING.value}
+            for position, asset in enumerate(assets)
+        ])
+    await db.commit()
+    logger.info(f"Started fetch run {run.id} for {len(assets)} assets ({mode} mode).")
+    return run
+
+async def load_open_items(db: AsyncSession, run: FetchRun) -> list[tuple[FetchRunItem, Asset]]:
+    """Items of the run that still need work (PENDING, or FAILED in a previous attempt), in dispatch order."""
+    result = await db.execute(
+        select(FetchRunItem, Asset)
+        .join(Asset, Asset.id == FetchRunItem.asset_id)
+        .filter(
+            FetchRunItem.run_id == run.id,
+            FetchRunItem.status != FetchItemStatus.DONE.value,
+        )
+        .order_by(FetchRunItem.position)
+    )
+    return [(row[0], row[1]) for row in result.all()]
+
+def mark_item(run: FetchRun, item: FetchRunItem, status: FetchItemStatus, price: float | None = None, error: str | None = None):
+    """Moves an item to `status` and keeps the run's done/failed counters in sync."""
+    if item.status == status.value:
+        item.error = error
+        return
+    if item.status == FetchItemStatus.FAILED.value:
+        run.failed -= 1
+    if status == FetchItemStatus.DONE:
+        run.done += 1
+    elif status == FetchItemStatus.FAILED:
+        run.failed += 1
+
+    item.status = status.value
+    item.price = price
+    item.error = error
+    item.updated_at = datetime.now()
+    run.updated_at = item.updated_at
+
+async def finish_run(db: AsyncSession, run: FetchRun, interrupted: bool = False):
+    if await is_cancelled(db, run):
+        run.status = FetchRunStatus.CANCELLED.value
+        run.finished_at = datetime.now()
+        logger.info(f"Fetch run {run.id} cancelled at {run.done}/{run.total}.")
+    elif interrupted:
+        run.status = FetchRunStatus.INTERRUPTED.value
+        logger.warning(f"Fetch run {run.id} interrupted at {run.done}/{run.total}, the next run resumes it.")
+    else:
+        run.status = FetchRunStatus.COMPLETED.value
+        run.finished_at = datetime.now()
+        logger.info(f"Fetch run {run.id} completed: {run.done}/{run.total} done, {run.failed} failed.")
+    run.updated_at = datetime.now()
+    await db.commit()
+
+async def is_cancelled(db: AsyncSession, run: FetchRun) -> bool:
+    """Reads the run's status from the database; cancel_run() may have changed it from another session."""
+    result = await db.execute(select(FetchRun.status).filter(FetchRun.id == run.id))
+    return result.scalar() == FetchRunStatus.CANCELLED.value
+
+async def find_active_run(db: AsyncSession) -> FetchRun | None:
+    """
+    The RUNNING run of another worker, if it made progress within FETCH_JOB_STALL_SECONDS
+    (otherwise that worker is gone). Callers check their own process's job first, so a
+    RUNNING run of this process has no live job behind it and never matches.
+    """
+    result = await db.execute(
+        select(FetchRun)
+        .filter(
+            FetchRun.status == FetchRunStatus.RUNNING.value,
+            FetchRun.updated_at > datetime.now() - timedelta(seconds=FETCH_JOB_STALL_SECONDS),
+            or_(FetchRun.worker.is_(None), FetchRun.worker != process_id()),
+        )
+        .order_by(FetchRun.id.desc())
+        .limit(1)
+    )
+    return result.scalars().first()
+
+async def cancel_run(db: AsyncSession, run: FetchRun) -> bool:
+    """Marks an unfinished run CANCELLED; its worker stops at the next chunk. False if it already finished."""
+    if run.status not in (FetchRunStatus.RUNNING.value, FetchRunStatus.INTERRUPTED.value):
+        return False
+    run.status = FetchRunStatus.CANCELLED.value
+    run.updated_at = datetime.now()
+    if run.finished_at is None:
+        run.finished_at = run.updated_at
+    await db.commit()
+    logger.info(f"Fetch run {run.id} cancelled at {run.done}/{run.total}.")
+    return True
+
+def run_progress(run: FetchRun) -> dict:
+    """done/total/failed of a run plus an ETA from its average pace so far."""
+    processed = (run.done or 0) + (run.failed or 0)
+    remaining = max(0, (run.total or 0) - processed)
+    eta_seconds = None
+    if run.status == FetchRunStatus.RUNNING.value and processed and run.started_at:
+        elapsed = (datetime.now() - run.started_at).total_seconds()
+        eta_seconds = round(remaining * elapsed / processed, 1)
+    return {
+        "job_id": run.id,
+        "status": run.status,
+        "mode": run.mode,
+        "total": run.total or 0,
+        "done": run.done or 0,
+        "failed": run.failed or 0,
+        "remaining": remaining,
+        "started_at": run.started_at,
+        "updated_at": run.updated_at,
+        "finished_at": run.finished_at,
+        "eta_seconds": eta_seconds,
+    }
+
+async def load_source_stats(db: AsyncSession, provider: str) -> dict[str, dict]:
+    """Persisted stats of a provider's sources, keyed by source name."""
+    result = await db.execute(select(PriceSourceStat).filter(PriceSourceStat.source.startswith(f"{provider}:")))
+    return {
+        stat.source.split(":", 1)[1]: {"requests": stat.requests, "success_rate": stat.success_rate, "latency_ms": stat.latency_ms}
+        for stat in result.scalars().all()
+    }
+
+async def save_source_stats(db: AsyncSession, provider: str, stats: dict[str, dict]):
+    for name, values in stats.items():
+        stat = await db.get(PriceSourceStat, f"{provider}:{name}")
+        if stat is None:
+            stat = PriceSourceStat(source=f"{provider}:{name}")
+            db.add(stat)
+        stat.requests = values["requests"]
+        stat.success_rate = values["success_rate"]
+        stat.latency_ms = values["latency_ms"]
+        stat.updated_at = datetime.now()
+    await db.commit()
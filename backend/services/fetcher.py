@@ -1,222 +1,211 @@
-from tefas import Crawler
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import cast, Date, func, select, desc
-from backend.models import Asset, PriceHistory, AssetType
-from datetime import datetime, date, timedelta, time
+from backend.models import Asset, FetchRun, FetchRunItem, FetchItemStatus
+from backend.services.price_writer import upsert_prices
+from backend.services.price_cache import cache as price_cache
+from backend.services.portfolio_snapshots import invalidate_for_prices
+from backend.services.planner import plan_fetch
+from backend.services.publication import plan_scheduled
+from backend.services.fetch_runs import find_resumable_run, create_run, load_open_items, mark_item, finish_run, is_cancelled, load_source_stats, save_source_stats
+from backend.services.providers import PROVIDERS, PriceProvider
+from backend.services import metrics
+from datetime import datetime, date
+import asyncio
 import logging
-import requests
-from bs4 import BeautifulSoup
+import os
 import time
-import random
 
 # Logger configuration
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
-async def fetch_fund_prices(db: AsyncSession):
-    """
-    Fetches latest prices for all funds in the database from TEFAS web page HTML and saves them.
-    Iterates through all tracked funds and scrapes the price individually.
-    Implements ordering by last update time (oldest first) and retry mechanism.
+FETCH_COMMIT_EVERY = int(os.getenv("FETCH_COMMIT_EVERY", "25"))  # Assets per checkpoint commit
+# "page" fetches each asset through its provider's fetch_many (e.g. FonAnaliz.aspx scraping),
+# "crawler" first pulls date ranges in bulk where the provider supports it (tefas.Crawler).
+# Each mode falls back to the other for the assets it could not price.
+FETCH_MODE = os.getenv("FETCH_MODE", "page")
+
+async def fetch_fund_prices(db: AsyncSession, mode: str | None = None, start: date | None = None, end: date | None = None,
+                            scheduled: bool = False):
     """
-    
-    # 1. Get all assets of type FUND, ordered by last price update date ascending (nulls first)
-    # We want funds that haven't been updated recently to be processed first.
-    
-    # Subquery to find the max date for each asset
-    subquery = (
-        select(PriceHistory.asset_id, func.max(PriceHistory.date).label("last_update"))
-        .group_by(PriceHistory.asset_id)
-        .subquery()
-    )
-
-    # Main query joining Asset with the subquery
-    query = (
-        select(Asset, subquery.c.last_update)
-        .outerjoin(subquery, Asset.id == subquery.c.asset_id)
-        .filter(Asset.type == AssetType.FUND.value)
-        .order_by(subquery.c.last_update.asc().nullsfirst())
-    )
-    
-    result = await db.execute(query)
-    funds_data = result.all()
-    
-    if not funds_data:
-        logger.info("No funds found to track.")
-        return
+    Fetches latest prices for all tracked assets and saves them.
 
-    today = date.today()
-    one_hour_ago = datetime.now() - timedelta(hours=1)
-    new_records_count = 0
-
-    # Initialize Session with browser-like headers
-    session = requests.Session()
-    session.headers.update({
-        'User-Agent': 'Mozilla/5.0 (Macintosh; Intel Mac OS X 10.15; rv:148.0) Gecko/20100101 Firefox/148.0',
-        'Accept': 'text/html,application/xhtml+xml,application/xml;q=0.9,image/avif,image/webp,*/*;q=0.8',
-        'Accept-Language': 'tr-TR,tr;q=0.8,en-US;q=0.5,en;q=0.3',
-        'Accept-Encoding': 'gzip, deflate, br',
-        'Connection': 'keep-alive',
-        'Upgrade-Insecure-Requests': '1',
-        'Sec-Fetch-Dest': 'document',
-        'Sec-Fetch-Mode': 'navigate',
-        'Sec-Fetch-Site': 'none',
-        'Sec-Fetch-User': '?1',
-        'Cache-Control': 'max-age=0',
-    })
-
-    # Initial request to main page to get cookies/session tokens
+    Assets are routed to the provider registered for their type (TEFAS for funds, BIST
+    quotes for stocks) and all providers run concurrently.
+
+    mode="page" prices every asset with the provider's fetch_many (for funds: concurrent
+    FonAnaliz.aspx scraping, dispatched oldest-first).
+    mode="crawler" pulls start..end (default: the last FETCH_CRAWLER_LOOKBACK_DAYS days)
+    in bulk for providers that support it, with a constant number of tefas.Crawler calls.
+    Assets the selected mode could not price are retried with the other one.
+
+    Every run is persisted as a FetchRun with one item per asset and commits every
+    FETCH_COMMIT_EVERY assets. An unfinished run (crash, restart, WAF abort) is resumed
+    from its checkpoint by the next call instead of starting over.
+
+    scheduled=True plans with the publication calendar (services/publication.py) instead
+    of plain staleness, so scheduled runs only fetch what is due.
+    """
+    mode = mode or FETCH_MODE
     try:
-        logger.info("Initializing TEFAS session...")
-        session.get("https://www.tefas.gov.tr/Default.aspx", timeout=10)
-        time.sleep(1) # Wait a bit after initial connection
+        run = await prepare_run(db, mode, scheduled)
     except Exception as e:
-        logger.warning(f"Initial session setup failed, continuing might fail: {e}")
-
-    for row in funds_data:
-        fund = row[0]
-        last_update = row[1]
-        
-        # Check if updated in last 1 hour
-        if last_update:
-            # last_update might be datetime or string depending on DB driver
-            if isinstance(last_update, str):
-                 try:
-                     last_update_dt = datetime.fromisoformat(last_update)
-                 except:
-                     last_update_dt = None
-            else:
-                 last_update_dt = last_update
-                 
-            if last_update_dt and last_update_dt > one_hour_ago:
-                logger.info(f"Skipping {fund.code}, updated recently at {last_update_dt}")
-                continue
+        logger.error(f"Price fetch planning failed: {e}")
+        await db.rollback()
+        return
+    if run is not None:
+        await execute_run(db, run, mode, start, end)
 
-        retry_count = 0
-        max_retries = 10
-        price = None
-        
-        while retry_count < max_retries:
-            try:
-                # Add random delay to avoid WAF blocking (increasing with retries)
-                delay = random.uniform(0.5, 2.0) + (retry_count * 0.5)
-                time.sleep(delay)
-                
-                # Fetch price from web using the shared session
-                price = fetch_fund_price_from_web(fund.code, session)
-                
-                if price is not None:
-                    break # Success
-                
-                # If price is None (e.g. CAPTCHA or parse error), retry
-                retry_count += 1
-                logger.warning(f"Attempt {retry_count}/{max_retries} failed for {fund.code}. Retrying...")
-                
-            except Exception as e:
-                logger.error(f"Error processing fund {fund.code} (Attempt {retry_count + 1}): {e}")
-                retry_count += 1
-        
-        if price is None:
-            logger.error(f"Failed to fetch price for {fund.code} after {max_retries} attempts. Skipping.")
-            continue
-
-        if price == 0:
-            logger.warning(f"Fetched price is 0 for {fund.code}. Skipping update.")
-            continue
-
-        try:
-            # Check existence
-            existing_query = select(PriceHistory).filter(
-                PriceHistory.asset_id == fund.id,
-                cast(PriceHistory.date, Date) == today
-            )
-            existing_result = await db.execute(existing_query)
-            existing_record = existing_result.scalars().first()
-            
-            if existing_record:
-                # Update existing record if needed
-                if existing_record.price != price:
-                    existing_record.price = price
-                    existing_record.date = datetime.now()
-                    logger.info(f"Updated price for {fund.code}: {price}")
+async def prepare_run(db: AsyncSession, mode: str, scheduled: bool = False) -> FetchRun | None:
+    """Resumes the unfinished run or plans a new one. Returns None when nothing needs a price."""
+    run = await find_resumable_run(db)
+    if run is None:
+        assets = []
+        for asset_type in PROVIDERS:
+            if scheduled:
+                assets += await plan_scheduled(db, asset_type)
             else:
-                # Create new record
-                new_record = PriceHistory(
-                    asset_id=fund.id,
-                    date=datetime.now(),
-                    price=price
-                )
-                db.add(new_record)
-                new_records_count += 1
-                logger.info(f"New price for {fund.code}: {price}")
-        except Exception as e:
-             logger.error(f"Database error for {fund.code}: {e}")
+                assets += await plan_fetch(db, asset_type)
+        if not assets:
+            logger.info("No assets need a price update.")
+            return None
+        run = await create_run(db, mode, assets)
+    return run
 
+async def execute_run(db: AsyncSession, run: FetchRun, mode: str, start: date | None = None, end: date | None = None):
+    """Prices the open items of `run` and finishes it."""
     try:
-        await db.commit()
-        if new_records_count > 0:
-            logger.info(f"Successfully added {new_records_count} new price records.")
+        items = await load_open_items(db, run)
+        started = time.monotonic()
+
+        items_by_type = {}
+        for item, asset in items:
+            items_by_type.setdefault(asset.type, []).append((item, asset))
+
+        # One AsyncSession is shared, so providers fetch concurrently but write one at a time
+        write_lock = asyncio.Lock()
+        results = await asyncio.gather(*(
+            fetch_with_provider(db, run, write_lock, PROVIDERS[asset_type], type_items, mode, start, end)
+            for asset_type, type_items in items_by_type.items()
+            if asset_type in PROVIDERS
+        ))
+
+        logger.info(f"Fetched prices for {run.done}/{run.total} assets in {time.monotonic() - started:.1f}s ({mode} mode)")
+        await finish_run(db, run, interrupted=any(results))
+    except asyncio.CancelledError:
+        # Shutdown or cancelled job: leave the run INTERRUPTED (or CANCELLED) rather than RUNNING,
+        # so triggers do not join it; the next run resumes it from its checkpoint
+        await db.rollback()
+        await db.refresh(run)
+        await finish_run(db, run, interrupted=True)
+        raise
     except Exception as e:
-        logger.error(f"Database commit error: {e}")
+        # Everything committed so far is kept; the run stays open and is resumed next time
+        logger.error(f"Price fetch run failed: {e}")
         await db.rollback()
 
-def fetch_fund_price_from_web(fund_code: str, session: requests.Session = None) -> float | None:
+async def fetch_with_provider(db: AsyncSession, run: FetchRun, write_lock: asyncio.Lock, provider_cls: type[PriceProvider],
+                              items: list[tuple[FetchRunItem, Asset]], mode: str, start: date | None, end: date | None) -> bool:
     """
-    Fetches the latest price of a specific fund directly from TEFAS web page HTML.
-    Target URL: https://www.tefas.gov.tr/FonAnaliz.aspx?FonKod={fund_code}
-    Uses a requests.Session if provided to maintain cookies.
+    Prices `items` with one provider, bulk history first in crawler mode, per-asset first
+    otherwise. Returns True if the provider aborted the run.
     """
-    url = f"https://www.tefas.gov.tr/FonAnaliz.aspx?FonKod={fund_code.upper()}"
-    
-    try:
-        # Use provided session or create a new temporary one
-        if session:
-            req_obj = session
-        else:
-            req_obj = requests
-            # If creating new request without session, at least add User-Agent
-            headers = {
-                'User-Agent': 'Mozilla/5.0 (Macintosh; Intel Mac OS X 10.15; rv:148.0) Gecko/20100101 Firefox/148.0'
-            }
-        
-        # If using session, headers are already set in session
-        if session:
-            response = req_obj.get(url, timeout=10)
-        else:
-            response = req_obj.get(url, headers=headers, timeout=10)
-            
-        response.raise_for_status()
-        
-        soup = BeautifulSoup(response.content, 'html.parser')
-        
-        # Check for CAPTCHA/WAF page by looking for specific elements or title
-        if "captcha" in response.text.lower() or "support id" in response.text.lower():
-            logger.warning(f"CAPTCHA/WAF detected for {fund_code}")
-            return None
+    async with provider_cls() as provider:
+        # Source stats from earlier runs decide which upstream source leads (see services/hedging.py)
+        async with write_lock:
+            provider.restore_stats(await load_source_stats(db, provider.name))
+        aborted = await price_items(db, run, write_lock, provider, items, mode, start, end)
+        async with write_lock:
+            await save_source_stats(db, provider.name, provider.export_stats())
+        return aborted
 
-        # Find top-list ul
-        top_list = soup.find('ul', class_='top-list')
-        if not top_list:
-            # logger.warning(f"Could not find .top-list for fund {fund_code}")
-            # Silently fail or log debug to avoid spamming logs if WAF blocks structure
-            return None
-            
-        # Get first li element which usually contains the Last Price
-        first_li = top_list.find('li')
-        if not first_li:
-            return None
-            
-        # Find the span inside the li that contains the value
-        span = first_li.find('span')
-        if not span:
-            return None
-            
-        price_text = span.get_text(strip=True)
-        # Format: 5,348167 -> 5.348167
-        clean_price = price_text.replace('.', '').replace(',', '.')
-        
-        return float(clean_price)
+async def price_items(db: AsyncSession, run: FetchRun, write_lock: asyncio.Lock, provider: PriceProvider,
+                      items: list[tuple[FetchRunItem, Asset]], mode: str, start: date | None, end: date | None) -> bool:
+    if mode == "crawler" and provider.supports_history:
+        quotes = await provider.fetch_history([asset.code for _, asset in items], start, end)
+        for i in range(0, len(items), FETCH_COMMIT_EVERY):
+            await save_quotes(db, run, write_lock, items[i:i + FETCH_COMMIT_EVERY], quotes, attempted=set())
+        missing = [(item, asset) for item, asset in items if asset.code not in quotes]
+        if missing:
+            logger.info(f"{provider.name}: bulk pull returned no price for {len(missing)} assets, falling back to per-asset fetching.")
+        return await fetch_and_save(db, run, write_lock, provider, missing)
 
-    except Exception as e:
-        logger.error(f"Error fetching price for {fund_code} from web: {e}")
-        return None
+    aborted = await fetch_and_save(db, run, write_lock, provider, items)
+    failed = [(item, asset) for item, asset in items if item.status == FetchItemStatus.FAILED.value]
+    if failed and aborted:
+        async with write_lock:
+            if await is_cancelled(db, run):
+                return aborted
+    if failed and provider.supports_history:
+        logger.info(f"{provider.name}: per-asset fetching failed for {len(failed)} assets, falling back to the bulk pull.")
+        history = await provider.fetch_history([asset.code for _, asset in failed])
+        # Only the latest day is of interest here, like a per-asset fetch
+        quotes = {code: [max(days)] for code, days in history.items()}
+        await save_quotes(db, run, write_lock, failed, quotes, attempted=set())
+    return aborted
+
+async def fetch_and_save(db: AsyncSession, run: FetchRun, write_lock: asyncio.Lock, provider: PriceProvider,
+                         items: list[tuple[FetchRunItem, Asset]]) -> bool:
+    """
+    Prices the items with provider.fetch_many in chunks of FETCH_COMMIT_EVERY, committing after each chunk.
+    Returns True if the provider aborted or the run was cancelled (unattempted items stay PENDING).
+    """
+    for i in range(0, len(items), FETCH_COMMIT_EVERY):
+        async with write_lock:
+            if await is_cancelled(db, run):
+                logger.info(f"Fetch run {run.id} was cancelled, {provider.name} stops.")
+                return True
+        chunk = items[i:i + FETCH_COMMIT_EVERY]
+        prices = await provider.fetch_many([asset.code for _, asset in chunk])
+        await save_quotes(db, run, write_lock, chunk, quotes_from_prices(prices), attempted=set(prices))
+        if provider.aborted:
+            return True
+    return False
+
+def quotes_from_prices(prices: dict[str, float | None]) -> dict[str, list[tuple[date, float]]]:
+    """Turns a code -> price mapping from fetch_many into today's quotes, dropping failures."""
+    today = date.today()
+    return {code: [(today, price)] for code, price in prices.items() if price is not None}
+
+async def save_quotes(db: AsyncSession, run: FetchRun, write_lock: asyncio.Lock, items: list[tuple[FetchRunItem, Asset]],
+                      quotes: dict[str, list[tuple[date, float]]], attempted: set[str]):
+    """
+    Upserts the quotes of `items`, updates their checkpoint status and commits.
+    Items with quotes become DONE, items in `attempted` without one become FAILED,
+    the rest are left as they are.
+    """
+    today = date.today()
+    async with write_lock:
+        rows = []
+        for item, asset in items:
+            if asset.code not in quotes:
+                if asset.code in attempted:
+                    logger.error(f"Failed to fetch price for {asset.code}.")
+                    mark_item(run, item, FetchItemStatus.FAILED, error="no price")
+                continue
+
+            asset_rows = []
+            for day, price in quotes[asset.code]:
+                if price == 0:
+                    logger.warning(f"Fetched price is 0 for {asset.code} on {day}. Skipping update.")
+                    continue
+
+                # Today's price is stamped with the fetch time, past days (bulk backfill) with midnight
+                stamp = datetime.now() if day == today else datetime.combine(day, datetime.min.time())
+                asset_rows.append((asset.id, day, stamp, price))
+
+            if asset_rows:
+                rows.extend(asset_rows)
+                mark_item(run, item, FetchItemStatus.DONE, price=asset_rows[-1][3])
+            else:
+                mark_item(run, item, FetchItemStatus.FAILED, error="zero price")
+
+        write_started = time.monotonic()
+        counts = await upsert_prices(db, rows)
+        # Portfolio snapshots from the earliest written day on are recomputed
+        await invalidate_for_prices(db, rows)
+        await db.commit()
+        # Committed: extend the cached series of this process instead of dropping them
+        price_cache.append(rows)
+        metrics.observe("fetch.db_write_ms", (time.monotonic() - write_started) * 1000)
+    if counts["inserted"] > 0:
+        logger.info(f"Successfully added {counts['inserted']} new price records.")
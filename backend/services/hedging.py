@@ -0,0 +1,95 @@
+from collections import deque
+import asyncio
+import os
+
+# Hedged requests: when the primary source is slower than its FETCH_HEDGE_PERCENTILE latency,
+# a second request goes to the best alternate source and the first answer wins.
+FETCH_HEDGE = os.getenv("FETCH_HEDGE", "true").lower() == "true"
+FETCH_HEDGE_PERCENTILE = float(os.getenv("FETCH_HEDGE_PERCENTILE", "95"))
+FETCH_HEDGE_MIN_SAMPLES = int(os.getenv("FETCH_HEDGE_MIN_SAMPLES", "20"))  # Primary latencies needed before hedging on percentiles
+FETCH_HEDGE_MAX_RATIO = float(os.getenv("FETCH_HEDGE_MAX_RATIO", "0.1"))  # Max hedges per primary request
+
+EWMA_ALPHA = 0.1
+DEFAULT_LATENCY_MS = 1000.0
+
+class SourceStats:
+    """Recency-weighted success rate and latency of one price source."""
+
+    def __init__(self, requests: int = 0, success_rate: float = 1.0, latency_ms: float | None = None):
+        self.requests = requests
+        self.success_rate = success_rate
+        self.latency_ms = latency_ms
+        self.recent = deque(maxlen=200)  # This run's latencies, for hedge percentiles
+
+    def record(self, ok: bool, latency_ms: float):
+        self.requests += 1
+        self.success_rate += EWMA_ALPHA * ((1.0 if ok else 0.0) - self.success_rate)
+        if self.latency_ms is None:
+            self.latency_ms = latency_ms
+        else:
+            self.latency_ms += EWMA_ALPHA * (latency_ms - self.latency_ms)
+        self.recent.append(latency_ms)
+
+    def record_latency(self, latency_ms: float):
+        """A request cancelled unanswered after latency_ms: slow, but not a failure."""
+        if self.latency_ms is None:
+            self.latency_ms = latency_ms
+        else:
+            self.latency_ms += EWMA_ALPHA * (latency_ms - self.latency_ms)
+        self.recent.append(latency_ms)
+
+    @property
+    def score(self) -> float:
+        """Expected time to a good answer; lower is better."""
+        return (self.latency_ms or DEFAULT_LATENCY_MS) / max(self.success_rate, 0.05)
+
+    def hedge_delay(self) -> float | None:
+        """Seconds to wait on this source before hedging, None if there is no basis yet."""
+        if len(self.recent) >= FETCH_HEDGE_MIN_SAMPLES:
+            values = sorted(self.recent)
+            index = min(len(values) - 1, int(len(values) * FETCH_HEDGE_PERCENTILE / 100))
+            return values[index] / 1000
+        if self.latency_ms is not None:
+            # Cold start: fall back to the latency remembered from earlier runs
+            return self.latency_ms * 2 / 1000
+        return None
+
+    def to_dict(self) -> dict:
+        return {"requests": self.requests, "success_rate": self.success_rate, "latency_ms": self.latency_ms}
+
+class HedgeBudget:
+    """Caps hedges at `ratio` of primary requests."""
+
+    def __init__(self, ratio: float = FETCH_HEDGE_MAX_RATIO):
+        self.ratio = ratio
+        self.primaries = 0
+        self.hedges = 0
+
+    def primary(self):
+        self.primaries += 1
+
+    def take(self) -> bool:
+        if self.hedges + 1 > self.primaries * self.ratio:
+            return False
+        self.hedges += 1
+        return True
+
+def rank_sources(stats: dict[str, SourceStats], sources: list[str]) -> list[str]:
+    """Sources ordered by score; ties keep the configured order."""
+    return sorted(sources, key=lambda name: stats[name].score)
+
+async def first_success(tasks: list[asyncio.Task]) -> tuple:
+    """
+    Waits for the first task whose result starts with a non-None value and cancels the rest.
+    If none succeeds, returns the last result.
+    """
+    result = None
+    try:
+        for next_done in asyncio.as_completed(tasks):
+            result = await next_done
+            if result[0] is not None:
+                break
+    finally:
+        for task in tasks:
+            task.cancel()
+    return result
@@ -0,0 +1,162 @@
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import select, func, null
+from backend.models import PriceHistory, PriceRollup, RollupResolution
+from backend.services.archive import read_archive
+from backend.services.epoch import epoch_day, from_epoch_day
+from backend.services.rollups import period_start, period_end
+from datetime import date, timedelta
+from itertools import accumulate
+import os
+
+# Price history reads below the price series cache (services/price_cache.py):
+# - pick_resolution() chooses day/week/month for a range
+# - series_query() / read_stored_series() read one resolution from the stored tiers: days from
+#   price_history plus the cold archive (services/archive.py), weeks/months from price_rollups
+# - columnar_series() / decode_columnar() are the compact wire format of GET /assets/{id}
+
+ROLLUP_DAILY_MAX_DAYS = int(os.getenv("ROLLUP_DAILY_MAX_DAYS", "400")) # Longer ranges are served weekly
+ROLLUP_WEEKLY_MAX_DAYS = int(os.getenv("ROLLUP_WEEKLY_MAX_DAYS", "2200")) # Longer ranges are served monthly
+HISTORY_PAGE_MAX = int(os.getenv("HISTORY_PAGE_MAX", "10000")) # Largest page a history reader may ask for
+
+PRICE_SCALE = 1_000_000 # Delta-encoded prices are integer steps of 1e-6 (TEFAS publishes 6 decimals)
+
+def pick_resolution(start: date, end: date) -> str:
+    """Coarsest resolution that still gives a readable chart: ~1 year daily, ~6 years weekly, monthly beyond."""
+    span = (end - start).days
+    if span <= ROLLUP_DAILY_MAX_DAYS:
+        return "day"
+    if span <= ROLLUP_WEEKLY_MAX_DAYS:
+        return "week"
+    return "month"
+
+async def first_trading_day(db: AsyncSession, asset_ids) -> date | None:
+    """Earliest trading_day of the given assets (min over the (asset_id, trading_day) index, or their archives)."""
+    result = await db.execute(
+        select(func.min(PriceHistory.trading_day)).filter(PriceHistory.asset_id.in_(set(asset_ids)))
+    )
+    days = [day for day in [result.scalar()] if day]
+    days += [columns.rows()[0][0] for columns in read_archive(asset_ids, end=min(days, default=None)).values()]
+    return min(days, default=None)
+
+SERIES_FIELDS = ("asset_id", "bucket", "day", "date", "price", "open", "high", "low")
+
+def series_bounds(resolution: str, start: date | None, end: date | None, after: date | None = None) -> tuple[date | None, date | None]:
+    """
+    Trading days [lower, upper] (None: open) a range covers: whole weeks/months for week/month,
+    starting after the bucket that holds `after` (the paging cursor).
+    """
+    lower, upper = start, end
+    if resolution != "day":
+        rollup = RollupResolution[resolution.upper()]
+        lower = period_start(start, rollup) if start else None
+        upper = period_end(period_start(end, rollup), rollup) if end else None
+        if after:
+            after = period_end(period_start(after, rollup), rollup)
+    if after and (lower is None or after >= lower):
+        lower = after + timedelta(days=1)
+    return lower, upper
+
+def series_query(asset_ids, resolution: str, start: date | None, end: date | None, after: date | None = None,
+                 fields: tuple = SERIES_FIELDS):
+    """
+    Select of the given SERIES_FIELDS, oldest first.
+
+    bucket is the trading_day (day) or period_start (week/month) and aligns points of
+    different assets; day is the trading day the price was seen on (last_day of a bar).
+    after skips every bucket up to and including the one holding that trading day (paging).
+    """
+    asset_ids = set(asset_ids)
+    lower, upper = series_bounds(resolution, start, end, after)
+    if resolution == "day":
+        columns = {
+            "asset_id": PriceHistory.asset_id,
+            "bucket": PriceHistory.trading_day.label("bucket"),
+            "day": PriceHistory.trading_day.label("day"),
+            "date": PriceHistory.date,
+            "price": PriceHistory.price,
+            "open": null().label("open"),
+            "high": null().label("high"),
+            "low": null().label("low"),
+        }
+        stmt = select(*(columns[field] for field in fields)).filter(
+            PriceHistory.asset_id.in_(asset_ids), PriceHistory.price.is_not(None)
+        )
+        if lower:
+            stmt = stmt.filter(PriceHistory.trading_day >= lower)
+        if upper:
+            stmt = stmt.filter(PriceHistory.trading_day <= upper)
+        return stmt.order_by(PriceHistory.trading_day)
+
+    rollup = RollupResolution[resolution.upper()]
+    columns = {
+        "asset_id": PriceRollup.asset_id,
+        "bucket": PriceRollup.period_start.label("bucket"),
+        "day": PriceRollup.last_day.label("day"),
+        "date": PriceRollup.last_day.label("date"),
+        "price": PriceRollup.close.label("price"),
+        "open": PriceRollup.open,
+        "high": PriceRollup.high,
+        "low": PriceRollup.low,
+    }
+    stmt = select(*(columns[field] for field in fields)).filter(
+        PriceRollup.asset_id.in_(asset_ids),
+        PriceRollup.resolution == rollup.value,
+    )
+    if lower:
+        stmt = stmt.filter(PriceRollup.period_start >= lower)
+    if upper:
+        stmt = stmt.filter(PriceRollup.period_start <= upper)
+    return stmt.order_by(PriceRollup.period_start)
+
+async def read_stored_series(db: AsyncSession, asset_ids, resolution: str, start: date | None, end: date | None,
+                             after: date | None = None, limit: int | None = None, fields: tuple = SERIES_FIELDS) -> list:
+    """
+    series_query() rows (tuples of `fields`) from the database. Daily series also read the
+    cold-history archive; a day present in both tiers is taken from the database.
+    """
+    lower, upper = series_bounds(resolution, start, end, after)
+    archives = read_archive(asset_ids, lower, upper) if resolution == "day" else {}
+    if not archives:
+        stmt = series_query(asset_ids, resolution, start, end, after, fields)
+        return (await db.execute(stmt.limit(limit) if limit else stmt)).all()
+
+    # asset_id and day identify a point across both tiers
+    stmt = series_query(asset_ids, resolution, start, end, after, ("asset_id", "day", *fields))
+    hot = (await db.execute(stmt.limit(limit) if limit else stmt)).all()
+
+    seen = {(row[0], row[1]) for row in hot}
+    points = [(row[1], tuple(row[2:])) for row in hot]
+    for asset_id, columns in archives.items():
+        for day, stamp, price in (columns.head(limit) if limit else columns).rows():
+            if (asset_id, day) in seen:
+                continue
+            values = {"asset_id": asset_id, "bucket": day, "day": day, "date": stamp, "price": price,
+                      "open": None, "high": None, "low": None}
+            points.append((day, tuple(values[field] for field in fields)))
+    points.sort(key=lambda point: point[0])
+    return [values for _, values in (points[:limit] if limit else points)]
+
+def columnar_series(rows, delta: bool = False) -> dict:
+    """
+    Parallel arrays for (day, price) rows: {"days": [epoch day], "prices": [price]}.
+
+    With delta, days[0] and prices[0] are absolute and every later entry is the difference
+    to the previous one; prices are then integers in units of 1 / PRICE_SCALE.
+    """
+    if not rows:
+        return {"days": [], "prices": []}
+    days, prices = zip(*rows)
+    days = [epoch_day(day) for day in days]
+    prices = list(prices)
+    if delta:
+        days = [b - a for a, b in zip([0, *days], days)]
+        scaled = [round(price * PRICE_SCALE) for price in prices]
+        prices = [b - a for a, b in zip([0, *scaled], scaled)]
+    return {"days": days, "prices": prices}
+
+def decode_columnar(days: list[int], prices: list, delta: bool = False) -> list[tuple[date, float]]:
+    """Inverse of columnar_series(): [(trading day, price)]."""
+    if delta:
+        days = list(accumulate(days))
+        prices = [value / PRICE_SCALE for value in accumulate(prices)]
+    return [(from_epoch_day(day), price) for day, price in zip(days, prices)]
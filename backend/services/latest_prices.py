@@ -0,0 +1,170 @@
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+from sqlalchemy import select, delete, insert, event
+from backend.models import LatestPrice, PriceHistory
+from backend.services.archive import read_archive, archived_asset_ids
+from collections import namedtuple
+from datetime import timedelta
+import logging
+
+logger = logging.getLogger(__name__)
+
+# latest_prices projection: the two most recent prices of every asset.
+# - upsert_prices() merges its rows in with apply_latest_prices() (same transaction)
+# - ORM writes to PriceHistory (admin panel) refresh the affected assets after flush
+# - rebuild_latest_prices() recomputes everything from history
+
+async def load_latest_prices(db: AsyncSession, asset_ids) -> dict[int, LatestPrice]:
+    """asset_id -> LatestPrice for the given assets (primary key lookups)."""
+    asset_ids = set(asset_ids)
+    if not asset_ids:
+        return {}
+    result = await db.execute(select(LatestPrice).filter(LatestPrice.asset_id.in_(asset_ids)))
+    return {latest.asset_id: latest for latest in result.scalars().all()}
+
+async def apply_latest_prices(db: AsyncSession, rows: list[dict], dialect_insert):
+    """
+    Merges written PriceHistory rows ({"asset_id", "trading_day", "date", "price"}) into the
+    projection. The new top two days of an asset are always among its current top two and
+    the written rows, so no history is read.
+    """
+    written = {}
+    for row in rows:
+        written.setdefault(row["asset_id"], {})[row["trading_day"]] = (row["date"], row["price"])
+
+    current = await load_latest_prices(db, written)
+    values = []
+    for asset_id, days in written.items():
+        candidates = {}
+        latest = current.get(asset_id)
+        if latest is not None:
+            if latest.previous_as_of is not None:
+                candidates[latest.previous_as_of] = (None, latest.previous_close)
+            if latest.as_of is not None:
+                candidates[latest.as_of] = (latest.stamped_at, latest.price)
+        candidates.update(days)
+
+        top = sorted(candidates, reverse=True)[:2]
+        stamp, price = candidates[top[0]]
+        values.append({
+            "asset_id": asset_id,
+            "price": price,
+            "as_of": top[0],
+            "stamped_at": stamp,
+            "previous_close": candidates[top[1]][1] if len(top) > 1 else None,
+            "previous_as_of": top[1] if len(top) > 1 else None,
+        })
+
+    if values:
+        stmt = dialect_insert(LatestPrice).values(values)
+        stmt = stmt.on_conflict_do_update(
+            index_elements=[LatestPrice.asset_id],
+            set_={column: stmt.excluded[column] for column in ("price", "as_of", "stamped_at", "previous_close", "previous_as_of")},
+        )
+        await db.execute(stmt)
+
+def latest_rows_query(asset_id: int):
+    return (
+        select(PriceHistory.trading_day, PriceHistory.date, PriceHistory.price)
+        .filter(PriceHistory.asset_id == asset_id)
+        .order_by(PriceHistory.trading_day.desc())
+        .limit(2)
+    )
+
+ArchivedRow = namedtuple("ArchivedRow", "trading_day date price")
+
+def with_archive_tail(asset_id: int, rows: list) -> list:
+    """Tops up an asset's latest rows (newest first) with archived days when the database holds fewer than two."""
+    if len(rows) >= 2:
+        return rows
+    before = rows[-1].trading_day - timedelta(days=1) if rows else None
+    archived = read_archive([asset_id], end=before).get(asset_id)
+    if archived is None:
+        return rows
+    tail = [ArchivedRow(*row) for row in reversed(archived.tail(2 - len(rows)).rows())]
+    return [*rows, *tail]
+
+def projection_row(asset_id: int, rows) -> dict:
+    return {
+        "asset_id": asset_id,
+        "price": rows[0].price,
+        "as_of": rows[0].trading_day,
+        "stamped_at": rows[0].date,
+        "previous_close": rows[1].price if len(rows) > 1 else None,
+        "previous_as_of": rows[1].trading_day if len(rows) > 1 else None,
+    }
+
+@event.listens_for(Session, "after_flush")
+def refresh_after_orm_writes(session: Session, flush_context):
+    """Keeps the projection in sync with PriceHistory rows added, edited or deleted through the ORM."""
+    asset_ids = {
+        obj.asset_id
+        for obj in (*session.new, *session.dirty, *session.deleted)
+        if isinstance(obj, PriceHistory) and obj.asset_id is not None
+    }
+    if not asset_ids:
+        return
+    connection = session.connection()
+    for asset_id in asset_ids:
+        rows = with_archive_tail(asset_id, connection.execute(latest_rows_query(asset_id)).all())
+        connection.execute(delete(LatestPrice).where(LatestPrice.asset_id == asset_id))
+        if rows:
+            connection.execute(insert(LatestPrice).values(projection_row(asset_id, rows)))
+
+async def rebuild_latest_prices(db: AsyncSession) -> int:
+    """Recomputes the projection from the whole history table and the archive. Commits; returns the number of assets."""
+    result = await db.stream(
+        select(PriceHistory.asset_id, PriceHistory.trading_day, PriceHistory.date, PriceHistory.price)
+        .order_by(PriceHistory.asset_id, PriceHistory.trading_day.desc())
+    )
+    values = []
+    seen = set()
+    asset_id, rows = None, []
+    async for row in result:
+        if row.asset_id != asset_id:
+            if rows:
+                values.append(projection_row(asset_id, with_archive_tail(asset_id, rows)))
+                seen.add(asset_id)
+            asset_id, rows = row.asset_id, []
+        if len(rows) < 2:
+            rows.append(row)
+    if rows:
+        values.append(projection_row(asset_id, with_archive_tail(asset_id, rows)))
+        seen.add(asset_id)
+    # Assets whose whole history is archived
+    for asset_id in archived_asset_ids() - seen:
+        rows = with_archive_tail(asset_id, [])
+        if rows:
+            values.append(projection_row(asset_id, rows))
+
+    await db.execute(delete(LatestPrice))
+    if values:
+        await db.execute(insert(LatestPrice), values)
+    await db.commit()
+    logger.info(f"Rebuilt latest prices for {len(values)} assets.")
+    return len(values)
+
+def main():
+    """python -m backend.services.latest_prices --rebuild"""
+    import argparse
+    import asyncio
+    from backend.database import AsyncSessionLocal, engine
+
+    parser = argparse.ArgumentParser(description="Maintain the latest_prices projection")
+    parser.add_argument("--rebuild", action="store_true", help="Recompute latest_prices from price_history")
+    args = parser.parse_args()
+    if not args.rebuild:
+        parser.print_help()
+        return
+
+    async def run():
+        async with AsyncSessionLocal() as db:
+            count = await rebuild_latest_prices(db)
+        await engine.dispose()
+        print(f"Rebuilt latest prices for {count} assets.")
+
+    logging.basicConfig(level=logging.INFO)
+    asyncio.run(run())
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,249 @@
+from sqlalchemy.ext.asyncio import AsyncEngine, AsyncConnection
+from sqlalchemy import text
+from backend.database import engine, AsyncSessionLocal
+from backend.models import SchedulerLease
+from datetime import datetime
+from pathlib import Path
+import asyncio
+import fcntl
+import hashlib
+import logging
+import os
+import socket
+import tempfile
+
+logger = logging.getLogger(__name__)
+
+# Leader election for scheduled jobs: with several uvicorn workers or containers only the
+# process holding the lock runs them. The lock is a file lock (SQLite) or an advisory lock
+# (PostgreSQL), so the OS/database frees it when the holder dies; the scheduler_leases row
+# shows who holds it.
+LEADER_RENEW_SECONDS = float(os.getenv("LEADER_RENEW_SECONDS", "15"))  # How often followers retry and the leader checks in
+LEADER_LOCK_FILE = os.getenv("LEADER_LOCK_FILE")  # SQLite only, default: next to the database file
+
+def process_id() -> str:
+    return f"{socket.gethostname()}:{os.getpid()}"
+
+class FileLeaderLock:
+    """flock() on a file next to the SQLite database; only works across processes on one host."""
+
+    def __init__(self, path: str):
+        self.path = path
+        self.fd = None
+
+    async def acquire(self) -> bool:
+        fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o644)
+        try:
+            fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            os.close(fd)
+            return False
+        self.fd = fd
+        return True
+
+    async def alive(self) -> bool:
+        return self.fd is not None
+
+    async def release(self):
+        if self.fd is not None:
+            fcntl.flock(self.fd, fcntl.LOCK_UN)
+            os.close(self.fd)
+            self.fd = None
+
+class AdvisoryLeaderLock:
+    """
+    pg_try_advisory_lock() on a connection kept open while leading. If the connection
+    drops, PostgreSQL releases the lock and alive() turns False.
+    """
+
+    def __init__(self, engine: AsyncEngine, name: str):
+        self.engine = engine
+        # Advisory locks take a signed 64-bit key
+        self.key = int.from_bytes(hashlib.sha1(name.encode()).digest()[:8], "big", signed=True)
+        self.conn: AsyncConnection | None = None
+
+    async def acquire(self) -> bool:
+        conn = await self.engine.connect()
+        try:
+            locked = (await conn.execute(text("SELECT pg_try_advisory_lock(:key)"), {"key": self.key})).scalar()
+            await conn.commit()
+        except Exception:
+            await conn.close()
+            raise
+        if not locked:
+            await conn.close()
+            return False
+        self.conn = conn
+        return True
+
+    async def alive(self) -> bool:
+        if self.conn is None:
+            return False
+        try:
+            await self.conn.execute(text("SELECT 1"))
+            await self.conn.commit()
+            return True
+        except Exception as e:
+            logger.warning(f"Leader lock connection lost: {e}")
+            await self.conn.invalidate()
+            self.conn = None
+            return False
+
+    async def release(self):
+        if self.conn is not None:
+            try:
+                await self.conn.execute(text("SELECT pg_advisory_unlock(:key)"), {"key": self.key})
+                await self.conn.commit()
+            finally:
+                await self.conn.close()
+                self.conn = None
+
+def create_leader_lock(engine: AsyncEngine, name: str):
+    if engine.dialect.name == "postgresql":
+        return AdvisoryLeaderLock(engine, name)
+    path = LEADER_LOCK_FILE
+    if not path:
+        database = engine.url.database
+        if database and database != ":memory:":
+            path = f"{database}.{name}.lock"
+        else:
+            path = str(Path(tempfile.gettempdir()) / f"portfolio-{name}.lock")
+    return FileLeaderLock(path)
+
+class LeaderElector:
+    """
+    Campaigns for leadership every LEADER_RENEW_SECONDS until it wins, then keeps checking
+    that the lock is still held. on_elected/on_demoted are called on each change.
+    """
+
+    def __init__(self, name: str = "scheduler", lock=None, on_elected=None, on_demoted=None):
+        self.name = name
+        self.lock = lock or create_leader_lock(engine, name)
+        self.holder = process_id()
+        self.on_elected = on_elected
+        self.on_demoted = on_demoted
+        self.is_leader = False
+        self.task: asyncio.Task | None = None
+
+    def start(self):
+        self.task = asyncio.create_task(self.campaign())
+
+    async def stop(self):
+        if self.task:
+            self.task.cancel()
+            try:
+                await self.task
+            except asyncio.CancelledError:
+                pass
+        if self.is_leader:
+            await self.step_down()
+
+    async def campaign(self):
+        while True:
+            try:
+                if not self.is_leader:
+                    if await self.lock.acquire():
+                        self.is_leader = True
+                        logger.info(f"{self.holder} is now the {self.name} leader.")
+                        await self.write_lease(acquired=True)
+                        if self.on_elected:
+                            self.on_elected()
+                elif await self.lock.alive():
+                    await self.write_lease()
+                else:
+                    await self.step_down()
+            except Exception as e:
+                logger.error(f"Leader election for {self.name} failed: {e}")
+            await asyncio.sleep(LEADER_RENEW_SECONDS)
+
+    async def step_down(self):
+        self.is_leader = False
+        logger.info(f"{self.holder} is no longer the {self.name} leader.")
+        if self.on_demoted:
+            self.on_demoted()
+        await self.lock.release()
+
+    async def write_lease(self, acquired: bool = False):
+        now = datetime.now()
+        async with AsyncSessionLocal() as db:
+            lease = await db.get(SchedulerLease, self.name)
+            if lease is None:
+                lease = SchedulerLease(name=self.name)
+                db.add(lease)
+            if acquired or lease.holder != self.holder:
+                lease.holder = self.holder
+                lease.acquired_at = now
+            lease.renewed_at = now
+            await db.commit()
+
+async def read_lease(name: str = "scheduler") -> SchedulerLease | None:
+    async with AsyncSessionLocal() as db:
+        return await db.get(SchedulerLease, name)
+
+async def demo_setup():
+    from backend.models import Base
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+    await engine.dispose()
+
+async def demo_worker(seconds: float):
+    elector = LeaderElector("demo")
+    elector.start()
+    for _ in range(int(seconds / LEADER_RENEW_SECONDS)):
+        await asyncio.sleep(LEADER_RENEW_SECONDS)
+        print(f"{elector.holder}: {'LEADER' if elector.is_leader else 'follower'}", flush=True)
+    await elector.stop()
+    await engine.dispose()
+
+def main():
+    """
+    Local check with several processes:
+        python -m backend.services.leader --processes 3 --seconds 12
+    Starts N workers on one database and kills the first leader halfway through; exactly one
+    worker should report LEADER at any time, and a follower should take over after the kill.
+    """
+    import argparse
+    import subprocess
+    import sys
+    import time
+
+    parser = argparse.ArgumentParser(description="Leader election demo with several processes")
+    parser.add_argument("--processes", type=int, default=3)
+    parser.add_argument("--seconds", type=float, default=12)
+    parser.add_argument("--worker", action="store_true", help=argparse.SUPPRESS)
+    parser.add_argument("--setup", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.setup:
+        asyncio.run(demo_setup())
+        return
+    if args.worker:
+        asyncio.run(demo_worker(args.seconds))
+        return
+
+    env = dict(os.environ, LEADER_RENEW_SECONDS=os.getenv("LEADER_RENEW_SECONDS", "1"))
+    if "DATABASE_URL" not in os.environ:
+        env["DATABASE_URL"] = f"sqlite+aiosqlite:///{Path(tempfile.mkdtemp(prefix='leader_demo_')) / 'demo.db'}"
+    subprocess.run([sys.executable, "-m", "backend.services.leader", "--setup"], env=env, check=True)
+    workers = [
+        subprocess.Popen([sys.executable, "-m", "backend.services.leader", "--worker", "--seconds", str(args.seconds)], env=env)
+        for _ in range(args.processes)
+    ]
+    time.sleep(args.seconds / 2)
+
+    # Kill the current leader (the one whose pid is in the lease) without letting it clean up
+    import sqlite3
+    database = env["DATABASE_URL"].split(":///", 1)[-1]
+    holder = None
+    if env["DATABASE_URL"].startswith("sqlite"):
+        row = sqlite3.connect(database).execute("SELECT holder FROM scheduler_leases WHERE name = 'demo'").fetchone()
+        holder = row[0] if row else None
+    for worker in workers:
+        if holder and holder.endswith(f":{worker.pid}"):
+            print(f"--- killing leader {holder}", flush=True)
+            worker.kill()
+    for worker in workers:
+        worker.wait()
+
+if __name__ == "__main__":
+    main()
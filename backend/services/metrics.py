@@ -0,0 +1,56 @@
+from collections import defaultdict, deque
+import threading
+
+# Minimal in-process metrics registry.
+# Counters only go up, gauges hold the last value, and observations keep a bounded
+# sample for percentiles. Everything is exposed through snapshot().
+
+MAX_SAMPLES = 10000
+
+_lock = threading.Lock()
+_counters = defaultdict(float)
+_gauges = {}
+_samples = defaultdict(lambda: deque(maxlen=MAX_SAMPLES))
+
+def inc(name: str, value: float = 1):
+    with _lock:
+        _counters[name] += value
+
+def set_gauge(name: str, value: float):
+    with _lock:
+        _gauges[name] = value
+
+def observe(name: str, value: float):
+    with _lock:
+        _samples[name].append(value)
+
+def percentile(name: str, q: float) -> float | None:
+    """q in [0, 100]. Nearest-rank percentile of the recorded sample."""
+    with _lock:
+        values = sorted(_samples.get(name, ()))
+    if not values:
+        return None
+    index = min(len(values) - 1, max(0, round(q / 100 * len(values)) - 1))
+    return values[index]
+
+def reset(prefix: str = ""):
+    """Drops every metric whose name starts with prefix."""
+    with _lock:
+        for store in (_counters, _gauges, _samples):
+            for name in [n for n in store if n.startswith(prefix)]:
+                del store[name]
+
+def snapshot() -> dict:
+    with _lock:
+        counters = dict(_counters)
+        gauges = dict(_gauges)
+        totals = {name: (len(values), sum(values)) for name, values in _samples.items()}
+    summaries = {}
+    for name, (count, total) in totals.items():
+        summaries[name] = {
+            "count": count,
+            "sum": total,
+            "p50": percentile(name, 50),
+            "p99": percentile(name, 99),
+        }
+    return {"counters": counters, "gauges": gauges, "summaries": summaries}
@@ -0,0 +1,58 @@
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import select, exists, case, or_
+from backend.models import Asset, AssetType, LatestPrice, Portfolio
+from datetime import datetime, timedelta
+import logging
+import os
+
+logger = logging.getLogger(__name__)
+
+# An asset is stale (needs fetching) when it has no price newer than this many seconds
+FETCH_STALE_AFTER = {
+    AssetType.FUND.value: int(os.getenv("FETCH_STALE_AFTER_FUND", "3600")),
+    AssetType.STOCK.value: int(os.getenv("FETCH_STALE_AFTER_STOCK", "900")),
+}
+# Max assets per run (0 = no limit); the rest are picked up by the next run
+FETCH_PLAN_LIMIT = int(os.getenv("FETCH_PLAN_LIMIT", "0"))
+# "held" puts assets in someone's portfolio first, "oldest" orders by last update only
+FETCH_PRIORITY = os.getenv("FETCH_PRIORITY", "held")
+
+async def plan_fetch(db: AsyncSession, asset_type: str, limit: int | None = None, now: datetime | None = None,
+                     stale_after: int | None = None) -> list[Asset]:
+    """
+    Returns the assets of `asset_type` that need a new price, in fetch order.
+
+    Freshness is decided in SQL against the latest_prices projection (one row per asset),
+    so fresh assets never leave the database. Stale assets are ordered held-by-users first (FETCH_PRIORITY)
+    and then by last update, oldest first (never-priced assets lead).
+    stale_after overrides FETCH_STALE_AFTER (seconds).
+    """
+    now = now or datetime.now()
+    limit = FETCH_PLAN_LIMIT if limit is None else limit
+    if stale_after is None:
+        stale_after = FETCH_STALE_AFTER.get(asset_type, FETCH_STALE_AFTER[AssetType.FUND.value])
+    cutoff = now - timedelta(seconds=stale_after)
+
+    # Last update per asset comes from the latest_prices projection (one row per asset)
+    last_update = LatestPrice.stamped_at
+    has_fresh_price = last_update > cutoff
+
+    order_by = []
+    if FETCH_PRIORITY == "held":
+        is_held = exists().where(Portfolio.asset_id == Asset.id, Portfolio.quantity > 0)
+        order_by.append(case((is_held, 0), else_=1))
+    order_by += [last_update.asc().nullsfirst(), Asset.id]
+
+    query = (
+        select(Asset)
+        .outerjoin(LatestPrice, LatestPrice.asset_id == Asset.id)
+        .filter(Asset.type == asset_type, or_(last_update.is_(None), ~has_fresh_price))
+        .order_by(*order_by)
+    )
+    if limit:
+        query = query.limit(limit)
+
+    result = await db.execute(query)
+    assets = result.scalars().all()
+    logger.info(f"Planned {len(assets)} stale {asset_type} assets (no price since {cutoff:%Y-%m-%d %H:%M}).")
+    return list(assets)
@@ -0,0 +1,209 @@
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+from sqlalchemy import select, delete, insert, event, func, inspect
+from backend.models import Portfolio, Order, PriceHistory, PortfolioDailySnapshot, RollupResolution
+from backend.services import price_cache
+from backend.services.rollups import period_start, period_end
+from backend.services.valuation import price_matrix, valuate, holdings_timeline
+from datetime import date, timedelta
+import numpy as np
+import logging
+
+logger = logging.getLogger(__name__)
+
+# portfolio_daily_snapshot: every user's portfolio value per trading day, so /portfolio/history
+# reads the requested days instead of revaluing all history.
+# - refresh_snapshots() appends the days after each user's last snapshot (after every price update)
+# - writes that change the past delete the snapshots from the changed day on: prices written by
+#   the fetcher (invalidate_for_prices()) and orders, holdings and prices edited through the ORM
+# - read_history() serves the stored days and values the days after the last snapshot on the fly
+
+SNAPSHOT_BATCH_SIZE = 500 # Assets per invalidation statement (SQLite bound-parameter limit)
+
+def snapshot_delete(since: date | None = None, user_ids=None, portfolio_ids=None, asset_ids=None):
+    """DELETE of the snapshots from `since` on (all days if None) of the users, owners of the portfolios or holders of the assets."""
+    stmt = delete(PortfolioDailySnapshot)
+    if user_ids is not None:
+        stmt = stmt.where(PortfolioDailySnapshot.user_id.in_(user_ids))
+    if portfolio_ids is not None:
+        stmt = stmt.where(PortfolioDailySnapshot.user_id.in_(select(Portfolio.user_id).where(Portfolio.id.in_(portfolio_ids))))
+    if asset_ids is not None:
+        stmt = stmt.where(PortfolioDailySnapshot.user_id.in_(select(Portfolio.user_id).where(Portfolio.asset_id.in_(asset_ids))))
+    if since is not None:
+        stmt = stmt.where(PortfolioDailySnapshot.day >= since)
+    return stmt
+
+async def invalidate_for_prices(db: AsyncSession, rows):
+    """Drops the snapshots of the holders of (asset_id, trading_day, ...) rows from their earliest day on. Does not commit."""
+    if not rows:
+        return
+    since = min(row[1] for row in rows)
+    asset_ids = sorted({row[0] for row in rows})
+    for i in range(0, len(asset_ids), SNAPSHOT_BATCH_SIZE):
+        await db.execute(snapshot_delete(since, asset_ids=asset_ids[i:i + SNAPSHOT_BATCH_SIZE]))
+
+@event.listens_for(Session, "after_flush")
+def invalidate_snapshots_after_orm_writes(session: Session, flush_context):
+    """Orders, holdings and prices added, edited or deleted through the ORM (order endpoint, admin panel)."""
+    portfolios = {} # portfolio_id -> first changed day
+    users = set() # Everything of these users
+    assets = {} # asset_id -> first changed day
+    for obj in (*session.new, *session.dirty, *session.deleted):
+        if isinstance(obj, Order):
+            state = inspect(obj)
+            days = {stamp.date() for stamp in (obj.executed_at, *state.attrs.executed_at.history.deleted) if stamp is not None}
+            for portfolio_id in {obj.portfolio_id, *state.attrs.portfolio_id.history.deleted} - {None}:
+                portfolios[portfolio_id] = min(portfolios.get(portfolio_id, date.max), *days, date.max) if days else date.min
+        elif isinstance(obj, PriceHistory):
+            state = inspect(obj)
+            days = {obj.trading_day, *state.attrs.trading_day.history.deleted} - {None}
+            for asset_id in {obj.asset_id, *state.attrs.asset_id.history.deleted} - {None}:
+                assets[asset_id] = min(assets.get(asset_id, date.max), *days, date.max)
+
+    for obj in (*session.new, *session.dirty, *session.deleted):
+        if not isinstance(obj, Portfolio) or obj.user_id is None:
+            continue
+        if obj in session.new or obj in session.deleted:
+            # Another asset changes which days the portfolio has
+            users.add(obj.user_id)
+            continue
+        state = inspect(obj)
+        changed = any(state.attrs[name].history.has_changes() for name in ("user_id", "asset_id", "quantity", "average_cost"))
+        # A holding changed without an order moves the opening position, i.e. every day
+        if changed and obj.id not in portfolios:
+            users.update({obj.user_id, *state.attrs.user_id.history.deleted} - {None})
+
+    connection = session.connection()
+    if users:
+        connection.execute(snapshot_delete(user_ids=users))
+    for portfolio_id, since in portfolios.items():
+        connection.execute(snapshot_delete(since, portfolio_ids=[portfolio_id]))
+    for asset_id, since in assets.items():
+        connection.execute(snapshot_delete(since, asset_ids=[asset_id]))
+
+async def compute_snapshots(db: AsyncSession, user_id: int, since: date | None = None) -> list[dict]:
+    """
+    Snapshot rows of a user's portfolio for every trading day from `since` on (all history if
+    None): prices from the price series cache, holdings from the order ledger.
+    """
+    result = await db.execute(
+        select(Portfolio.asset_id, Portfolio.quantity, Portfolio.average_cost).filter(Portfolio.user_id == user_id)
+    )
+    holdings = {row.asset_id: (row.quantity, row.average_cost) for row in result}
+    if not holdings:
+        return []
+    asset_ids = list(holdings)
+
+    columns = await price_cache.read_columns(db, asset_ids, "day", since, None)
+    opening = None
+    if since is not None:
+        # Prices carried into the first day from before it
+        before = await price_cache.prices_before(db, asset_ids, since)
+        opening = np.array([before.get(asset_id, np.nan) for asset_id in asset_ids])
+    days, _, prices = price_matrix(columns, asset_ids, opening)
+    if not len(days):
+        return []
+
+    orders_result = await db.execute(
+        select(Portfolio.asset_id, Order.executed_at, Order.type, Order.quantity, Order.price, Order.cost_snapshot)
+        .join(Portfolio, Portfolio.id == Order.portfolio_id)
+        .filter(Portfolio.user_id == user_id)
+        .order_by(Order.executed_at, Order.id)
+    )
+    quantities, average_costs, realized = holdings_timeline(asset_ids, holdings, orders_result.all(), days)
+    total_value, total_cost = valuate(prices, quantities, average_costs)
+    return [
+        {"user_id": user_id, "day": day, "total_value": value, "total_cost": cost, "total_profit": value - cost, "realized_profit": gain}
+        for day, value, cost, gain in zip(days.astype("datetime64[D]").tolist(), total_value.tolist(),
+                                          total_cost.tolist(), realized.sum(axis=1).tolist())
+    ]
+
+async def last_snapshot_day(db: AsyncSession, user_id: int) -> date | None:
+    result = await db.execute(select(func.max(PortfolioDailySnapshot.day)).filter(PortfolioDailySnapshot.user_id == user_id))
+    return result.scalar()
+
+async def refresh_user_snapshots(db: AsyncSession, user_id: int) -> int:
+    """Appends the days since the user's last snapshot; the last one is recomputed (its prices may have changed). Does not commit."""
+    last = await last_snapshot_day(db, user_id)
+    rows = await compute_snapshots(db, user_id, last)
+    if last is not None:
+        await db.execute(snapshot_delete(last, user_ids=[user_id]))
+    if rows:
+        await db.execute(insert(PortfolioDailySnapshot), rows)
+    return len(rows)
+
+async def refresh_snapshots(db: AsyncSession, rebuild: bool = False) -> int:
+    """Brings every portfolio's snapshots up to date (from scratch with rebuild), one commit per user. Returns the rows written."""
+    if rebuild:
+        await db.execute(delete(PortfolioDailySnapshot))
+        await db.commit()
+    result = await db.execute(select(Portfolio.user_id).distinct())
+    written = 0
+    for user_id in sorted(result.scalars().all()):
+        written += await refresh_user_snapshots(db, user_id)
+        await db.commit()
+    logger.info(f"Wrote {written} portfolio snapshots.")
+    return written
+
+async def read_history(db: AsyncSession, user_id: int, resolution: str, start: date | None, end: date | None) -> list[dict]:
+    """
+    /portfolio/history points: the stored snapshots of the range plus the days after the last
+    snapshot, valued on the fly. Week/month points are the last trading day of each bucket.
+    """
+    lower, upper = start, end
+    if resolution != "day":
+        rollup = RollupResolution[resolution.upper()]
+        lower = period_start(start, rollup) if start else None
+        upper = period_end(period_start(end, rollup), rollup) if end else None
+
+    stmt = select(
+        PortfolioDailySnapshot.day, PortfolioDailySnapshot.total_value, PortfolioDailySnapshot.total_cost,
+        PortfolioDailySnapshot.total_profit, PortfolioDailySnapshot.realized_profit,
+    ).filter(PortfolioDailySnapshot.user_id == user_id).order_by(PortfolioDailySnapshot.day)
+    if lower:
+        stmt = stmt.filter(PortfolioDailySnapshot.day >= lower)
+    if upper:
+        stmt = stmt.filter(PortfolioDailySnapshot.day <= upper)
+    rows = [dict(row._mapping) for row in await db.execute(stmt)]
+
+    last = await last_snapshot_day(db, user_id)
+    if last is None or upper is None or last < upper:
+        since = last + timedelta(days=1) if last is not None else None
+        if lower and (since is None or since < lower):
+            since = lower
+        rows += [row for row in await compute_snapshots(db, user_id, since) if upper is None or row["day"] <= upper]
+
+    if resolution != "day":
+        # Rows are sorted by day, so the last one of every bucket wins
+        rows = list({period_start(row["day"], rollup): row for row in rows}.values())
+    return [
+        {"date": row["day"].isoformat(), "total_value": row["total_value"], "total_cost": row["total_cost"],
+         "total_profit": row["total_profit"], "realized_profit": row["realized_profit"]}
+        for row in rows
+    ]
+
+def main():
+    """python -m backend.services.portfolio_snapshots [--refresh] [--rebuild]"""
+    import argparse
+    import asyncio
+    from backend.database import AsyncSessionLocal, dispose_engines
+
+    parser = argparse.ArgumentParser(description="Maintain the daily portfolio snapshots")
+    parser.add_argument("--refresh", action="store_true", help="Append the days since every portfolio's last snapshot")
+    parser.add_argument("--rebuild", action="store_true", help="Recompute portfolio_daily_snapshot from scratch")
+    args = parser.parse_args()
+    if not (args.refresh or args.rebuild):
+        parser.print_help()
+        return
+
+    async def run():
+        async with AsyncSessionLocal() as db:
+            count = await refresh_snapshots(db, rebuild=args.rebuild)
+        await dispose_engines()
+        print(f"Wrote {count} portfolio snapshots.")
+
+    logging.basicConfig(level=logging.INFO)
+    asyncio.run(run())
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,328 @@
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+from sqlalchemy import select, event
+from backend.models import LatestPrice, PriceHistory
+from backend.services import metrics
+from backend.services import history
+from backend.services.history import SERIES_FIELDS, series_bounds, pick_resolution
+from backend.services.epoch import epoch_day, from_epoch_day, epoch_micros
+from collections import OrderedDict
+from datetime import date, datetime
+import numpy as np
+import logging
+import os
+import time
+
+logger = logging.getLogger(__name__)
+
+# Process-wide price series store: the daily history of recently read assets as contiguous
+# numpy buffers of (epoch day, price, stamp), so history and portfolio reads skip the database.
+# - loaded lazily, all misses of a request in one query (database and archive, history.read_stored_series)
+# - the fetcher appends what it commits (append()); ORM writes in this process invalidate
+# - writes made by other workers are caught by comparing cached series with latest_prices
+#   every PRICE_CACHE_SYNC_SECONDS; every series is reloaded after PRICE_CACHE_TTL_SECONDS
+# - least recently used series are evicted to stay within PRICE_CACHE_MB
+# Weekly and monthly bars of cached series are computed from the daily buffers (identical to
+# price_rollups); assets not cached read their bars from price_rollups instead of loading
+# their whole daily history.
+
+PRICE_CACHE_MB = float(os.getenv("PRICE_CACHE_MB", "64")) # Memory budget, 0 disables caching
+PRICE_CACHE_SYNC_SECONDS = float(os.getenv("PRICE_CACHE_SYNC_SECONDS", "30")) # Check against latest_prices this often
+PRICE_CACHE_TTL_SECONDS = float(os.getenv("PRICE_CACHE_TTL_SECONDS", "3600")) # Reload a series after this long
+
+SERIES_OVERHEAD_BYTES = 256 # Python objects around the buffers of one series
+SYNC_BATCH_SIZE = 500 # Assets per latest_prices query (SQLite bound-parameter limit)
+BAR_FIELDS = ("asset_id", "bucket", "day", "price", "open", "high", "low") # Stored bars read on cache misses
+
+class PriceSeries:
+    """One asset's daily prices, sorted by day; the buffers grow by doubling so appends are amortized O(1)."""
+
+    def __init__(self, days: np.ndarray, prices: np.ndarray, stamps: np.ndarray):
+        self.size = len(days)
+        self.days = np.asarray(days, dtype=np.int32)
+        self.prices = np.asarray(prices, dtype=np.float64)
+        self.stamps = np.asarray(stamps, dtype=np.int64)
+        self.loaded_at = time.monotonic()
+
+    @property
+    def nbytes(self) -> int:
+        return self.days.nbytes + self.prices.nbytes + self.stamps.nbytes + SERIES_OVERHEAD_BYTES
+
+    def last(self) -> tuple[int, float] | None:
+        if not self.size:
+            return None
+        return int(self.days[self.size - 1]), float(self.prices[self.size - 1])
+
+    def grow(self):
+        capacity = max(8, 2 * len(self.days))
+        for name, dtype in (("days", np.int32), ("prices", np.float64), ("stamps", np.int64)):
+            buffer = np.empty(capacity, dtype=dtype)
+            buffer[:self.size] = getattr(self, name)[:self.size]
+            setattr(self, name, buffer)
+
+    def upsert(self, day: int, stamp: int, price: float):
+        """Sets the price of a day: appended at the end (the common case), replaced, or inserted in order."""
+        index = self.size
+        if self.size and day <= self.days[self.size - 1]:
+            index = int(np.searchsorted(self.days[:self.size], day))
+            if self.days[index] == day:
+                # upsert_prices() leaves an unchanged price (and its stamp) as it is
+                if self.prices[index] != price:
+                    self.prices[index], self.stamps[index] = price, stamp
+                return
+        if self.size == len(self.days):
+            self.grow()
+        for buffer, value in ((self.days, day), (self.prices, price), (self.stamps, stamp)):
+            buffer[index + 1:self.size + 1] = buffer[index:self.size]
+            buffer[index] = value
+        self.size += 1
+
+    def columns(self, resolution: str, start: date | None, end: date | None, after: date | None = None) -> dict[str, np.ndarray]:
+        """
+        The series within the range as numpy columns: bucket and day (epoch days), date
+        (microseconds for day, last day for week/month), price and, for week/month, open/high/low.
+        """
+        days, prices, stamps = self.days[:self.size], self.prices[:self.size], self.stamps[:self.size]
+
+        # Day range covering the requested buckets, the bounds history.series_query() uses too
+        lower, upper = series_bounds(resolution, start, end, after)
+        lo = 0 if lower is None else int(np.searchsorted(days, epoch_day(lower), side="left"))
+        hi = self.size if upper is None else int(np.searchsorted(days, epoch_day(upper), side="right"))
+        days, prices, stamps = days[lo:hi], prices[lo:hi], stamps[lo:hi]
+
+        if resolution == "day" or not len(days):
+            return {"bucket": days, "day": days, "date": stamps, "price": prices}
+
+        if resolution == "week":
+            buckets = days - (days + 3) % 7 # 1970-01-01 was a Thursday
+        else:
+            buckets = days.astype("datetime64[D]").astype("datetime64[M]").astype("datetime64[D]").astype(np.int64)
+        starts = np.flatnonzero(np.r_[True, buckets[1:] != buckets[:-1]])
+        ends = np.r_[starts[1:], len(buckets)] - 1
+        return {
+            "bucket": buckets[starts],
+            "day": days[ends],
+            "date": days[ends], # last_day, like PriceRollup
+            "price": prices[ends],
+            "open": prices[starts],
+            "high": np.maximum.reduceat(prices, starts),
+            "low": np.minimum.reduceat(prices, starts),
+        }
+
+class PriceSeriesCache:
+    def __init__(self, budget_bytes: int):
+        self.budget_bytes = budget_bytes
+        self.series: OrderedDict[int, PriceSeries] = OrderedDict()
+        self.nbytes = 0
+        self.synced_at = time.monotonic()
+
+    def put(self, asset_id: int, series: PriceSeries):
+        self.discard(asset_id)
+        if series.nbytes > self.budget_bytes:
+            return
+        self.series[asset_id] = series
+        self.nbytes += series.nbytes
+        self.evict()
+
+    def discard(self, asset_id: int):
+        series = self.series.pop(asset_id, None)
+        if series is not None:
+            self.nbytes -= series.nbytes
+
+    def evict(self):
+        while self.nbytes > self.budget_bytes and self.series:
+            _, series = self.series.popitem(last=False)
+            self.nbytes -= series.nbytes
+            metrics.inc("price_cache.evictions")
+        metrics.set_gauge("price_cache.bytes", self.nbytes)
+        metrics.set_gauge("price_cache.assets", len(self.series))
+
+    def invalidate(self, asset_ids=None):
+        for asset_id in list(self.series if asset_ids is None else asset_ids):
+            self.discard(asset_id)
+        metrics.set_gauge("price_cache.bytes", self.nbytes)
+
+    def append(self, rows):
+        """Applies committed (asset_id, trading_day, date, price) rows to the cached series."""
+        for asset_id, day, stamp, price in sorted(rows, key=lambda row: row[1]):
+            series = self.series.get(asset_id)
+            if series is None or price is None:
+                continue
+            self.nbytes -= series.nbytes
+            series.upsert(epoch_day(day), epoch_micros(stamp, day), price)
+            self.nbytes += series.nbytes
+        self.evict()
+
+    async def sync(self, db: AsyncSession):
+        """Drops series that are too old or whose last price differs from latest_prices (written elsewhere)."""
+        now = time.monotonic()
+        self.synced_at = now
+        for asset_id in [asset_id for asset_id, series in self.series.items() if now - series.loaded_at > PRICE_CACHE_TTL_SECONDS]:
+            self.discard(asset_id)
+
+        asset_ids = list(self.series)
+        for i in range(0, len(asset_ids), SYNC_BATCH_SIZE):
+            batch = asset_ids[i:i + SYNC_BATCH_SIZE]
+            result = await db.execute(
+                select(LatestPrice.asset_id, LatestPrice.as_of, LatestPrice.price).filter(LatestPrice.asset_id.in_(batch))
+            )
+            latest = {row.asset_id: (epoch_day(row.as_of), row.price) if row.as_of else None for row in result}
+            for asset_id in batch:
+                series = self.series.get(asset_id)
+                if series is not None and series.last() != latest.get(asset_id):
+                    self.discard(asset_id)
+                    metrics.inc("price_cache.stale")
+        metrics.set_gauge("price_cache.bytes", self.nbytes)
+
+    async def get_many(self, db: AsyncSession, asset_ids, load: bool = True) -> dict[int, PriceSeries]:
+        """Series of the given assets; misses are loaded together in one read (left out without load)."""
+        if self.series and time.monotonic() - self.synced_at > PRICE_CACHE_SYNC_SECONDS:
+            await self.sync(db)
+
+        found, missing = {}, []
+        for asset_id in set(asset_ids):
+            series = self.series.get(asset_id)
+            if series is None:
+                missing.append(asset_id)
+            else:
+                self.series.move_to_end(asset_id)
+                found[asset_id] = series
+        metrics.inc("price_cache.hits", len(found))
+        if not missing or not load:
+            return found
+
+        metrics.inc("price_cache.misses", len(missing))
+        rows = await history.read_stored_series(db, missing, "day", None, None, fields=("asset_id", "day", "date", "price"))
+        columns = {asset_id: ([], [], []) for asset_id in missing}
+        for asset_id, day, stamp, price in rows:
+            days, prices, stamps = columns[asset_id]
+            days.append(epoch_day(day))
+            prices.append(price)
+            stamps.append(epoch_micros(stamp, day))
+        for asset_id, (days, prices, stamps) in columns.items():
+            series = PriceSeries(np.array(days, dtype=np.int32), np.array(prices, dtype=np.float64), np.array(stamps, dtype=np.int64))
+            found[asset_id] = series
+            self.put(asset_id, series)
+        return found
+
+def column_points(asset_id: int, resolution: str, columns: dict[str, np.ndarray], limit: int | None, fields: tuple) -> list[tuple]:
+    """(bucket, row) pairs of PriceSeries.columns() output, row being a tuple of `fields`."""
+    if limit:
+        columns = {name: values[:limit] for name, values in columns.items()}
+
+    count = len(columns["bucket"])
+    values = {
+        "asset_id": [asset_id] * count,
+        "bucket": columns["bucket"].astype("datetime64[D]").tolist(),
+        "day": columns["day"].astype("datetime64[D]").tolist(),
+        "date": columns["date"].astype("datetime64[us]" if resolution == "day" else "datetime64[D]").tolist(),
+        "price": columns["price"].tolist(),
+    }
+    for name in ("open", "high", "low"):
+        values[name] = columns[name].tolist() if name in columns else [None] * count
+    return list(zip(values["bucket"], zip(*(values[field] for field in fields)))) if fields else []
+
+def bar_columns(rows) -> dict[int, dict[str, np.ndarray]]:
+    """asset_id -> columns like PriceSeries.columns() of stored BAR_FIELDS rows (sorted by bucket)."""
+    grouped = {}
+    for asset_id, *values in rows:
+        grouped.setdefault(asset_id, []).append(values)
+    columns = {}
+    for asset_id, values in grouped.items():
+        buckets, days, prices, opens, highs, lows = zip(*values)
+        days = np.array([epoch_day(day) for day in days], dtype=np.int32)
+        columns[asset_id] = {
+            "bucket": np.array([epoch_day(bucket) for bucket in buckets], dtype=np.int32),
+            "day": days,
+            "date": days, # last_day
+            "price": np.array(prices, dtype=np.float64),
+            "open": np.array(opens, dtype=np.float64),
+            "high": np.array(highs, dtype=np.float64),
+            "low": np.array(lows, dtype=np.float64),
+        }
+    return columns
+
+cache = PriceSeriesCache(int(PRICE_CACHE_MB * 1024 * 1024))
+
+@event.listens_for(Session, "after_flush")
+def invalidate_after_orm_writes(session: Session, flush_context):
+    """PriceHistory rows added, edited or deleted through the ORM (admin panel) drop their asset's series."""
+    cache.invalidate({
+        obj.asset_id
+        for obj in (*session.new, *session.dirty, *session.deleted)
+        if isinstance(obj, PriceHistory) and obj.asset_id is not None
+    })
+
+# History readers (GET /assets/{id}, /portfolio/history and the valuation)
+
+async def resolve_range(db: AsyncSession, asset_ids, start: date | None, end: date | None, resolution: str):
+    """Fills in an open range and picks a resolution for "auto". Returns (start, end, resolution)."""
+    end = end or date.today()
+    if start is None and resolution == "auto":
+        # Cached series know their first day; the others are looked up without loading them
+        found = await cache.get_many(db, asset_ids, load=False)
+        firsts = [from_epoch_day(int(series.days[0])) for series in found.values() if series.size]
+        missing = set(asset_ids) - set(found)
+        if missing:
+            firsts += [day for day in [await history.first_trading_day(db, missing)] if day]
+        start = min(firsts, default=None)
+    if resolution == "auto":
+        resolution = pick_resolution(start, end) if start else "day"
+    return start, end, resolution
+
+async def read_columns(db: AsyncSession, asset_ids, resolution: str, start: date | None, end: date | None,
+                       after: date | None = None, limit: int | None = None) -> dict[int, dict[str, np.ndarray]]:
+    """
+    asset_id -> PriceSeries.columns() of the range, for vectorized readers (services/valuation.py).
+    Week/month of assets that are not cached come from price_rollups (at least the first
+    `limit` buckets across them); assets without prices have empty columns or none.
+    """
+    found = await cache.get_many(db, asset_ids, load=resolution == "day")
+    columns = {asset_id: series.columns(resolution, start, end, after) for asset_id, series in found.items()}
+    missing = set(asset_ids) - set(found)
+    if missing:
+        columns.update(bar_columns(await history.read_stored_series(db, missing, resolution, start, end, after, limit, BAR_FIELDS)))
+    return columns
+
+async def read_series(db: AsyncSession, asset_ids, resolution: str, start: date | None, end: date | None,
+                      after: date | None = None, limit: int | None = None, fields: tuple = SERIES_FIELDS) -> list[tuple]:
+    """
+    Points (tuples of SERIES_FIELDS `fields`) of the assets' series, oldest first: bucket is
+    the trading day (day) or period start (week/month) and aligns points of different assets,
+    day is the trading day the price was seen on. after skips every bucket up to and including
+    the one holding that trading day (paging).
+    """
+    points = []
+    for asset_id, columns in sorted((await read_columns(db, asset_ids, resolution, start, end, after, limit)).items()):
+        points += column_points(asset_id, resolution, columns, limit, fields)
+    if len(asset_ids) > 1:
+        points.sort(key=lambda point: point[0])
+    return [row for _, row in (points[:limit] if limit else points)]
+
+async def load_series(db: AsyncSession, asset_ids, resolution: str, start: date | None, end: date | None,
+                      after: date | None = None, limit: int | None = None) -> list[dict]:
+    """read_series() rows as dicts; date is a datetime (midnight of last_day for week/month)."""
+    series = []
+    for row in await read_series(db, asset_ids, resolution, start, end, after, limit):
+        point = dict(zip(SERIES_FIELDS, row))
+        if not isinstance(point["date"], datetime):
+            point["date"] = datetime.combine(point["date"], datetime.min.time())
+        series.append(point)
+    return series
+
+async def prices_before(db: AsyncSession, asset_ids, day: date) -> dict[int, float]:
+    """asset_id -> last cached price before `day`, for assets that have one."""
+    prices = {}
+    for asset_id, series in (await cache.get_many(db, asset_ids)).items():
+        index = int(np.searchsorted(series.days[:series.size], epoch_day(day), side="left"))
+        if index:
+            prices[asset_id] = float(series.prices[index - 1])
+    return prices
+
+async def latest_prices(db: AsyncSession, asset_ids) -> dict[int, float]:
+    """asset_id -> last cached price, for assets that have one."""
+    return {
+        asset_id: float(series.prices[series.size - 1])
+        for asset_id, series in (await cache.get_many(db, asset_ids)).items()
+        if series.size
+    }
@@ -0,0 +1,88 @@
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import select
+from sqlalchemy.dialects import postgresql, sqlite
+from backend.models import PriceHistory
+from backend.services.latest_prices import apply_latest_prices
+from backend.services.rollups import apply_rollups
+from datetime import datetime, date
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Rows per INSERT statement (keeps SQLite well under its bound-parameter limit)
+UPSERT_BATCH_SIZE = 500
+
+def _insert_for(db: AsyncSession):
+    dialect = db.get_bind().dialect.name
+    if dialect == "postgresql":
+        return postgresql.insert
+    if dialect == "sqlite":
+        return sqlite.insert
+    raise NotImplementedError(f"Bulk price upsert is not supported on {dialect}")
+
+async def upsert_prices(db: AsyncSession, rows: list[tuple[int, date, datetime, float]]) -> dict[str, int]:
+    """
+    Writes (asset_id, trading_day, date, price) rows with one
+    INSERT ... ON CONFLICT (asset_id, trading_day) DO UPDATE per batch.
+
+    Rows whose stored price is unchanged are left untouched. If the same key appears more
+    than once, the last row wins. The latest_prices projection and the weekly/monthly
+    rollups are updated in the same transaction. Does not commit.
+    Returns {"inserted": n, "updated": n, "unchanged": n}.
+    """
+    counts = {"inserted": 0, "updated": 0, "unchanged": 0}
+
+    # Last row wins for duplicate keys
+    latest = {}
+    for asset_id, trading_day, stamp, price in rows:
+        latest[(asset_id, trading_day)] = (stamp, price)
+    if not latest:
+        return counts
+
+    insert = _insert_for(db)
+    keys = list(latest.keys())
+
+    for i in range(0, len(keys), UPSERT_BATCH_SIZE):
+        batch_keys = keys[i:i + UPSERT_BATCH_SIZE]
+
+        # Existing prices for the batch, read through the (asset_id, trading_day) unique index
+        existing_result = await db.execute(
+            select(PriceHistory.asset_id, PriceHistory.trading_day, PriceHistory.price).filter(
+                PriceHistory.asset_id.in_({asset_id for asset_id, _ in batch_keys}),
+                PriceHistory.trading_day.in_({day for _, day in batch_keys}),
+            )
+        )
+        existing = {(row.asset_id, row.trading_day): row.price for row in existing_result}
+
+        values = []
+        replaced = set()
+        for key in batch_keys:
+            stamp, price = latest[key]
+            if key not in existing:
+                counts["inserted"] += 1
+            elif existing[key] == price:
+                counts["unchanged"] += 1
+                continue
+            else:
+                counts["updated"] += 1
+                replaced.add(key)
+            values.append({"asset_id": key[0], "trading_day": key[1], "date": stamp, "price": price})
+
+        if not values:
+            continue
+
+        stmt = insert(PriceHistory).values(values)
+        stmt = stmt.on_conflict_do_update(
+            index_elements=[PriceHistory.asset_id, PriceHistory.trading_day],
+            set_={"price": stmt.excluded.price, "date": stmt.excluded.date},
+            where=PriceHistory.price.is_distinct_from(stmt.excluded.price),
+        )
+        await db.execute(stmt)
+        await apply_latest_prices(db, values, insert)
+        await apply_rollups(db, values, replaced, insert)
+
+    logger.info(
+        f"Price upsert: {counts['inserted']} inserted, {counts['updated']} updated, "
+        f"{counts['unchanged']} unchanged."
+    )
+    return counts
@@ -0,0 +1,10 @@
+from backend.models import AssetType
+from backend.services.providers.base import PriceProvider
+from backend.services.providers.tefas import TefasProvider
+from backend.services.providers.bist import BistProvider
+
+# Asset type -> provider class. Each type is fetched by its own provider, concurrently.
+PROVIDERS = {
+    AssetType.FUND.value: TefasProvider,
+    AssetType.STOCK.value: BistProvider,
+}
@@ -0,0 +1,49 @@
+from datetime import date
+
+class PriceProvider:
+    """
+    Source of prices for one asset type.
+
+    A provider instance lives for one fetch run and is used as an async context manager,
+    so it can hold connections, rate limiters and sessions across calls:
+
+        async with provider_cls() as provider:
+            prices = await provider.fetch_many(["TTE", "AFT"])
+
+    fetch_many() prices a batch of codes (code -> price, None when it failed; codes that
+    were never attempted, e.g. after an abort, are left out). Providers with
+    supports_history also implement fetch_history() for bulk date-range pulls.
+
+    Providers with several upstream sources can keep per-source stats across runs through
+    restore_stats()/export_stats(); the fetcher persists them in price_source_stats.
+    """
+
+    name = "base"
+    asset_type = None
+    supports_history = False
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc_info):
+        pass
+
+    @property
+    def aborted(self) -> bool:
+        """True once the provider gave up on the run (e.g. source is blocking us)."""
+        return False
+
+    async def fetch_many(self, codes: list[str]) -> dict[str, float | None]:
+        raise NotImplementedError
+
+    async def fetch_history(self, codes: list[str], start: date | None = None, end: date | None = None) -> dict[str, list[tuple[date, float]]]:
+        """code -> [(day, price), ...] for start..end."""
+        raise NotImplementedError
+
+    def restore_stats(self, stats: dict[str, dict]):
+        """Loads source stats saved by a previous run."""
+        pass
+
+    def export_stats(self) -> dict[str, dict]:
+        """Source stats to persist for the next run."""
+        return {}
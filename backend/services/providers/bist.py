@@ -0,0 +1,92 @@
+from backend.models import AssetType
+from backend.services.providers.base import PriceProvider
+from backend.services.throttle import AdaptiveRateLimiter, OK, BLOCKED, ERROR
+from backend.services import metrics
+import asyncio
+import logging
+import os
+import httpx
+import time
+
+logger = logging.getLogger(__name__)
+
+# Batched quote endpoint (Yahoo Finance quote API, BIST symbols carry the .IS suffix)
+BIST_QUOTE_URL = os.getenv("BIST_QUOTE_URL", "https://query1.finance.yahoo.com/v7/finance/quote")
+BIST_CRUMB_URL = os.getenv("BIST_CRUMB_URL", "https://query1.finance.yahoo.com/v1/test/getcrumb")
+BIST_COOKIE_URL = os.getenv("BIST_COOKIE_URL", "https://fc.yahoo.com")
+BIST_SYMBOL_SUFFIX = ".IS"
+BIST_BATCH_SIZE = int(os.getenv("BIST_BATCH_SIZE", "50"))  # Symbols per quote request
+BIST_TIMEOUT = float(os.getenv("BIST_TIMEOUT", "10"))
+
+class BistProvider(PriceProvider):
+    """
+    BIST stock prices, fetched in batches of BIST_BATCH_SIZE symbols per request.
+    Batches run concurrently, paced by the shared adaptive rate limiter.
+    """
+
+    name = "bist"
+    asset_type = AssetType.STOCK.value
+
+    def __init__(self):
+        self.limiter = AdaptiveRateLimiter()
+        self.client = None
+        self.crumb = None
+
+    async def __aenter__(self):
+        self.client = httpx.AsyncClient(
+            headers={'User-Agent': 'Mozilla/5.0 (Macintosh; Intel Mac OS X 10.15; rv:148.0) Gecko/20100101 Firefox/148.0'},
+            timeout=BIST_TIMEOUT,
+            follow_redirects=True,
+        )
+        # The quote API wants a session cookie plus a matching crumb
+        try:
+            await self.client.get(BIST_COOKIE_URL)
+            response = await self.client.get(BIST_CRUMB_URL)
+            if response.status_code == 200 and response.text:
+                self.crumb = response.text.strip()
+        except Exception as e:
+            logger.warning(f"BIST quote session setup failed, continuing without crumb: {e}")
+        return self
+
+    async def __aexit__(self, *exc_info):
+        await self.client.aclose()
+
+    async def fetch_many(self, codes: list[str]) -> dict[str, float | None]:
+        prices = {code: None for code in codes}
+        batches = [codes[i:i + BIST_BATCH_SIZE] for i in range(0, len(codes), BIST_BATCH_SIZE)]
+        for batch_prices in await asyncio.gather(*(self.fetch_batch(batch) for batch in batches)):
+            prices.update(batch_prices)
+        return prices
+
+    async def fetch_batch(self, codes: list[str]) -> dict[str, float]:
+        params = {"symbols": ",".join(f"{code.upper()}{BIST_SYMBOL_SUFFIX}" for code in codes)}
+        if self.crumb:
+            params["crumb"] = self.crumb
+
+        await self.limiter.acquire(BIST_QUOTE_URL)
+        started = time.monotonic()
+        quotes = []
+        try:
+            response = await self.client.get(BIST_QUOTE_URL, params=params)
+            if response.status_code in (401, 403, 429):
+                outcome = BLOCKED
+                logger.warning(f"BIST quote request blocked with HTTP {response.status_code}")
+            else:
+                response.raise_for_status()
+                quotes = response.json()["quoteResponse"]["result"]
+                outcome = OK
+        except Exception as e:
+            outcome = ERROR
+            logger.error(f"Error fetching BIST quotes for {len(codes)} symbols: {e}")
+        metrics.observe("fetch.bist.latency_ms", (time.monotonic() - started) * 1000)
+
+        self.limiter.record(BIST_QUOTE_URL, outcome)
+        metrics.inc(f"fetch.bist.{outcome}")
+
+        prices = {}
+        for quote in quotes:
+            symbol = quote.get("symbol", "")
+            price = quote.get("regularMarketPrice")
+            if symbol.endswith(BIST_SYMBOL_SUFFIX) and price:
+                prices[symbol[:-len(BIST_SYMBOL_SUFFIX)]] = float(price)
+        return prices
@@ -0,0 +1,324 @@
+from tefas import Crawler
+from backend.models import AssetType
+from backend.services.providers.base import PriceProvider
+from backend.services.extractors import extract_price, is_captcha_page
+from backend.services.throttle import AdaptiveRateLimiter, CircuitBreaker, FetchAborted, OK, BLOCKED, ERROR, CANCELLED
+from backend.services.hedging import FETCH_HEDGE, SourceStats, HedgeBudget, rank_sources, first_success
+from backend.services import metrics
+from datetime import datetime, date, timedelta
+import asyncio
+import logging
+import os
+import httpx
+import requests
+import time
+
+logger = logging.getLogger(__name__)
+
+# Scraper configuration
+FETCH_CONCURRENCY = int(os.getenv("FETCH_CONCURRENCY", "4"))
+# Request pacing is adaptive, see services/throttle.py (FETCH_HOST_RATE*, FETCH_BREAKER_*)
+FETCH_MAX_RETRIES = int(os.getenv("FETCH_MAX_RETRIES", "3"))
+FETCH_TIMEOUT = float(os.getenv("FETCH_TIMEOUT", "10"))
+FETCH_CRAWLER_LOOKBACK_DAYS = int(os.getenv("FETCH_CRAWLER_LOOKBACK_DAYS", "7"))
+# Per-fund price sources in default preference order; reordered by observed speed and success
+FETCH_HEDGE_SOURCES = os.getenv("FETCH_HEDGE_SOURCES", "page,page-alt,crawler").split(",")
+
+TEFAS_BASE_URL = os.getenv("TEFAS_BASE_URL", "https://www.tefas.gov.tr")  # Point at benchmarks/tefas_standin.py for load tests
+
+BROWSER_HEADERS = {
+    'User-Agent': 'Mozilla/5.0 (Macintosh; Intel Mac OS X 10.15; rv:148.0) Gecko/20100101 Firefox/148.0',
+    'Accept': 'text/html,application/xhtml+xml,application/xml;q=0.9,image/avif,image/webp,*/*;q=0.8',
+    'Accept-Language': 'tr-TR,tr;q=0.8,en-US;q=0.5,en;q=0.3',
+    'Accept-Encoding': 'gzip, deflate',
+    'Connection': 'keep-alive',
+    'Upgrade-Insecure-Requests': '1',
+    'Sec-Fetch-Dest': 'document',
+    'Sec-Fetch-Mode': 'navigate',
+    'Sec-Fetch-Site': 'none',
+    'Sec-Fetch-User': '?1',
+    'Cache-Control': 'max-age=0',
+}
+
+def create_tefas_client(concurrency: int = FETCH_CONCURRENCY) -> httpx.AsyncClient:
+    """Pooled async HTTP client with browser-like headers, sized for the worker count."""
+    return httpx.AsyncClient(
+        headers=BROWSER_HEADERS,
+        timeout=FETCH_TIMEOUT,
+        follow_redirects=True,
+        limits=httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency),
+    )
+
+async def fetch_quotes_bulk(fund_codes: list[str], start: date | None = None, end: date | None = None) -> dict[str, list[tuple[date, float]]]:
+    """
+    Pulls prices of all funds for start..end with tefas.Crawler and keeps only `fund_codes`.
+    The crawler is blocking, so it runs in a worker thread.
+    Returns code -> [(day, price), ...] sorted by day; funds without data are left out.
+    """
+    end = end or date.today()
+    start = start or end - timedelta(days=FETCH_CRAWLER_LOOKBACK_DAYS)
+    try:
+        return await asyncio.to_thread(crawl_fund_prices, set(fund_codes), start, end)
+    except Exception as e:
+        logger.error(f"TEFAS crawler failed for {start}..{end}: {e}")
+        return {}
+
+def crawl_fund_prices(fund_codes: set[str], start: date, end: date, name: str | None = None) -> dict[str, list[tuple[date, float]]]:
+    data = Crawler().fetch(start=start.isoformat(), end=end.isoformat(), name=name, columns=["date", "code", "price"])
+
+    quotes = {}
+    for day, code, price in data.itertuples(index=False):
+        if code not in fund_codes or price is None:
+            continue
+        if isinstance(day, str):
+            day = date.fromisoformat(day[:10])
+        elif isinstance(day, datetime):
+            day = day.date()
+        quotes.setdefault(code, []).append((day, float(price)))
+
+    for days in quotes.values():
+        days.sort()
+    return quotes
+
+class TefasProvider(PriceProvider):
+    """
+    TEFAS fund prices. fetch_many() scrapes FonAnaliz.aspx pages, fetch_history() pulls
+    date ranges in bulk with tefas.Crawler.
+    The provider holds the pooled clients, the adaptive rate limiter and the circuit breaker
+    for one fetch run, so their state carries over from one fetch_many() call to the next.
+
+    Each fund request goes to the best-ranked source of FETCH_HEDGE_SOURCES ("page" = main
+    session, "page-alt" = a second session, "crawler" = the tefas.Crawler API). When the
+    primary is slower than its latency percentile the request is hedged to the runner-up
+    (see services/hedging.py). Source stats are persisted, so the faster source leads the
+    next run.
+    """
+
+    name = "tefas"
+    asset_type = AssetType.FUND.value
+    supports_history = True
+
+    def __init__(self, concurrency: int = FETCH_CONCURRENCY):
+        self.concurrency = concurrency
+        self.limiter = AdaptiveRateLimiter()
+        self.breaker = CircuitBreaker()
+        self.budget = HedgeBudget()
+        self.client = None
+        self.alt_client = None
+        self.sources = {
+            "page": lambda code: fetch_fund_page(code, self.client),
+            "page-alt": lambda code: fetch_fund_page(code, self.alt_client),
+            "crawler": fetch_fund_crawler,
+        }
+        self.source_names = [name for name in FETCH_HEDGE_SOURCES if name in self.sources]
+        if not FETCH_HEDGE:
+            self.source_names = self.source_names[:1]
+        self.stats = {name: SourceStats() for name in self.source_names}
+
+    @property
+    def aborted(self) -> bool:
+        return self.breaker.aborted
+
+    async def __aenter__(self):
+        self.client = await open_tefas_session(self.concurrency)
+        if "page-alt" in self.source_names:
+            self.alt_client = await open_tefas_session(self.concurrency)
+        return self
+
+    async def __aexit__(self, *exc_info):
+        await self.client.aclose()
+        if self.alt_client:
+            await self.alt_client.aclose()
+        logger.info(f"Fetch metrics: {metrics.snapshot()['counters']}")
+        logger.info(f"Source stats: {self.export_stats()}")
+
+    def restore_stats(self, stats: dict[str, dict]):
+        for name, values in stats.items():
+            if name in self.stats:
+                self.stats[name] = SourceStats(**values)
+        logger.info(f"TEFAS source ranking: {rank_sources(self.stats, self.source_names)}")
+
+    def export_stats(self) -> dict[str, dict]:
+        return {name: stats.to_dict() for name, stats in self.stats.items() if stats.requests}
+
+    async def fetch_many(self, fund_codes: list[str]) -> dict[str, float | None]:
+        """
+        Scrapes the given funds with `concurrency` workers.
+        Codes are taken from a FIFO queue, so they are started in the order given. While the
+        breaker is open every worker waits, then carries on with the next fund in the queue.
+        Returns a code -> price mapping (None for funds that could not be fetched).
+        If the breaker gives up, funds that were never attempted are left out of the mapping.
+        """
+        prices = {}
+        if not fund_codes or self.aborted:
+            return prices
+
+        queue = asyncio.Queue()
+        for code in fund_codes:
+            queue.put_nowait(code)
+
+        async def worker():
+            while True:
+                try:
+                    code = queue.get_nowait()
+                except asyncio.QueueEmpty:
+                    return
+                try:
+                    prices[code] = await self.fetch_fund(code)
+                except FetchAborted:
+                    return
+
+        await asyncio.gather(*(worker() for _ in range(min(self.concurrency, len(fund_codes)))))
+        if self.aborted:
+            logger.error(f"Fetch aborted by the circuit breaker, {len(fund_codes) - len(prices)} funds left for the next run.")
+        return prices
+
+    async def fetch_history(self, fund_codes: list[str], start: date | None = None, end: date | None = None) -> dict[str, list[tuple[date, float]]]:
+        return await fetch_quotes_bulk(fund_codes, start, end)
+
+    async def fetch_fund(self, fund_code: str) -> float | None:
+        fund_started = time.monotonic()
+        for attempt in range(1, FETCH_MAX_RETRIES + 1):
+            # Pacing comes from the shared limiter; the breaker pauses everyone while TEFAS is blocking us
+            await self.breaker.wait()
+            price, outcome = await self.fetch_hedged(fund_code)
+            self.breaker.record(outcome)
+            if price is not None:
+                metrics.observe("fetch.fund_ms", (time.monotonic() - fund_started) * 1000)
+                return price
+
+            # CAPTCHA, HTTP or parse error: retry
+            metrics.inc("fetch.retries")
+            logger.warning(f"Attempt {attempt}/{FETCH_MAX_RETRIES} failed for {fund_code} ({outcome}).")
+        metrics.observe("fetch.fund_ms", (time.monotonic() - fund_started) * 1000)
+        return None
+
+    async def fetch_hedged(self, fund_code: str) -> tuple[float | None, str]:
+        """
+        Asks the best-ranked source. If it has not answered within its hedge delay and the
+        hedge budget allows, also asks the runner-up and takes the first good answer.
+        """
+        ranked = rank_sources(self.stats, self.source_names)
+        primary = ranked[0]
+        alternate = ranked[1] if len(ranked) > 1 else None
+
+        self.budget.primary()
+        primary_task = asyncio.create_task(self.call_source(primary, fund_code))
+        delay = self.stats[primary].hedge_delay() if alternate else None
+        if delay is None:
+            price, outcome, _ = await primary_task
+            return price, outcome
+
+        done, _ = await asyncio.wait({primary_task}, timeout=delay)
+        if done or not self.budget.take():
+            price, outcome, _ = await primary_task
+            return price, outcome
+
+        metrics.inc("fetch.hedges")
+        hedge_task = asyncio.create_task(self.call_source(alternate, fund_code, hedge=True))
+        price, outcome, source = await first_success([primary_task, hedge_task])
+        if price is not None and source == alternate:
+            metrics.inc("fetch.hedge_wins")
+        return price, outcome
+
+    async def call_source(self, source: str, fund_code: str, hedge: bool = False) -> tuple[float | None, str, str]:
+        url = source_url(source, fund_code)
+        await self.limiter.acquire(url)
+
+        started = time.monotonic()
+        try:
+            price, outcome = await self.sources[source](fund_code)
+        except asyncio.CancelledError:
+            # The other request of a hedge answered first. A primary still took at least this
+            # long: without the sample its slowest requests would never count. Neither is a
+            # failure of the source nor a reason for the rate limiter to back off.
+            if not hedge:
+                self.stats[source].record_latency((time.monotonic() - started) * 1000)
+            metrics.inc("fetch.requests")
+            metrics.inc(f"fetch.{CANCELLED}")
+            metrics.inc(f"fetch.source.{source}.{CANCELLED}")
+            raise
+        elapsed_ms = (time.monotonic() - started) * 1000
+
+        self.limiter.record(url, outcome)
+        self.stats[source].record(outcome == OK, elapsed_ms)
+        metrics.inc("fetch.requests")
+        metrics.observe("fetch.latency_ms", elapsed_ms)
+        metrics.inc(f"fetch.{outcome}")
+        metrics.inc(f"fetch.source.{source}.{outcome}")
+        return price, outcome, source
+
+async def open_tefas_session(concurrency: int) -> httpx.AsyncClient:
+    client = create_tefas_client(concurrency)
+    # Initial request to main page to get cookies/session tokens
+    try:
+        logger.info("Initializing TEFAS session...")
+        await client.get(f"{TEFAS_BASE_URL}/Default.aspx")
+    except Exception as e:
+        logger.warning(f"Initial session setup failed, continuing might fail: {e}")
+    return client
+
+def source_url(source: str, fund_code: str) -> str:
+    if source == "crawler":
+        return f"{Crawler.root_url}/api/DB/BindHistoryInfo"
+    return fund_page_url(fund_code)
+
+async def fetch_fund_crawler(fund_code: str) -> tuple[float | None, str]:
+    """Latest price of one fund from the tefas.Crawler API."""
+    end = date.today()
+    start = end - timedelta(days=FETCH_CRAWLER_LOOKBACK_DAYS)
+    code = fund_code.upper()
+    try:
+        quotes = await asyncio.to_thread(crawl_fund_prices, {code}, start, end, code)
+    except Exception as e:
+        logger.error(f"Error fetching price for {fund_code} from the TEFAS crawler: {e}")
+        return None, ERROR
+    if not quotes.get(code):
+        return None, ERROR
+    return quotes[code][-1][1], OK
+
+def fund_page_url(fund_code: str) -> str:
+    return f"{TEFAS_BASE_URL}/FonAnaliz.aspx?FonKod={fund_code.upper()}"
+
+async def fetch_fund_page(fund_code: str, client: httpx.AsyncClient) -> tuple[float | None, str]:
+    """
+    Fetches one FonAnaliz.aspx page through the shared client.
+    Returns (price, outcome) where outcome is OK, BLOCKED (CAPTCHA/WAF, HTTP 403/429) or ERROR.
+    """
+    try:
+        response = await client.get(fund_page_url(fund_code))
+        if response.status_code in (403, 429):
+            return None, BLOCKED
+        response.raise_for_status()
+    except Exception as e:
+        logger.error(f"Error fetching price for {fund_code} from web: {e}")
+        return None, ERROR
+
+    price = extract_price(response.content, fund_code)
+    if price is not None:
+        return price, OK
+    return None, BLOCKED if is_captcha_page(response.content) else ERROR
+
+def fetch_fund_price_from_web(fund_code: str, session: requests.Session = None) -> float | None:
+    """
+    Fetches the latest price of a specific fund directly from TEFAS web page HTML.
+    Target URL: https://www.tefas.gov.tr/FonAnaliz.aspx?FonKod={fund_code}
+    Uses a requests.Session if provided to maintain cookies.
+    """
+    url = fund_page_url(fund_code)
+    
+    try:
+        # Use provided session or create a new temporary one
+        if session:
+            response = session.get(url, timeout=FETCH_TIMEOUT)
+        else:
+            # If creating new request without session, at least add User-Agent
+            headers = {'User-Agent': BROWSER_HEADERS['User-Agent']}
+            response = requests.get(url, headers=headers, timeout=FETCH_TIMEOUT)
+            
+        response.raise_for_status()
+        return extract_price(response.content, fund_code)
+
+    except Exception as e:
+        logger.error(f"Error fetching price for {fund_code} from web: {e}")
+        return None
@@ -0,0 +1,168 @@
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import select, func
+from backend.models import Asset, AssetType, PriceHistory
+from backend.services.planner import plan_fetch, FETCH_STALE_AFTER
+from datetime import datetime, date, time, timedelta
+import logging
+import os
+
+logger = logging.getLogger(__name__)
+
+# Publication-window-aware scheduling.
+# TEFAS publishes one NAV per fund per business day. Scheduled runs skip weekends and
+# market holidays, poll a fund densely only inside its learned publication window and
+# stop once today's price has landed.
+PUBLISH_WINDOW_DEFAULT = os.getenv("PUBLISH_WINDOW_DEFAULT", "09:00-12:00")  # For funds without enough history
+PUBLISH_LEARN_DAYS = int(os.getenv("PUBLISH_LEARN_DAYS", "30"))  # History used to learn each fund's window
+PUBLISH_MIN_SAMPLES = int(os.getenv("PUBLISH_MIN_SAMPLES", "5"))
+PUBLISH_WINDOW_MARGIN = int(os.getenv("PUBLISH_WINDOW_MARGIN", "30"))  # Minutes added on both sides of the learned window
+PUBLISH_POLL_SECONDS = int(os.getenv("PUBLISH_POLL_SECONDS", "240"))  # Re-poll interval inside the window
+BIST_SESSION = os.getenv("BIST_SESSION", "10:00-18:10")
+# Extra closed days (YYYY-MM-DD,...), e.g. bridge days or years missing from RELIGIOUS_HOLIDAYS
+MARKET_HOLIDAYS_EXTRA = {date.fromisoformat(day) for day in os.getenv("MARKET_HOLIDAYS_EXTRA", "").split(",") if day}
+
+# Official holidays with markets closed (month, day)
+FIXED_HOLIDAYS = {
+    (1, 1),   # New Year's Day
+    (4, 23),  # National Sovereignty and Children's Day
+    (5, 1),   # Labour and Solidarity Day
+    (5, 19),  # Commemoration of Atatürk, Youth and Sports Day
+    (7, 15),  # Democracy and National Unity Day
+    (8, 30),  # Victory Day
+    (10, 29), # Republic Day
+}
+
+# Ramazan and Kurban Bayramı follow the lunar calendar; extend yearly (or use MARKET_HOLIDAYS_EXTRA)
+RELIGIOUS_HOLIDAYS = {
+    # 2024
+    date(2024, 4, 10), date(2024, 4, 11), date(2024, 4, 12),
+    date(2024, 6, 16), date(2024, 6, 17), date(2024, 6, 18), date(2024, 6, 19),
+    # 2025
+    date(2025, 3, 30), date(2025, 3, 31), date(2025, 4, 1),
+    date(2025, 6, 6), date(2025, 6, 7), date(2025, 6, 8), date(2025, 6, 9),
+    # 2026
+    date(2026, 3, 20), date(2026, 3, 21), date(2026, 3, 22),
+    date(2026, 5, 27), date(2026, 5, 28), date(2026, 5, 29), date(2026, 5, 30),
+}
+
+def is_business_day(day: date) -> bool:
+    if day.weekday() >= 5:
+        return False
+    return (day.month, day.day) not in FIXED_HOLIDAYS and day not in RELIGIOUS_HOLIDAYS and day not in MARKET_HOLIDAYS_EXTRA
+
+def parse_window(value: str) -> tuple[int, int]:
+    """"HH:MM-HH:MM" -> (start, end) in minutes after midnight."""
+    start, end = (time.fromisoformat(part.strip()) for part in value.split("-"))
+    return start.hour * 60 + start.minute, end.hour * 60 + end.minute
+
+def minute_of_day(moment: datetime) -> int:
+    return moment.hour * 60 + moment.minute
+
+def price_changes(asset_type: str, since: date):
+    """
+    PriceHistory rows of `asset_type` from `since` on with the previous trading day's price.
+    A row whose price differs from the previous one is a publication; its `date` is the
+    time the fetcher first saw the new price.
+    """
+    previous_price = func.lag(PriceHistory.price).over(partition_by=PriceHistory.asset_id, order_by=PriceHistory.trading_day)
+    recent = (
+        select(
+            PriceHistory.asset_id, PriceHistory.trading_day, PriceHistory.date, PriceHistory.price,
+            previous_price.label("previous_price"),
+        )
+        .join(Asset, Asset.id == PriceHistory.asset_id)
+        .filter(Asset.type == asset_type, PriceHistory.trading_day >= since - timedelta(days=10))
+        .subquery()
+    )
+    return select(recent).filter(recent.c.trading_day >= since)
+
+class PublicationCalendar:
+    """Learned per-fund publication windows, refreshed once a day."""
+
+    def __init__(self):
+        self.day = None
+        self.windows: dict[int, tuple[int, int]] = {}
+        self.default_window = parse_window(PUBLISH_WINDOW_DEFAULT)
+
+    async def refresh(self, db: AsyncSession, today: date):
+        if self.day == today:
+            return
+        result = await db.execute(price_changes(AssetType.FUND.value, today - timedelta(days=PUBLISH_LEARN_DAYS)))
+
+        samples = {}
+        for row in result:
+            stamp = row.date if isinstance(row.date, datetime) else None
+            # Skip first prices, unchanged prices and bulk/backfilled rows stamped at midnight
+            if stamp is None or row.previous_price is None or row.price == row.previous_price:
+                continue
+            if stamp.date() != row.trading_day or stamp.time() == time(0):
+                continue
+            samples.setdefault(row.asset_id, []).append(minute_of_day(stamp))
+
+        self.windows = {}
+        for asset_id, minutes in samples.items():
+            if len(minutes) < PUBLISH_MIN_SAMPLES:
+                continue
+            minutes.sort()
+            early = minutes[int(len(minutes) * 0.1)]
+            late = minutes[min(len(minutes) - 1, int(len(minutes) * 0.9))]
+            self.windows[asset_id] = (max(0, early - PUBLISH_WINDOW_MARGIN), min(24 * 60 - 1, late + PUBLISH_WINDOW_MARGIN))
+        self.day = today
+        logger.info(f"Learned publication windows for {len(self.windows)} funds from {PUBLISH_LEARN_DAYS} days of history.")
+
+    def window(self, asset_id: int) -> tuple[int, int]:
+        return self.windows.get(asset_id, self.default_window)
+
+calendar = PublicationCalendar()
+
+async def plan_scheduled(db: AsyncSession, asset_type: str, now: datetime | None = None) -> list[Asset]:
+    """
+    plan_fetch() for scheduled runs: nothing on weekends and holidays, stocks only during
+    the BIST session, and funds by publication window:
+    - before the window: skipped
+    - inside the window: polled every PUBLISH_POLL_SECONDS until today's price lands
+    - after the window without a new price: polled at the normal FETCH_STALE_AFTER pace
+    - once today's price has landed: skipped until the next business day
+    """
+    now = now or datetime.now()
+    today = now.date()
+    if not is_business_day(today):
+        return []
+
+    if asset_type == AssetType.STOCK.value:
+        start, end = parse_window(BIST_SESSION)
+        return await plan_fetch(db, asset_type, now=now) if start <= minute_of_day(now) <= end else []
+    if asset_type != AssetType.FUND.value:
+        return await plan_fetch(db, asset_type, now=now)
+
+    await calendar.refresh(db, today)
+    candidates = await plan_fetch(db, asset_type, now=now, stale_after=PUBLISH_POLL_SECONDS)
+    if not candidates:
+        return []
+
+    result = await db.execute(price_changes(asset_type, today))
+    todays = {row.asset_id: row for row in result}
+
+    sparse_cutoff = now - timedelta(seconds=FETCH_STALE_AFTER[asset_type])
+    minute = minute_of_day(now)
+    due = []
+    for asset in candidates:
+        row = todays.get(asset.id)
+        if row is not None and (row.previous_price is None or row.price != row.previous_price):
+            continue  # Today's price has landed
+        start, end = calendar.window(asset.id)
+        if minute < start:
+            continue
+        if minute > end and row is not None and row.date >= sparse_cutoff:
+            continue
+        due.append(asset)
+
+    logger.info(f"Publication schedule: {len(due)}/{len(candidates)} stale funds are due.")
+    return due
+
+async def expected_requests(db: AsyncSession, day: date) -> int:
+    """Ideal TEFAS request count for a day: one per tracked fund on business days."""
+    if not is_business_day(day):
+        return 0
+    result = await db.execute(select(func.count(Asset.id)).filter(Asset.type == AssetType.FUND.value))
+    return result.scalar() or 0
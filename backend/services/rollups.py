@@ -0,0 +1,226 @@
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+from sqlalchemy import select, delete, insert, event, inspect
+from backend.models import PriceHistory, PriceRollup, RollupResolution
+from backend.services.archive import read_archive, open_archive, archived_asset_ids, archive_cutoff
+from datetime import date, timedelta
+import logging
+
+logger = logging.getLogger(__name__)
+
+# price_rollups: weekly and monthly OHLC bars of every asset.
+# There is no daily bar table: a daily bar would hold a single price (prices are published
+# once a day), i.e. a copy of the price_history row keyed the same way, that every write
+# would have to keep in sync. Daily reads come straight from price_history (and the archive).
+# - upsert_prices() merges new days into their bars with apply_rollups() (same transaction)
+# - overwritten prices and ORM writes (admin panel) recompute the affected bars from history
+# - rebuild_rollups() recomputes everything from history
+# History readers go through the price series cache (services/price_cache.py), which reads
+# the bars with services/history.py for week/month of assets it has not cached.
+
+def period_start(day: date, resolution: RollupResolution) -> date:
+    if resolution == RollupResolution.WEEK:
+        return day - timedelta(days=day.weekday())
+    return day.replace(day=1)
+
+def period_end(start: date, resolution: RollupResolution) -> date:
+    if resolution == RollupResolution.WEEK:
+        return start + timedelta(days=6)
+    return (start.replace(day=28) + timedelta(days=4)).replace(day=1) - timedelta(days=1)
+
+def merge_point(bar: dict | None, day: date, price: float) -> dict:
+    """Adds one trading day to a bar (None starts a new one)."""
+    if bar is None:
+        return {"open": price, "high": price, "low": price, "close": price, "first_day": day, "last_day": day, "samples": 1}
+    bar["high"] = max(bar["high"], price)
+    bar["low"] = min(bar["low"], price)
+    bar["samples"] += 1
+    if day < bar["first_day"]:
+        bar["open"], bar["first_day"] = price, day
+    if day > bar["last_day"]:
+        bar["close"], bar["last_day"] = price, day
+    return bar
+
+def bar_values(asset_id: int, resolution: RollupResolution, start: date, bar: dict) -> dict:
+    return {"asset_id": asset_id, "resolution": resolution.value, "period_start": start, **bar}
+
+def bucket_keys(asset_id: int, day: date):
+    for resolution in RollupResolution:
+        yield (asset_id, resolution, period_start(day, resolution))
+
+def refresh_buckets(connection, buckets: set):
+    """Recomputes the given (asset_id, resolution, period_start) bars from history (sync, any dialect)."""
+    for asset_id, resolution, start in buckets:
+        rows = connection.execute(
+            select(PriceHistory.trading_day, PriceHistory.price)
+            .filter(
+                PriceHistory.asset_id == asset_id,
+                PriceHistory.trading_day.between(start, period_end(start, resolution)),
+                PriceHistory.price.is_not(None),
+            )
+            .order_by(PriceHistory.trading_day)
+        ).all()
+        connection.execute(
+            delete(PriceRollup).where(
+                PriceRollup.asset_id == asset_id,
+                PriceRollup.resolution == resolution.value,
+                PriceRollup.period_start == start,
+            )
+        )
+        # Archived days of the bucket, overridden by the database
+        prices = {}
+        archived = read_archive([asset_id], start, period_end(start, resolution)).get(asset_id)
+        if archived is not None:
+            prices.update((day, price) for day, _, price in archived.rows())
+        prices.update((row.trading_day, row.price) for row in rows)
+        bar = None
+        for day in sorted(prices):
+            bar = merge_point(bar, day, prices[day])
+        if bar is not None:
+            connection.execute(insert(PriceRollup).values(bar_values(asset_id, resolution, start, bar)))
+
+async def apply_rollups(db: AsyncSession, rows: list[dict], replaced: set, dialect_insert):
+    """
+    Merges written PriceHistory rows ({"asset_id", "trading_day", "price"}) into their bars.
+    New days are folded into the stored bar; buckets where a price was overwritten
+    (replaced: {(asset_id, trading_day)}, or a day already in the archive) are recomputed,
+    since the old value may have been the high or low.
+    """
+    # A day older than the archive cutoff may already be archived: folding it in again would count it twice
+    cutoff = archive_cutoff(date.today())
+    old_days = {}
+    for row in rows:
+        if row["trading_day"] < cutoff:
+            old_days.setdefault(row["asset_id"], []).append(row["trading_day"])
+    for asset_id, days in old_days.items():
+        archived = read_archive([asset_id], min(days), max(days)).get(asset_id)
+        if archived is not None:
+            archived_days = {day for day, _, _ in archived.rows()}
+            replaced = replaced | {(asset_id, day) for day in days if day in archived_days}
+
+    points = {}
+    stale = set()
+    for row in rows:
+        key = (row["asset_id"], row["trading_day"])
+        for bucket in bucket_keys(*key):
+            if key in replaced:
+                stale.add(bucket)
+            else:
+                points.setdefault(bucket, []).append((row["trading_day"], row["price"]))
+
+    for bucket in stale:
+        points.pop(bucket, None)
+
+    if points:
+        current_result = await db.execute(
+            select(PriceRollup).filter(
+                PriceRollup.asset_id.in_({asset_id for asset_id, _, _ in points}),
+                PriceRollup.period_start.in_({start for _, _, start in points}),
+            )
+        )
+        current = {
+            (bar.asset_id, RollupResolution(bar.resolution), bar.period_start): bar
+            for bar in current_result.scalars().all()
+        }
+
+        values = []
+        for (asset_id, resolution, start), days in points.items():
+            stored = current.get((asset_id, resolution, start))
+            bar = None
+            if stored is not None:
+                bar = {column: getattr(stored, column) for column in ("open", "high", "low", "close", "first_day", "last_day", "samples")}
+            for day, price in days:
+                bar = merge_point(bar, day, price)
+            values.append(bar_values(asset_id, resolution, start, bar))
+
+        stmt = dialect_insert(PriceRollup).values(values)
+        stmt = stmt.on_conflict_do_update(
+            index_elements=[PriceRollup.asset_id, PriceRollup.resolution, PriceRollup.period_start],
+            set_={column: stmt.excluded[column] for column in ("open", "high", "low", "close", "first_day", "last_day", "samples")},
+        )
+        await db.execute(stmt)
+
+    if stale:
+        await db.run_sync(lambda session: refresh_buckets(session.connection(), stale))
+
+@event.listens_for(Session, "after_flush")
+def refresh_rollups_after_orm_writes(session: Session, flush_context):
+    """Keeps the bars in sync with PriceHistory rows added, edited or deleted through the ORM."""
+    buckets = set()
+    for obj in (*session.new, *session.dirty, *session.deleted):
+        if not isinstance(obj, PriceHistory):
+            continue
+        state = inspect(obj)
+        asset_ids = {obj.asset_id, *state.attrs.asset_id.history.deleted}
+        days = {obj.trading_day, *state.attrs.trading_day.history.deleted}
+        for asset_id in asset_ids - {None}:
+            for day in days - {None}:
+                buckets.update(bucket_keys(asset_id, day))
+    if buckets:
+        refresh_buckets(session.connection(), buckets)
+
+async def rebuild_rollups(db: AsyncSession) -> int:
+    """Recomputes all bars from the whole history table and the archive. Commits; returns the number of bars."""
+    bars = {}
+
+    def add_asset(asset_id: int, prices: dict):
+        # Archived days first, overridden by the database
+        columns = open_archive(asset_id)
+        days = dict((day, price) for day, _, price in columns.rows()) if columns is not None else {}
+        days.update(prices)
+        for day in sorted(days):
+            for bucket in bucket_keys(asset_id, day):
+                bars[bucket] = merge_point(bars.get(bucket), day, days[day])
+
+    result = await db.stream(
+        select(PriceHistory.asset_id, PriceHistory.trading_day, PriceHistory.price)
+        .filter(PriceHistory.price.is_not(None))
+        .order_by(PriceHistory.asset_id, PriceHistory.trading_day)
+    )
+    seen = set()
+    asset_id, prices = None, {}
+    async for row in result:
+        if row.asset_id != asset_id:
+            if asset_id is not None:
+                add_asset(asset_id, prices)
+                seen.add(asset_id)
+            asset_id, prices = row.asset_id, {}
+        prices[row.trading_day] = row.price
+    if asset_id is not None:
+        add_asset(asset_id, prices)
+        seen.add(asset_id)
+    for asset_id in archived_asset_ids() - seen:
+        add_asset(asset_id, {})
+
+    values = [bar_values(asset_id, resolution, start, bar) for (asset_id, resolution, start), bar in bars.items()]
+    await db.execute(delete(PriceRollup))
+    if values:
+        await db.execute(insert(PriceRollup), values)
+    await db.commit()
+    logger.info(f"Rebuilt {len(values)} price rollups.")
+    return len(values)
+
+def main():
+    """python -m backend.services.rollups --rebuild"""
+    import argparse
+    import asyncio
+    from backend.database import AsyncSessionLocal, engine
+
+    parser = argparse.ArgumentParser(description="Maintain the weekly/monthly price rollups")
+    parser.add_argument("--rebuild", action="store_true", help="Recompute price_rollups from price_history")
+    args = parser.parse_args()
+    if not args.rebuild:
+        parser.print_help()
+        return
+
+    async def run():
+        async with AsyncSessionLocal() as db:
+            count = await rebuild_rollups(db)
+        await engine.dispose()
+        print(f"Rebuilt {count} price rollups.")
+
+    logging.basicConfig(level=logging.INFO)
+    asyncio.run(run())
+
+if __name__ == "__main__":
+    main()
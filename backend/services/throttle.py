@@ -0,0 +1,161 @@
+from backend.services import metrics
+from collections import deque
+from urllib.parse import urlsplit
+import asyncio
+import logging
+import os
+import time
+
+logger = logging.getLogger(__name__)
+
+# Adaptive per-host rate limit (requests per second)
+FETCH_HOST_RATE = float(os.getenv("FETCH_HOST_RATE", "2.0"))  # Starting rate
+FETCH_HOST_RATE_MIN = float(os.getenv("FETCH_HOST_RATE_MIN", "0.1"))
+FETCH_HOST_RATE_MAX = float(os.getenv("FETCH_HOST_RATE_MAX", "5.0"))
+FETCH_HOST_BURST = float(os.getenv("FETCH_HOST_BURST", "1"))
+RATE_INCREASE = float(os.getenv("FETCH_HOST_RATE_INCREASE", "0.1"))  # Added to the rate after every successful request
+RATE_DECREASE = float(os.getenv("FETCH_HOST_RATE_DECREASE", "0.5"))  # Rate is multiplied by this after a block or error
+
+# Circuit breaker for the whole run
+FETCH_BREAKER_WINDOW = int(os.getenv("FETCH_BREAKER_WINDOW", "20"))  # Last N outcomes considered
+FETCH_BREAKER_THRESHOLD = float(os.getenv("FETCH_BREAKER_THRESHOLD", "0.5"))  # Block rate that trips it
+FETCH_BREAKER_COOLDOWN = float(os.getenv("FETCH_BREAKER_COOLDOWN", "60"))  # Seconds, doubles on every re-trip
+FETCH_BREAKER_MAX_TRIPS = int(os.getenv("FETCH_BREAKER_MAX_TRIPS", "5"))
+
+# Request outcomes
+OK = "ok"
+BLOCKED = "blocked"  # CAPTCHA/WAF page or HTTP 403/429
+ERROR = "error"  # Timeouts, other HTTP errors, unparseable pages
+CANCELLED = "cancelled"  # Dropped unanswered because the other request of a hedge answered first
+
+class FetchAborted(Exception):
+    """Raised when the circuit breaker gives up on the current run."""
+
+class TokenBucket:
+    def __init__(self, rate: float, burst: float):
+        self.rate = rate
+        self.burst = burst
+        self.tokens = burst
+        self.updated = time.monotonic()
+
+    def refill(self, now: float):
+        self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+class AdaptiveRateLimiter:
+    """
+    Token bucket per host whose rate follows AIMD: it grows by RATE_INCREASE after every
+    success and is multiplied by RATE_DECREASE after a block or error.
+    Shared by all workers of a run.
+    """
+
+    def __init__(self, rate: float = FETCH_HOST_RATE, min_rate: float = FETCH_HOST_RATE_MIN,
+                 max_rate: float = FETCH_HOST_RATE_MAX, burst: float = FETCH_HOST_BURST):
+        self.initial_rate = rate
+        self.min_rate = min_rate
+        self.max_rate = max_rate
+        self.burst = burst
+        self._buckets = {}
+        self._lock = asyncio.Lock()
+
+    def _bucket(self, host: str) -> TokenBucket:
+        if host not in self._buckets:
+            self._buckets[host] = TokenBucket(self.initial_rate, self.burst)
+        return self._buckets[host]
+
+    async def acquire(self, url: str):
+        host = urlsplit(url).netloc
+        while True:
+            async with self._lock:
+                bucket = self._bucket(host)
+                bucket.refill(time.monotonic())
+                if bucket.tokens >= 1:
+                    bucket.tokens -= 1
+                    return
+                delay = (1 - bucket.tokens) / bucket.rate
+            await asyncio.sleep(delay)
+
+    def record(self, url: str, outcome: str):
+        host = urlsplit(url).netloc
+        bucket = self._bucket(host)
+        bucket.refill(time.monotonic())
+        if outcome == OK:
+            bucket.rate = min(self.max_rate, bucket.rate + RATE_INCREASE)
+        elif outcome in (BLOCKED, ERROR):
+            previous = bucket.rate
+            bucket.rate = max(self.min_rate, bucket.rate * RATE_DECREASE)
+            if bucket.rate != previous:
+                logger.info(f"Rate limit for {host} lowered to {bucket.rate:.2f} req/s after {outcome}")
+        metrics.set_gauge(f"fetch.rate.{host}", bucket.rate)
+
+    def rate(self, url: str) -> float:
+        return self._bucket(urlsplit(url).netloc).rate
+
+class CircuitBreaker:
+    """
+    Pauses every worker of a run once the block rate over the last `window` outcomes
+    crosses `threshold`. After the cooldown, requests resume; a block right away
+    re-opens the breaker with twice the cooldown. Gives up (FetchAborted) after
+    `max_trips` trips, leaving the remaining funds for the next run.
+    """
+
+    def __init__(self, window: int = FETCH_BREAKER_WINDOW, threshold: float = FETCH_BREAKER_THRESHOLD,
+                 cooldown: float = FETCH_BREAKER_COOLDOWN, max_trips: int = FETCH_BREAKER_MAX_TRIPS):
+        self.window = deque(maxlen=window)
+        self.threshold = threshold
+        self.cooldown = cooldown
+        self.max_trips = max_trips
+        self.trips = 0
+        self.open_until = 0.0
+        self.half_open = False
+        self.aborted = False
+
+    @property
+    def state(self) -> str:
+        if self.aborted:
+            return "aborted"
+        if time.monotonic() < self.open_until:
+            return "open"
+        return "half-open" if self.half_open else "closed"
+
+    async def wait(self):
+        """Blocks while the breaker is open. Raises FetchAborted once it has given up."""
+        while True:
+            if self.aborted:
+                raise FetchAborted(f"Circuit breaker tripped {self.trips} times")
+            delay = self.open_until - time.monotonic()
+            if delay <= 0:
+                return
+            await asyncio.sleep(delay)
+
+    def record(self, outcome: str):
+        blocked = outcome == BLOCKED
+        if self.half_open:
+            # First outcome after a pause decides whether the block is over
+            self.half_open = False
+            if blocked:
+                self._trip()
+                return
+            self.window.clear()
+            metrics.set_gauge("fetch.breaker_open", 0)
+            logger.info("Requests succeed again, circuit breaker closed.")
+
+        self.window.append(blocked)
+        if len(self.window) == self.window.maxlen and sum(self.window) / len(self.window) >= self.threshold:
+            self._trip()
+
+    def _trip(self):
+        self.trips += 1
+        self.window.clear()
+        metrics.inc("fetch.breaker_trips")
+        if self.trips > self.max_trips:
+            self.aborted = True
+            metrics.set_gauge("fetch.breaker_open", 1)
+            logger.error(f"Circuit breaker tripped {self.trips} times, aborting the run.")
+            return
+
+        pause = self.cooldown * 2 ** (self.trips - 1)
+        self.open_until = time.monotonic() + pause
+        self.half_open = True
+        metrics.set_gauge("fetch.breaker_open", 1)
+        logger.warning(f"Block rate above {self.threshold:.0%}, circuit breaker open: pausing all requests for {pause:.0f}s (trip {self.trips}/{self.max_trips}).")
@@ -0,0 +1,118 @@
+from backend.models import OrderType
+from backend.services.epoch import epoch_day
+import numpy as np
+
+# Vectorized portfolio valuation for /portfolio/history:
+# - price_matrix() lays the assets' price series out as a dense (bucket x asset) matrix and
+#   forward-fills it along the buckets (an asset keeps its last price until it has a new one)
+# - valuate() multiplies it with the holdings; assets without any price yet count for nothing
+# A few array operations instead of a Python loop over every bucket and asset.
+# Buckets and days are epoch days (services/epoch.py).
+
+def forward_fill(matrix: np.ndarray) -> np.ndarray:
+    """Replaces every NaN with the last value above it in the same column (leading NaNs stay)."""
+    rows = np.where(np.isnan(matrix), 0, np.arange(len(matrix))[:, None])
+    np.maximum.accumulate(rows, axis=0, out=rows)
+    return np.take_along_axis(matrix, rows, axis=0)
+
+def price_matrix(columns: dict[int, dict[str, np.ndarray]], asset_ids: list[int],
+                 opening: np.ndarray | None = None) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    Dense prices of price_cache.read_columns() output, one column per asset_ids entry.
+
+    Returns (buckets, labels, prices): the sorted buckets (epoch days) any asset has a price
+    in, the last trading day seen in each bucket, and the forward-filled prices (NaN before
+    an asset's first price). opening holds each asset's price before the first bucket (NaN
+    if none) for series that start mid-history; it is carried forward like any other price.
+    """
+    parts = [(index, columns[asset_id]) for index, asset_id in enumerate(asset_ids)
+             if asset_id in columns and len(columns[asset_id]["bucket"])]
+    if not parts:
+        return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.int64), np.empty((0, len(asset_ids)))
+
+    buckets, rows = np.unique(np.concatenate([part["bucket"] for _, part in parts]), return_inverse=True)
+    assets = np.repeat([index for index, _ in parts], [len(part["bucket"]) for _, part in parts])
+
+    prices = np.full((len(buckets), len(asset_ids)), np.nan)
+    prices[rows, assets] = np.concatenate([part["price"] for _, part in parts])
+
+    labels = np.full(len(buckets), np.iinfo(np.int64).min)
+    np.maximum.at(labels, rows, np.concatenate([part["day"] for _, part in parts]).astype(np.int64))
+    if opening is not None:
+        return buckets, labels, forward_fill(np.vstack([opening, prices]))[1:]
+    return buckets, labels, forward_fill(prices)
+
+def valuate(prices: np.ndarray, quantities: np.ndarray, unit_costs: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+    """
+    (total_value, total_cost) per bucket. quantities and unit_costs are per asset, either
+    one vector for every bucket or a (bucket x asset) matrix; unpriced assets are skipped.
+    """
+    priced = ~np.isnan(prices)
+    total_value = (np.where(priced, prices, 0.0) * quantities).sum(axis=1)
+    total_cost = (priced * (quantities * unit_costs)).sum(axis=1)
+    return total_value, total_cost
+
+# Holdings over time from the order ledger: every asset's orders are swept once, oldest first,
+# into step functions of quantity, average cost and realized profit (weighted average cost,
+# the same bookkeeping as POST /portfolio/order), which are then sampled at the valuation days.
+
+def ledger_steps(orders, quantity: float, average_cost: float):
+    """
+    Steps of one asset's (day, type, quantity, price) orders, sorted by execution, starting
+    from an opening (quantity, average_cost). Returns (days, quantities, average_costs,
+    realized) arrays, holding the values after each order.
+    """
+    steps = np.empty((4, len(orders)))
+    realized = 0.0
+    for index, (day, order_type, order_quantity, price) in enumerate(orders):
+        if order_type == OrderType.BUY:
+            total_quantity = quantity + order_quantity
+            average_cost = (quantity * average_cost + order_quantity * price) / total_quantity if total_quantity > 0 else 0
+            quantity = total_quantity
+        else:
+            realized += (price - average_cost) * order_quantity
+            quantity = max(quantity - order_quantity, 0.0)
+        steps[:, index] = day, quantity, average_cost, realized
+    return steps
+
+def holdings_timeline(asset_ids: list[int], holdings: dict[int, tuple[float, float]], orders, days: np.ndarray):
+    """
+    (quantities, average_costs, realized) matrices of shape (days x asset_ids) at the end of
+    each epoch day in `days`.
+
+    holdings maps asset_id -> current (quantity, average_cost) and orders are (asset_id,
+    executed_at, type, quantity, price, cost_snapshot) rows sorted by execution. Whatever the
+    ledger does not explain (holdings entered without orders) is an opening position held from
+    the start, at the average cost recorded before the first order (the current average cost
+    if there are no orders), so a portfolio without orders is valued as it stands today.
+    """
+    ledgers = {asset_id: [] for asset_id in asset_ids}
+    opening_costs = {}
+    for asset_id, executed_at, order_type, quantity, price, cost_snapshot in orders:
+        if asset_id in ledgers:
+            ledgers[asset_id].append((epoch_day(executed_at), order_type, quantity, price))
+            opening_costs.setdefault(asset_id, cost_snapshot)
+
+    shape = (len(days), len(asset_ids))
+    quantities, average_costs, realized = np.zeros(shape), np.zeros(shape), np.zeros(shape)
+    for column, asset_id in enumerate(asset_ids):
+        quantity, average_cost = holdings[asset_id]
+        ledger = ledgers[asset_id]
+        net = sum(order_quantity if order_type == OrderType.BUY else -order_quantity for _, order_type, order_quantity, _ in ledger)
+        opening = quantity - net if abs(quantity - net) > 1e-9 else 0.0
+        if not ledger:
+            quantities[:, column], average_costs[:, column] = opening, average_cost
+            continue
+
+        # Orders without a cost_snapshot (e.g. added in the admin panel) fall back to the current average cost
+        opening_cost = opening_costs[asset_id]
+        opening_cost = (average_cost if opening_cost is None else opening_cost) if opening > 0 else 0.0
+        steps = ledger_steps(ledger, max(opening, 0.0), opening_cost)
+        # Index of the last order on or before each day; -1 is the opening position
+        index = np.searchsorted(steps[0], days, side="right") - 1
+        before = index < 0
+        index[before] = 0
+        quantities[:, column] = np.where(before, max(opening, 0.0), steps[1][index])
+        average_costs[:, column] = np.where(before, opening_cost, steps[2][index])
+        realized[:, column] = np.where(before, 0.0, steps[3][index])
+    return quantities, average_costs, realized
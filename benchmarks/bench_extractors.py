@@ -0,0 +1,52 @@
+"""
+Micro-benchmark for the FonAnaliz.aspx price extractors.
+
+Usage (from the project root):
+    python -m benchmarks.bench_extractors [--repeat 200]
+
+Reports per-page parse time and peak memory of every extractor in
+backend.services.extractors.EXTRACTORS over the saved pages in benchmarks/fixtures.
+"""
+from backend.services.extractors import EXTRACTORS
+from pathlib import Path
+import argparse
+import statistics
+import time
+import tracemalloc
+
+FIXTURES_DIR = Path(__file__).parent / "fixtures"
+
+def bench_page(extract, content: bytes, repeat: int) -> tuple[float, float, int]:
+    """Returns (median ms, p95 ms, peak bytes) of `extract` over `content`."""
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        extract(content)
+        timings.append((time.perf_counter() - started) * 1000)
+
+    tracemalloc.start()
+    extract(content)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    timings.sort()
+    return statistics.median(timings), timings[int(len(timings) * 0.95) - 1], peak
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark TEFAS price extractors")
+    parser.add_argument("--repeat", type=int, default=200, help="Parses per page and extractor")
+    args = parser.parse_args()
+
+    pages = sorted(FIXTURES_DIR.glob("*.html"))
+    print(f"{'page':<24} {'size':>8} {'extractor':<10} {'price':>14} {'median ms':>10} {'p95 ms':>10} {'peak KiB':>10}")
+    for page in pages:
+        content = page.read_bytes()
+        for name, extract in EXTRACTORS.items():
+            median, p95, peak = bench_page(extract, content, args.repeat)
+            print(
+                f"{page.name:<24} {len(content) // 1024:>6}Ki {name:<10} {str(extract(content)):>14} "
+                f"{median:>10.3f} {p95:>10.3f} {peak / 1024:>10.1f}"
+            )
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,133 @@
+"""
+Load test for the price fetcher against the local TEFAS stand-in.
+
+Usage (from the project root):
+    python -m benchmarks.bench_fetcher --funds 1000 --concurrency 8 --latency-ms 80 --captcha-rate 0.02
+
+Starts benchmarks/tefas_standin.py in a subprocess, builds a synthetic catalog of
+--funds FUND assets in a throwaway SQLite database, runs one full fetch_fund_prices
+and reports throughput, per-fund latency, retries and DB write time.
+"""
+from pathlib import Path
+import argparse
+import asyncio
+import logging
+import os
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+
+def wait_for_port(port: int, timeout: float = 10):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            with socket.create_connection(("127.0.0.1", port), timeout=0.2):
+                return
+        except OSError:
+            time.sleep(0.05)
+    raise RuntimeError(f"Stand-in server did not start on port {port}")
+
+def fmt_ms(value) -> str:
+    return "-" if value is None else f"{value:.1f} ms"
+
+async def run_benchmark(args) -> dict:
+    # Backend modules read their configuration at import time, so import after the env is set
+    from backend.database import engine, AsyncSessionLocal
+    from backend.models import Base, Asset, AssetType, FetchRunItem, FetchItemStatus
+    from backend.services.fetcher import fetch_fund_prices
+    from backend.services import metrics
+    from sqlalchemy import insert, select, func
+
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+        await conn.execute(insert(Asset), [
+            {"code": f"B{i:04d}", "name": f"Benchmark Fund {i}", "type": AssetType.FUND.value}
+            for i in range(args.funds)
+        ])
+
+    metrics.reset()
+    started = time.monotonic()
+    async with AsyncSessionLocal() as db:
+        await fetch_fund_prices(db, mode="page")
+    elapsed = time.monotonic() - started
+    async with AsyncSessionLocal() as db:
+        # Funds whose run item finished with a saved price (fetch.ok also counts hedge answers)
+        result = await db.execute(
+            select(func.count(func.distinct(FetchRunItem.asset_id))).filter(FetchRunItem.status == FetchItemStatus.DONE.value)
+        )
+        priced = result.scalar()
+    await engine.dispose()
+    return {"elapsed": elapsed, "priced": priced, "metrics": metrics.snapshot()}
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark fetch_fund_prices against the TEFAS stand-in")
+    parser.add_argument("--funds", type=int, default=500, help="Synthetic catalog size (100-5000)")
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--host-rate", type=float, default=1000, help="Starting per-host rate limit (req/s)")
+    parser.add_argument("--latency-ms", type=float, default=50)
+    parser.add_argument("--jitter-ms", type=float, default=20)
+    parser.add_argument("--captcha-rate", type=float, default=0.0)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--slow-rate", type=float, default=0.0, help="Share of requests answered after --slow-ms")
+    parser.add_argument("--slow-ms", type=float, default=2000)
+    parser.add_argument("--port", type=int, default=8900)
+    parser.add_argument("--verbose", action="store_true", help="Keep the fetcher's log output")
+    args = parser.parse_args()
+
+    if not args.verbose:
+        logging.disable(logging.CRITICAL)
+
+    workdir = Path(tempfile.mkdtemp(prefix="bench_fetcher_"))
+    os.environ.update({
+        "DATABASE_URL": f"sqlite+aiosqlite:///{workdir / 'bench.db'}",
+        "TEFAS_BASE_URL": f"http://127.0.0.1:{args.port}",
+        "FETCH_CONCURRENCY": str(args.concurrency),
+        "FETCH_HOST_RATE": str(args.host_rate),
+        "FETCH_HOST_RATE_MAX": str(max(args.host_rate, 1.0)),
+        # The crawler source talks to the real TEFAS API, so hedge between the two page sessions only
+        "FETCH_HEDGE_SOURCES": "page,page-alt",
+    })
+
+    standin = subprocess.Popen([
+        sys.executable, "-m", "benchmarks.tefas_standin",
+        "--port", str(args.port),
+        "--latency-ms", str(args.latency_ms),
+        "--jitter-ms", str(args.jitter_ms),
+        "--captcha-rate", str(args.captcha_rate),
+        "--error-rate", str(args.error_rate),
+        "--slow-rate", str(args.slow_rate),
+        "--slow-ms", str(args.slow_ms),
+        "--seed", "1",
+    ], stdout=subprocess.DEVNULL)
+    try:
+        wait_for_port(args.port)
+        result = asyncio.run(run_benchmark(args))
+    finally:
+        standin.terminate()
+        standin.wait()
+
+    counters = result["metrics"]["counters"]
+    summaries = result["metrics"]["summaries"]
+    fund_ms = summaries.get("fetch.fund_ms", {})
+    request_ms = summaries.get("fetch.latency_ms", {})
+    write_ms = summaries.get("fetch.db_write_ms", {})
+    priced = result["priced"]
+
+    print(f"funds              {args.funds} (concurrency {args.concurrency}, latency {args.latency_ms:.0f}±{args.jitter_ms:.0f} ms, "
+          f"captcha {args.captcha_rate:.1%}, errors {args.error_rate:.1%})")
+    print(f"priced             {priced}")
+    print(f"wall time          {result['elapsed']:.2f} s")
+    print(f"throughput         {priced / result['elapsed']:.1f} funds/s")
+    print(f"per-fund latency   p50 {fmt_ms(fund_ms.get('p50'))}, p99 {fmt_ms(fund_ms.get('p99'))}")
+    print(f"per-request        p50 {fmt_ms(request_ms.get('p50'))}, p99 {fmt_ms(request_ms.get('p99'))}")
+    print(f"retries            {int(counters.get('fetch.retries', 0))} "
+          f"(blocked {int(counters.get('fetch.blocked', 0))}, errors {int(counters.get('fetch.error', 0))}, "
+          f"breaker trips {int(counters.get('fetch.breaker_trips', 0))})")
+    print(f"hedges             {int(counters.get('fetch.hedges', 0))} (won {int(counters.get('fetch.hedge_wins', 0))})")
+    print(f"db writes          {write_ms.get('count', 0)} commits, {fmt_ms(write_ms.get('sum'))} total, "
+          f"p50 {fmt_ms(write_ms.get('p50'))}, p99 {fmt_ms(write_ms.get('p99'))}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,138 @@
+"""
+Benchmark for GET /assets/{id} history payloads: default points vs columnar (plain and delta).
+
+Usage (from the project root):
+    python -m benchmarks.bench_history --days 5000 --repeat 30
+
+Builds one asset with --days daily prices in a throwaway SQLite database, serves the
+assets router in-process and reports, per format, the median request time, the time
+spent building and serializing the response from the rows the route reads, and the
+response size. columnar+delta is the format expected to be at least 5x better than points
+on both; plain columnar is 5x smaller but spends most of its time rendering JSON floats.
+"""
+from pathlib import Path
+import argparse
+import asyncio
+import logging
+import os
+import random
+import statistics
+import tempfile
+import time
+
+async def timed(call, repeat: int) -> float:
+    """Median ms of `await call()` over `repeat` runs (after one warm-up)."""
+    await call()
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        await call()
+        timings.append((time.perf_counter() - started) * 1000)
+    return statistics.median(timings)
+
+def timed_sync(call, repeat: int) -> float:
+    """Median ms of `call()` over `repeat` runs (after one warm-up)."""
+    call()
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        call()
+        timings.append((time.perf_counter() - started) * 1000)
+    return statistics.median(timings)
+
+async def run_benchmark(args) -> list[tuple]:
+    # Backend modules read their configuration at import time, so import after the env is set
+    from backend.database import engine, AsyncSessionLocal
+    from backend.models import Base, Asset, AssetType, PriceHistory
+    from backend.routers import assets
+    from backend.services.history import columnar_series, decode_columnar, SERIES_FIELDS
+    from backend.services.rollups import rebuild_rollups
+    from backend.services.price_cache import read_series, load_series
+    from fastapi.responses import JSONResponse
+    from pydantic import TypeAdapter
+    from datetime import datetime, date, timedelta
+    from fastapi import FastAPI
+    from sqlalchemy import insert
+    import httpx
+
+    rnd = random.Random(1)
+    first_day = date.today() - timedelta(days=args.days - 1)
+    price = 1.0
+    rows = []
+    for offset in range(args.days):
+        day = first_day + timedelta(days=offset)
+        price = round(price * (1 + rnd.gauss(0.0003, 0.01)), 6)
+        rows.append({"asset_id": 1, "trading_day": day, "date": datetime.combine(day, datetime.min.time()), "price": price})
+
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+        await conn.execute(insert(Asset), [{"code": "BENCH", "name": "Benchmark Fund", "type": AssetType.FUND.value}])
+        await conn.execute(insert(PriceHistory), rows)
+    async with AsyncSessionLocal() as db:
+        await rebuild_rollups(db)
+
+    adapter = TypeAdapter(assets.AssetDetailResponse)
+    app = FastAPI()
+    app.include_router(assets.router)
+    results = []
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://bench") as client:
+        variants = [
+            ("points", {}, SERIES_FIELDS),
+            ("columnar", {"format": "columnar"}, ("day", "price")),
+            ("columnar+delta", {"format": "columnar", "delta": "true"}, ("day", "price")),
+        ]
+        for label, params, fields in variants:
+            params = {"resolution": "day", **params}
+            response = await client.get("/assets/1", params=params)
+            response.raise_for_status()
+            body = response.json()
+            if "days" in body:
+                # The columnar payload must decode back to exactly the stored history
+                decoded = decode_columnar(body["days"], body["prices"], body["delta"])
+                assert decoded == [(row["trading_day"], row["price"]) for row in rows], label
+            else:
+                assert len(body["history"]) == args.days, label
+
+            # Response building on its own, from the rows the route reads
+            async with AsyncSessionLocal() as db:
+                series = await read_series(db, [1], "day", None, None, fields=fields)
+                points = await load_series(db, [1], "day", None, None)
+            header = {"id": 1, "code": "BENCH", "name": "Benchmark Fund", "type": "FUND", "resolution": "day", "next_cursor": None}
+            if label == "points":
+                # What FastAPI does for a response_model route: validate, dump to JSON types, render
+                def build():
+                    return JSONResponse(adapter.dump_python(adapter.validate_python({**header, "history": points}), mode="json")).body
+            else:
+                delta = params.get("delta") == "true"
+                def build():
+                    return JSONResponse({**header, "format": "columnar", "delta": delta, **columnar_series(series, delta)}).body
+            serialize_ms = timed_sync(build, args.repeat)
+
+            request_ms = await timed(lambda: client.get("/assets/1", params=params), args.repeat)
+            results.append((label, request_ms, serialize_ms, len(response.content)))
+
+    await engine.dispose()
+    return results
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark asset history response formats")
+    parser.add_argument("--days", type=int, default=5000, help="Daily prices of the benchmark asset")
+    parser.add_argument("--repeat", type=int, default=30, help="Timed requests per format")
+    args = parser.parse_args()
+
+    logging.disable(logging.CRITICAL)
+    workdir = Path(tempfile.mkdtemp(prefix="bench_history_"))
+    os.environ["DATABASE_URL"] = f"sqlite+aiosqlite:///{workdir / 'bench.db'}"
+    os.environ.setdefault("SECRET_KEY", "bench-history-" + "x" * 32) # The router imports security settings
+
+    results = asyncio.run(run_benchmark(args))
+
+    base_label, base_request, base_serialize, base_bytes = results[0]
+    print(f"history            {args.days} daily points, median of {args.repeat} requests")
+    print(f"{'format':<18} {'request':>10} {'serialize':>10} {'bytes':>10}   vs {base_label}")
+    for label, request_ms, serialize_ms, size in results:
+        print(f"{label:<18} {request_ms:>7.1f} ms {serialize_ms:>7.1f} ms {size:>10}   "
+              f"serialize x{base_serialize / max(serialize_ms, 0.01):.1f}, bytes x{base_bytes / size:.1f}")
+
+if __name__ == "__main__":
+    main()
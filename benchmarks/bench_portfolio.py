@@ -0,0 +1,108 @@
+"""
+Latency of GET /portfolio/ as the number of holdings grows.
+
+Usage (from the project root):
+    python -m benchmarks.bench_portfolio --positions 1,10,50,200 --repeat 30
+
+Builds one user per --positions entry in a throwaway SQLite database (each with that many
+holdings and --days of prices per asset), serves the portfolio router in-process and
+times a cold request (price series not cached yet) and warm ones. The number of queries
+per request is checked by tests/test_portfolio_queries.py.
+"""
+from pathlib import Path
+import argparse
+import asyncio
+import logging
+import os
+import random
+import statistics
+import tempfile
+import time
+
+async def run_benchmark(args) -> list[tuple]:
+    # Backend modules read their configuration at import time, so import after the env is set
+    from backend.database import engine, AsyncSessionLocal, dispose_engines
+    from backend.models import Base, Asset, AssetType, PriceHistory, Portfolio, User
+    from backend.routers import portfolio
+    from backend.security import get_current_reader
+    from backend.services.latest_prices import rebuild_latest_prices
+    from backend.services.price_cache import cache
+    from datetime import date, datetime, timedelta
+    from fastapi import FastAPI
+    from sqlalchemy import insert, select
+    import httpx
+
+    positions = [int(value) for value in args.positions.split(",")]
+    asset_count = max(positions)
+    rnd = random.Random(1)
+    first_day = date.today() - timedelta(days=args.days - 1)
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+        await conn.execute(insert(Asset), [
+            {"code": f"P{i:04d}", "name": f"Portfolio Fund {i}", "type": AssetType.FUND.value}
+            for i in range(asset_count)
+        ])
+        await conn.execute(insert(PriceHistory), [
+            {"asset_id": asset_id, "trading_day": first_day + timedelta(days=offset),
+             "date": datetime.combine(first_day + timedelta(days=offset), datetime.min.time()), "price": rnd.uniform(1, 10)}
+            for asset_id in range(1, asset_count + 1)
+            for offset in range(args.days)
+        ])
+        await conn.execute(insert(User), [{"username": f"holder{count}"} for count in positions])
+        users = {row.username: row.id for row in await conn.execute(select(User.id, User.username))}
+        await conn.execute(insert(Portfolio), [
+            {"user_id": users[f"holder{count}"], "asset_id": asset_id, "quantity": rnd.uniform(1, 100), "average_cost": rnd.uniform(1, 10)}
+            for count in positions
+            for asset_id in range(1, count + 1)
+        ])
+    async with AsyncSessionLocal() as db:
+        await rebuild_latest_prices(db)
+        holders = {user.username: user for user in (await db.execute(select(User))).scalars()}
+
+    current = {}
+    app = FastAPI()
+    app.include_router(portfolio.router)
+    app.dependency_overrides[get_current_reader] = lambda: current["user"]
+    results = []
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://bench") as client:
+        for count in positions:
+            current["user"] = holders[f"holder{count}"]
+            cache.invalidate()
+
+            started = time.perf_counter()
+            response = await client.get("/portfolio/")
+            cold_ms = (time.perf_counter() - started) * 1000
+            response.raise_for_status()
+            assert len(response.json()) == count
+
+            timings = []
+            for _ in range(args.repeat):
+                started = time.perf_counter()
+                await client.get("/portfolio/")
+                timings.append((time.perf_counter() - started) * 1000)
+            results.append((count, cold_ms, statistics.median(timings)))
+
+    await dispose_engines()
+    return results
+
+def main():
+    parser = argparse.ArgumentParser(description="Time GET /portfolio/ per number of holdings")
+    parser.add_argument("--positions", default="1,10,50,200", help="Holdings per benchmark user")
+    parser.add_argument("--days", type=int, default=250, help="Daily prices per asset")
+    parser.add_argument("--repeat", type=int, default=30, help="Timed warm requests per user")
+    args = parser.parse_args()
+
+    logging.disable(logging.CRITICAL)
+    workdir = Path(tempfile.mkdtemp(prefix="bench_portfolio_"))
+    os.environ["DATABASE_URL"] = f"sqlite+aiosqlite:///{workdir / 'bench.db'}"
+    os.environ.setdefault("SECRET_KEY", "bench-portfolio-" + "x" * 32) # The router imports security settings
+
+    results = asyncio.run(run_benchmark(args))
+
+    print(f"GET /portfolio/, {args.days} days of prices per asset, median of {args.repeat} warm requests")
+    print(f"{'holdings':>8} {'cold request':>13} {'warm request':>13}")
+    for count, cold_ms, request_ms in results:
+        print(f"{count:>8} {cold_ms:>10.1f} ms {request_ms:>10.1f} ms")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,140 @@
+"""
+Read throughput of the GET routes while the price writer holds long write transactions.
+
+Usage (from the project root):
+    python -m benchmarks.bench_reads --seconds 10 --readers 16 --profiles default,legacy
+
+For every engine profile (SQLite settings, see PROFILES), builds a throwaway SQLite
+database (--assets funds with --days of history each) and runs a fresh process in
+which a writer repeatedly
+upserts a day of prices for every fund in one transaction (held open --hold-ms,
+like a fetch chunk) while --readers concurrent clients call GET /assets/{id}
+through the read-only session factory. Reports reads/s, read latency and errors
+("database is locked" and friends) per profile.
+"""
+from pathlib import Path
+import argparse
+import asyncio
+import json
+import logging
+import os
+import random
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+async def run_child(args) -> dict:
+    # Backend modules read their configuration at import time, so import after the env is set
+    from backend.database import engine, AsyncSessionLocal, dispose_engines
+    from backend.models import Base, Asset, AssetType, PriceHistory
+    from backend.routers import assets
+    from backend.services.price_writer import upsert_prices
+    from datetime import date, datetime, timedelta
+    from fastapi import FastAPI
+    from sqlalchemy import insert
+    import httpx
+
+    rnd = random.Random(1)
+    first_day = date.today() - timedelta(days=args.days + 400)
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+        await conn.execute(insert(Asset), [
+            {"code": f"R{i:04d}", "name": f"Read Fund {i}", "type": AssetType.FUND.value}
+            for i in range(args.assets)
+        ])
+        await conn.execute(insert(PriceHistory), [
+            {"asset_id": asset_id, "trading_day": first_day + timedelta(days=offset),
+             "date": datetime.combine(first_day + timedelta(days=offset), datetime.min.time()), "price": rnd.uniform(1, 10)}
+            for asset_id in range(1, args.assets + 1)
+            for offset in range(args.days)
+        ])
+
+    app = FastAPI()
+    app.include_router(assets.router)
+    stop = time.monotonic() + args.seconds
+    latencies, errors, writes = [], [], [0]
+
+    async def writer():
+        day = first_day + timedelta(days=args.days)
+        while time.monotonic() < stop:
+            async with AsyncSessionLocal() as db:
+                rows = [(asset_id, day, datetime.now(), rnd.uniform(1, 10)) for asset_id in range(1, args.assets + 1)]
+                await upsert_prices(db, rows)
+                await asyncio.sleep(args.hold_ms / 1000)
+                await db.commit()
+            writes[0] += 1
+            day += timedelta(days=1)
+
+    async def reader(client):
+        while time.monotonic() < stop:
+            started = time.perf_counter()
+            try:
+                response = await client.get(f"/assets/{rnd.randint(1, args.assets)}", params={"resolution": "day", "format": "columnar"})
+                response.raise_for_status()
+                latencies.append((time.perf_counter() - started) * 1000)
+            except Exception as error:
+                errors.append(type(error).__name__)
+
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app, raise_app_exceptions=False), base_url="http://bench") as client:
+        await asyncio.gather(writer(), *(reader(client) for _ in range(args.readers)))
+    await dispose_engines()
+
+    latencies.sort()
+    return {
+        "reads": len(latencies),
+        "errors": len(errors),
+        "writes": writes[0],
+        "p50": statistics.median(latencies) if latencies else None,
+        "p99": latencies[int(len(latencies) * 0.99) - 1] if latencies else None,
+    }
+
+# SQLite settings per profile; "legacy" is what database.py did before engine profiles
+PROFILES = {
+    "default": {},
+    "legacy": {
+        "SQLITE_JOURNAL_MODE": "DELETE",
+        "SQLITE_SYNCHRONOUS": "FULL",
+        "SQLITE_BUSY_TIMEOUT_MS": "5000",
+        "SQLITE_CACHE_KIB": "2000",
+        "SQLITE_MMAP_BYTES": "0",
+    },
+}
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark API reads during fetcher writes")
+    parser.add_argument("--seconds", type=float, default=10)
+    parser.add_argument("--readers", type=int, default=16, help="Concurrent read clients")
+    parser.add_argument("--assets", type=int, default=3000)
+    parser.add_argument("--days", type=int, default=60, help="History per asset")
+    parser.add_argument("--hold-ms", type=float, default=500, help="How long each write transaction stays open")
+    parser.add_argument("--profiles", default="default,legacy", help=f"Engine profiles to compare ({', '.join(PROFILES)})")
+    parser.add_argument("--child", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        logging.disable(logging.CRITICAL)
+        print(json.dumps(asyncio.run(run_child(args))))
+        return
+
+    print(f"{args.readers} readers, {args.assets} assets x {args.days} days, write transactions held {args.hold_ms:.0f} ms, {args.seconds:.0f} s each")
+    print(f"{'profile':<10} {'reads/s':>10} {'p50':>10} {'p99':>10} {'errors':>8} {'writes':>8}")
+    for profile in args.profiles.split(","):
+        workdir = Path(tempfile.mkdtemp(prefix="bench_reads_"))
+        env = {
+            **os.environ,
+            "DATABASE_URL": f"sqlite+aiosqlite:///{workdir / 'bench.db'}",
+            **PROFILES[profile],
+            "SECRET_KEY": os.environ.get("SECRET_KEY") or "bench-reads-" + "x" * 32, # The router imports security settings
+        }
+        argv = [sys.executable, "-m", "benchmarks.bench_reads", "--child"] + [
+            f"--{name.replace('_', '-')}={value}" for name, value in vars(args).items() if name not in ("child", "profiles")
+        ]
+        result = json.loads(subprocess.run(argv, env=env, capture_output=True, text=True, check=True).stdout.strip().splitlines()[-1])
+        p50 = "-" if result["p50"] is None else f"{result['p50']:.1f} ms"
+        p99 = "-" if result["p99"] is None else f"{result['p99']:.1f} ms"
+        print(f"{profile:<10} {result['reads'] / args.seconds:>10.1f} {p50:>10} {p99:>10} {result['errors']:>8} {result['writes']:>8}")
+
+if __name__ == "__main__":
+    main()
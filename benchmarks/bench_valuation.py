@@ -0,0 +1,146 @@
+"""
+Portfolio history valuation: the per-day Python loop vs the vectorized engine (services/valuation.py).
+
+Usage (from the project root):
+    python -m benchmarks.bench_valuation --years 10 --assets 200 --orders 20 --repeat 5
+
+Puts --assets synthetic daily price series (weekdays, listed at random dates, with random
+gaps) into the price series cache and values one portfolio holding all of them at day,
+week and month resolution, both ways. Both start from the cached series and end with the
+response rows. Reports the median time of each and checks they produce the same series.
+The "ledger" column is the vectorized engine with holdings taken from --orders orders per
+asset (holdings_timeline()), as /portfolio/history values portfolios with an order history.
+"""
+from pathlib import Path
+import argparse
+import asyncio
+import logging
+import math
+import os
+import random
+import statistics
+import tempfile
+import time
+
+async def timed(call, repeat: int) -> tuple[float, object]:
+    """(median ms, last result) of `await call()` over `repeat` runs."""
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        result = await call()
+        timings.append((time.perf_counter() - started) * 1000)
+    return statistics.median(timings), result
+
+async def run_benchmark(args) -> list[tuple]:
+    # Backend modules read their configuration at import time, so import after the env is set
+    from backend.database import engine, AsyncSessionLocal, dispose_engines
+    from backend.models import Base, OrderType
+    from backend.routers.portfolio import PortfolioHistoryItem
+    from backend.services.price_cache import PriceSeries, cache, load_series, read_columns
+    from backend.services.valuation import price_matrix, valuate, holdings_timeline
+    from datetime import date, datetime, timedelta
+    import numpy as np
+
+    rnd = random.Random(1)
+    first_day = date.today() - timedelta(days=int(args.years * 365))
+    weekdays = [day for day in (first_day + timedelta(days=offset) for offset in range(int(args.years * 365)))
+                if day.weekday() < 5]
+    epoch = date(1970, 1, 1)
+    for asset_id in range(1, args.assets + 1):
+        listed = rnd.randrange(len(weekdays) // 2) if asset_id % 3 == 0 else 0
+        days = [(day - epoch).days for day in weekdays[listed:] if rnd.random() > 0.02]
+        prices = np.cumprod(1 + np.array([rnd.gauss(0.0003, 0.01) for _ in days]))
+        cache.put(asset_id, PriceSeries(np.array(days, dtype=np.int32), prices,
+                                        np.array(days, dtype=np.int64) * 86_400_000_000))
+    holdings = {asset_id: {"quantity": rnd.uniform(1, 1000), "avg_cost": rnd.uniform(0.5, 2)}
+                for asset_id in range(1, args.assets + 1)}
+    asset_ids = list(holdings)
+    # (asset_id, executed_at, type, quantity, price, cost_snapshot), sorted by execution like the snapshot query
+    orders = sorted((
+        (asset_id, datetime.combine(rnd.choice(weekdays), datetime.min.time()),
+         OrderType.BUY if rnd.random() < 0.7 else OrderType.SELL, rnd.uniform(1, 50), rnd.uniform(0.5, 2), None)
+        for asset_id in asset_ids
+        for _ in range(args.orders)
+    ), key=lambda order: order[1])
+
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+
+    async def legacy(db, resolution):
+        # read_portfolio_history before the vectorized engine: nested dicts and a loop over every day and asset
+        history_rows = await load_series(db, asset_ids, resolution, None, None)
+        date_asset_price_map, bucket_days, all_dates = {}, {}, set()
+        for row in history_rows:
+            day = row["bucket"]
+            if day not in date_asset_price_map:
+                date_asset_price_map[day] = {}
+            date_asset_price_map[day][row["asset_id"]] = row["price"]
+            bucket_days[day] = max(bucket_days.get(day, row["day"]), row["day"])
+            all_dates.add(day)
+        response, last_known_prices = [], {}
+        for day in sorted(all_dates):
+            for asset_id, price in date_asset_price_map[day].items():
+                last_known_prices[asset_id] = price
+            daily_value = daily_cost = 0.0
+            for asset_id, item_data in holdings.items():
+                if asset_id in last_known_prices:
+                    daily_value += item_data["quantity"] * last_known_prices[asset_id]
+                    daily_cost += item_data["quantity"] * item_data["avg_cost"]
+            response.append(PortfolioHistoryItem(date=bucket_days[day].strftime("%Y-%m-%d"), total_value=daily_value,
+                                                 total_cost=daily_cost, total_profit=daily_value - daily_cost))
+        return [item.model_dump() for item in response]
+
+    async def vectorized(db, resolution, ledger=False):
+        columns = await read_columns(db, asset_ids, resolution, None, None)
+        buckets, labels, prices = price_matrix(columns, asset_ids)
+        if ledger:
+            current = {asset_id: (item["quantity"], item["avg_cost"]) for asset_id, item in holdings.items()}
+            quantities, unit_costs, realized = holdings_timeline(asset_ids, current, orders, labels)
+        else:
+            quantities = np.array([holdings[asset_id]["quantity"] for asset_id in asset_ids])
+            unit_costs = np.array([holdings[asset_id]["avg_cost"] for asset_id in asset_ids])
+        total_value, total_cost = valuate(prices, quantities, unit_costs)
+        dates = labels.astype("datetime64[D]").astype(str).tolist()
+        return [{"date": day, "total_value": value, "total_cost": cost, "total_profit": value - cost}
+                for day, value, cost in zip(dates, total_value.tolist(), total_cost.tolist())]
+
+    results = []
+    async with AsyncSessionLocal() as db:
+        for resolution in ("day", "week", "month"):
+            legacy_ms, expected = await timed(lambda: legacy(db, resolution), args.repeat)
+            vectorized_ms, got = await timed(lambda: vectorized(db, resolution), args.repeat)
+            ledger_ms, _ = await timed(lambda: vectorized(db, resolution, ledger=True), args.repeat)
+            same = len(expected) == len(got) and all(
+                a["date"] == b["date"] and all(math.isclose(a[key], b[key], rel_tol=1e-9)
+                                               for key in ("total_value", "total_cost", "total_profit"))
+                for a, b in zip(expected, got)
+            )
+            results.append((resolution, len(got), legacy_ms, vectorized_ms, ledger_ms, same))
+    await dispose_engines()
+    return results
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the portfolio history valuation")
+    parser.add_argument("--years", type=float, default=10, help="Daily history per asset")
+    parser.add_argument("--assets", type=int, default=200, help="Assets held by the portfolio")
+    parser.add_argument("--orders", type=int, default=20, help="Orders per asset for the ledger run")
+    parser.add_argument("--repeat", type=int, default=5, help="Timed runs per engine and resolution")
+    args = parser.parse_args()
+
+    logging.disable(logging.CRITICAL)
+    workdir = Path(tempfile.mkdtemp(prefix="bench_valuation_"))
+    os.environ["DATABASE_URL"] = f"sqlite+aiosqlite:///{workdir / 'bench.db'}"
+    os.environ.setdefault("SECRET_KEY", "bench-valuation-" + "x" * 32) # The router imports security settings
+    os.environ["PRICE_CACHE_MB"] = "1024" # Keep every synthetic series cached
+    os.environ["PRICE_CACHE_SYNC_SECONDS"] = "1e9" # The series only exist in the cache
+
+    results = asyncio.run(run_benchmark(args))
+
+    print(f"portfolio history, {args.assets} assets x {args.years:g} years, median of {args.repeat} runs")
+    print(f"{'resolution':<10} {'points':>7} {'loop':>10} {'vectorized':>11} {'speedup':>8} {'ledger':>10}  same")
+    for resolution, points, legacy_ms, vectorized_ms, ledger_ms, same in results:
+        print(f"{resolution:<10} {points:>7} {legacy_ms:>7.1f} ms {vectorized_ms:>8.1f} ms {legacy_ms / vectorized_ms:>7.1f}x "
+              f"{ledger_ms:>7.1f} ms  {same}")
+
+if __name__ == "__main__":
+    main()
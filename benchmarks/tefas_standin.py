@@ -0,0 +1,130 @@
+"""
+Local stand-in for www.tefas.gov.tr, serving the recorded pages in benchmarks/fixtures.
+
+Usage (from the project root):
+    python -m benchmarks.tefas_standin --port 8900 --latency-ms 80 --captcha-rate 0.02 --error-rate 0.01
+
+Then point the fetcher at it with TEFAS_BASE_URL=http://127.0.0.1:8900.
+
+- /Default.aspx sets an ASP.NET session cookie, like the real site.
+- /FonAnaliz.aspx?FonKod=XXX serves the recorded fund page with the code and a
+  deterministic price (derived from the code) filled in.
+- Every fund page request waits --latency-ms (+/- --jitter), then answers with the
+  recorded CAPTCHA page at --captcha-rate or an HTTP 500 at --error-rate.
+- --slow-rate of the fund page requests take --slow-ms instead (latency tail).
+"""
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from pathlib import Path
+from urllib.parse import urlsplit, parse_qs
+import argparse
+import random
+import threading
+import time
+import zlib
+
+FIXTURES_DIR = Path(__file__).parent / "fixtures"
+TEMPLATE_CODE = b"TTE"
+TEMPLATE_PRICE = b"5,348167"
+
+def price_for(code: str) -> float:
+    """Stable fake price for a fund code."""
+    return round(1 + zlib.crc32(code.encode()) % 100000 / 1000, 6)
+
+def format_price(price: float) -> bytes:
+    return f"{price:,.6f}".replace(",", "X").replace(".", ",").replace("X", ".").encode()
+
+class StandInConfig:
+    def __init__(self, latency_ms: float = 50, jitter_ms: float = 20, captcha_rate: float = 0.0, error_rate: float = 0.0, seed: int | None = None,
+                 slow_rate: float = 0.0, slow_ms: float = 2000):
+        self.latency_ms = latency_ms
+        self.jitter_ms = jitter_ms
+        self.captcha_rate = captcha_rate
+        self.error_rate = error_rate
+        self.slow_rate = slow_rate
+        self.slow_ms = slow_ms
+        self.random = random.Random(seed)
+        self.lock = threading.Lock()
+        self.template = (FIXTURES_DIR / "FonAnaliz_TTE.html").read_bytes()
+        self.captcha = (FIXTURES_DIR / "captcha.html").read_bytes()
+        self.requests = 0
+
+    def roll(self) -> tuple[float, float]:
+        with self.lock:
+            self.requests += 1
+            delay = max(0.0, self.latency_ms + self.random.uniform(-self.jitter_ms, self.jitter_ms)) / 1000
+            if self.random.random() < self.slow_rate:
+                delay = self.slow_ms / 1000
+            return delay, self.random.random()
+
+def make_handler(config: StandInConfig):
+    class StandInHandler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def do_GET(self):
+            url = urlsplit(self.path)
+            if url.path == "/Default.aspx":
+                self.send_body(200, b"<html><body>TEFAS</body></html>", cookie="ASP.NET_SessionId=standin; path=/")
+                return
+            if url.path != "/FonAnaliz.aspx":
+                self.send_body(404, b"Not Found")
+                return
+
+            delay, dice = config.roll()
+            time.sleep(delay)
+            if dice < config.captcha_rate:
+                self.send_body(200, config.captcha)
+            elif dice < config.captcha_rate + config.error_rate:
+                self.send_body(500, b"Internal Server Error")
+            else:
+                code = parse_qs(url.query).get("FonKod", [""])[0].upper()
+                body = config.template.replace(TEMPLATE_PRICE, format_price(price_for(code)), 1)
+                body = body.replace(TEMPLATE_CODE, code.encode())
+                self.send_body(200, body)
+
+        def send_body(self, status: int, body: bytes, cookie: str | None = None):
+            self.send_response(status)
+            self.send_header("Content-Type", "text/html; charset=utf-8")
+            self.send_header("Content-Length", str(len(body)))
+            if cookie:
+                self.send_header("Set-Cookie", cookie)
+            self.end_headers()
+            try:
+                self.wfile.write(body)
+            except (BrokenPipeError, ConnectionResetError):
+                # Client gave up on the request (e.g. a hedged request that lost the race)
+                self.close_connection = True
+
+        def log_message(self, format, *args):
+            pass
+
+    return StandInHandler
+
+def serve(config: StandInConfig, host: str = "127.0.0.1", port: int = 8900) -> ThreadingHTTPServer:
+    server = ThreadingHTTPServer((host, port), make_handler(config))
+    server.daemon_threads = True
+    return server
+
+def main():
+    parser = argparse.ArgumentParser(description="Local TEFAS stand-in server")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8900)
+    parser.add_argument("--latency-ms", type=float, default=50)
+    parser.add_argument("--jitter-ms", type=float, default=20)
+    parser.add_argument("--captcha-rate", type=float, default=0.0)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--slow-rate", type=float, default=0.0)
+    parser.add_argument("--slow-ms", type=float, default=2000)
+    parser.add_argument("--seed", type=int, default=None)
+    args = parser.parse_args()
+
+    config = StandInConfig(args.latency_ms, args.jitter_ms, args.captcha_rate, args.error_rate, args.seed,
+                          args.slow_rate, args.slow_ms)
+    server = serve(config, args.host, args.port)
+    print(f"TEFAS stand-in listening on http://{args.host}:{args.port}", flush=True)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+if __name__ == "__main__":
+    main()
@@ -205,29 +205,71 @@ async function triggerPriceUpdate(e) {
     
     const btn = e.target.closest('a');
     const originalText = btn.innerHTML;
-    btn.innerHTML = '<span class="spinner-border spinner-border-sm" role="status" aria-hidden="true"></span> Updating...';
+    const spinner = '<span class="spinner-border spinner-border-sm" role="status" aria-hidden="true"></span>';
+    btn.innerHTML = `${spinner} Updating...`;
     btn.classList.add('disabled');
+
+    const restoreButton = () => {
+        btn.innerHTML = originalText;
+        btn.classList.remove('disabled');
+    };
     
     try {
-        // Use relative path since API_BASE is empty
+        // The update runs in the background; the response only carries its job id
         const response = await fetch(`/assets/fetch-prices`, {
             method: 'POST',
             headers: Auth.getHeaders()
         });
 
-        if (response.ok) {
+        if (!response.ok) {
+            alert("İşlem başlatılamadı. Yetkiniz olmayabilir.");
+            restoreButton();
+            return;
+        }
+
+        const job = await response.json();
+        if (job.job_id === null) {
+            // Nothing was stale
+            localStorage.setItem('priceUpdateSuccess', 'true');
+            window.location.reload();
+            return;
+        }
+        pollPriceUpdate(job.job_id, btn, spinner, restoreButton);
+    } catch (error) {
+        console.error(error);
+        alert("Bir hata oluştu.");
+        restoreButton();
+    }
+}
+
+// Polls the fetch job until it finishes, showing done/total on the button
+async function pollPriceUpdate(jobId, btn, spinner, restoreButton) {
+    try {
+        const response = await fetch(`/assets/fetch-prices/${jobId}`, {
+            headers: Auth.getHeaders()
+        });
+        if (!response.ok) throw new Error(`HTTP ${response.status}`);
+
+        const job = await response.json();
+        if (job.status === 'RUNNING') {
+            const eta = job.eta_seconds !== null ? ` (~${Math.ceil(job.eta_seconds)}s)` : '';
+            btn.innerHTML = `${spinner} ${job.done + job.failed}/${job.total}${eta}`;
+            setTimeout(() => pollPriceUpdate(jobId, btn, spinner, restoreButton), 2000);
+            return;
+        }
+
+        if (job.status === 'COMPLETED') {
             localStorage.setItem('priceUpdateSuccess', 'true');
             window.location.reload();
         } else {
-            alert("İşlem başlatılamadı. Yetkiniz olmayabilir.");
-            btn.innerHTML = originalText;
-            btn.classList.remove('disabled');
+            // INTERRUPTED jobs are resumed by the next run, CANCELLED ones are not
+            alert(`Fiyat güncellemesi tamamlanamadı (${job.done}/${job.total}).`);
+            restoreButton();
         }
     } catch (error) {
         console.error(error);
         alert("Bir hata oluştu.");
-        btn.innerHTML = originalText;
-        btn.classList.remove('disabled');
+        restoreButton();
     }
 }
 
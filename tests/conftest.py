@@ -0,0 +1,8 @@
+from pathlib import Path
+import os
+import tempfile
+
+# Backend modules read their configuration at import time: point them at a throwaway database first
+os.environ["DATABASE_URL"] = f"sqlite+aiosqlite:///{Path(tempfile.mkdtemp(prefix='tests_')) / 'test.db'}"
+os.environ["ARCHIVE_DIR"] = str(Path(tempfile.mkdtemp(prefix="tests_archive_")))
+os.environ.setdefault("SECRET_KEY", "tests-" + "x" * 32) # The routers import security settings
@@ -0,0 +1,22 @@
+from pathlib import Path
+from backend.services.extractors import scan_price, soup_price
+import pytest
+
+FIXTURES_DIR = Path(__file__).parent.parent / "benchmarks" / "fixtures"
+
+DECOY_LISTS = b"""<html><body>
+<ul class="top-list-x"><li>Decoy<span>1,111111</span></li></ul>
+<ul class='x-top-list main'><li>Decoy<span>2,222222</span></li></ul>
+<ul id="prices" class="main  top-list
+ wide"><li>Son Fiyat (TL)<span>5,348167</span></li></ul>
+</body></html>"""
+
+@pytest.mark.parametrize("page", sorted(FIXTURES_DIR.glob("*.html")), ids=lambda page: page.name)
+def test_extractors_agree_on_saved_pages(page):
+    content = page.read_bytes()
+    assert scan_price(content) == soup_price(content)
+
+def test_top_list_is_matched_as_a_whole_class_token():
+    # Classes that only contain "top-list" are not the price list
+    assert scan_price(DECOY_LISTS) == soup_price(DECOY_LISTS) == 5.348167
+    assert scan_price(b'<ul class="top-list-x"><li><span>1,5</span></li></ul>') is None
@@ -0,0 +1,34 @@
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from backend.models import User
+from backend.routers import scheduler
+from backend.security import get_current_reader
+from backend.services import metrics
+
+def make_client() -> TestClient:
+    app = FastAPI()
+    app.include_router(scheduler.router)
+    app.dependency_overrides[get_current_reader] = lambda: User(username="reader")
+    return TestClient(app)
+
+def test_metrics_endpoint_exposes_the_registry():
+    metrics.reset("test.")
+    metrics.inc("test.requests", 3)
+    metrics.set_gauge("test.rate", 2.5)
+    for value in (10, 20, 30):
+        metrics.observe("test.latency_ms", value)
+
+    response = make_client().get("/scheduler/metrics")
+
+    assert response.status_code == 200
+    body = response.json()
+    assert body["counters"]["test.requests"] == 3
+    assert body["gauges"]["test.rate"] == 2.5
+    assert body["summaries"]["test.latency_ms"] == {"count": 3, "sum": 60, "p50": 20, "p99": 30}
+    metrics.reset("test.")
+
+def test_metrics_endpoint_requires_a_reader():
+    app = FastAPI()
+    app.include_router(scheduler.router)
+    response = TestClient(app).get("/scheduler/metrics")
+    assert response.status_code == 401
@@ -0,0 +1,75 @@
+from datetime import date, datetime, timedelta
+from fastapi import FastAPI
+from sqlalchemy import event, insert, select
+from backend.database import engine, read_engine, AsyncSessionLocal, dispose_engines
+from backend.models import Base, Asset, AssetType, PriceHistory, Portfolio, User
+from backend.routers import portfolio
+from backend.security import get_current_reader
+from backend.services.latest_prices import rebuild_latest_prices
+from backend.services.price_cache import cache
+import asyncio
+import httpx
+
+POSITIONS = (1, 10, 50)
+DAYS = 30
+
+async def count_portfolio_queries() -> dict[int, tuple[int, int]]:
+    """Holdings -> SQL statements of GET /portfolio/ with the price series not cached yet (cold) and cached (warm)."""
+    first_day = date.today() - timedelta(days=DAYS - 1)
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+        await conn.execute(insert(Asset), [
+            {"code": f"Q{i:04d}", "name": f"Query Fund {i}", "type": AssetType.FUND.value}
+            for i in range(max(POSITIONS))
+        ])
+        await conn.execute(insert(PriceHistory), [
+            {"asset_id": asset_id, "trading_day": first_day + timedelta(days=offset),
+             "date": datetime.combine(first_day + timedelta(days=offset), datetime.min.time()), "price": 1.0 + offset}
+            for asset_id in range(1, max(POSITIONS) + 1)
+            for offset in range(DAYS)
+        ])
+        await conn.execute(insert(User), [{"username": f"holder{count}"} for count in POSITIONS])
+        users = {row.username: row.id for row in await conn.execute(select(User.id, User.username))}
+        await conn.execute(insert(Portfolio), [
+            {"user_id": users[f"holder{count}"], "asset_id": asset_id, "quantity": 10.0, "average_cost": 2.0}
+            for count in POSITIONS
+            for asset_id in range(1, count + 1)
+        ])
+    async with AsyncSessionLocal() as db:
+        await rebuild_latest_prices(db)
+        holders = {user.username: user for user in (await db.execute(select(User))).scalars()}
+
+    statements = [0]
+    def count_statement(*_):
+        statements[0] += 1
+    for counted in {engine, read_engine}:
+        event.listen(counted.sync_engine, "before_cursor_execute", count_statement)
+
+    current = {}
+    app = FastAPI()
+    app.include_router(portfolio.router)
+    app.dependency_overrides[get_current_reader] = lambda: current["user"]
+    counts = {}
+    try:
+        async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://test") as client:
+            for count in POSITIONS:
+                current["user"] = holders[f"holder{count}"]
+                cache.invalidate()
+                per_request = []
+                for _ in ("cold", "warm"):
+                    statements[0] = 0
+                    response = await client.get("/portfolio/")
+                    assert response.status_code == 200
+                    assert len(response.json()) == count
+                    per_request.append(statements[0])
+                counts[count] = tuple(per_request)
+    finally:
+        for counted in {engine, read_engine}:
+            event.remove(counted.sync_engine, "before_cursor_execute", count_statement)
+        await dispose_engines()
+    return counts
+
+def test_portfolio_queries_do_not_grow_with_holdings():
+    counts = asyncio.run(count_portfolio_queries())
+    # No per-holding query (N+1): every portfolio size takes the same statements
+    assert len(set(counts.values())) == 1, counts